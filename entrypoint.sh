@@ -6,7 +6,8 @@ echo "Caskade Planner starting..."
 case "$1" in
     "rest")
         echo "Starting REST API on port 5000..."
-		exec gunicorn -w 2 -b 0.0.0.0:5000 smt_planning.planner_rest:app
+		# One API process with several threads. Planning itself happens in the worker processes of the planning pool
+		exec gunicorn -w 1 --threads ${CASKADE_REST_THREADS:-16} -b 0.0.0.0:5000 "smt_planning.planner_rest:create_app()"
 		;;
     "cli")
         echo "Starting CLI mode..."
@@ -13,12 +13,10 @@ class ResourceOccurence:
 		self.z3_variable = Int(z3_variable_name)
 
 class Resource: 
-	id: int = 0
-	def __init__(self, iri: str, capabilities: List[Capability]) -> None:
+	def __init__(self, iri: str, capabilities: List[Capability], id: int) -> None:
 		self.iri = iri
 		#self.z3_variable = Int(iri)
-		Resource.id += 1
-		self.id = Resource.id
+		self.id = id
 		self.occurrences: Dict[int, Dict[int, ResourceOccurence]] = {}
 		self.capabilities = capabilities
 
@@ -43,8 +41,10 @@ class ResourceDictionary:
 		self.resources: Dict[str, Resource] = {}
 
 	def add_resource(self, iri: str, capabilities: List[Capability]) -> None:
-		resource = Resource(iri, capabilities)
-		self.resources.setdefault(iri, resource)
+		# Resource ids are numbered per dictionary, starting at 1
+		if iri in self.resources: return
+		resource = Resource(iri, capabilities, len(self.resources) + 1)
+		self.resources[iri] = resource
 	
 	def get_resource(self, iri: str) -> Resource:
 		if (not iri in self.resources):
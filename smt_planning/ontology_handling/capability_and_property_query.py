@@ -1,12 +1,17 @@
 import itertools
-from typing import List, Tuple
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
 
-from smt_planning.smt.StateHandler import StateHandler
+from rdflib import URIRef
+from rdflib.query import ResultRow
+
+from smt_planning.smt.planning_context import PlanningContext
 from smt_planning.dicts.PropertyDictionary import PropertyDictionary, CapabilityType
 from smt_planning.dicts.CapabilityDictionary import CapabilityDictionary, CapabilityPropertyInfluence, PropertyChange
 from smt_planning.dicts.ResourceDictionary import ResourceDictionary
+from smt_planning.ontology_handling.graph_traversal import Extraction, extract
 
-def get_all_properties(required_cap_iri: str) -> PropertyDictionary:
+def get_all_properties(context: PlanningContext, required_cap_iri: str) -> PropertyDictionary:
 	
 	# We need to get properties that belong to the capabilitiy inputs / outputs themselves as well as to resources. Important: Since rdflib has issues with UNION queries, we need to do two separate queries and combine the results afterwards.
 	# 
@@ -66,7 +71,7 @@ def get_all_properties(required_cap_iri: str) -> PropertyDictionary:
 			?cap a ?capType;
 				^CSS:requiresCapability ?process.
 				?process ?relation ?inout.
-			FILTER(?capType = CaSk:ProvidedCapability || ?cap = <{required_cap_iri}>)
+			FILTER(?capType = CaSk:ProvidedCapability || ?cap = ?requiredCap)
 		
 		?inout VDI3682:isCharacterizedBy ?id.
 		# All caps must have a type, that can either be provided or required (but if required, filter for the one we're plannning for)
@@ -94,10 +99,14 @@ def get_all_properties(required_cap_iri: str) -> PropertyDictionary:
 		}  
 	} GROUP BY ?de ?capType ?dataType ?relationType ?expr_goal ?log ?val
 	"""
-	query_string_2 = query_string_2.replace('{required_cap_iri}', required_cap_iri)
-	query_handler = StateHandler().get_query_handler()
-	results_1 = query_handler.query(query_string_1)
-	results_2 = query_handler.query(query_string_2)
+	query_handler = context.get_query_handler()
+	required_cap_bindings = {"requiredCap": URIRef(required_cap_iri)}
+	if context.extraction == Extraction.SPARQL:
+		# Both queries are independent, endpoints can answer them concurrently
+		results_1, results_2 = query_handler.query_all([(query_string_1, None), (query_string_2, required_cap_bindings)])
+	else:
+		results_1 = extract(context, "Properties of resources", query_string_1, None, lambda traversal: traversal.get_resource_properties(), ("caps",))
+		results_2 = extract(context, "Properties of capabilities", query_string_2, required_cap_bindings, lambda traversal: traversal.get_capability_properties(required_cap_iri), ("caps",))
 
 	properties = PropertyDictionary()
 	
@@ -117,7 +126,7 @@ def get_all_properties(required_cap_iri: str) -> PropertyDictionary:
 	
 	return properties
 
-def get_provided_capabilities(required_cap_iri: str) -> Tuple[CapabilityDictionary, ResourceDictionary]:
+def get_provided_capabilities(context: PlanningContext, required_cap_iri: str) -> Tuple[CapabilityDictionary, ResourceDictionary]:
 	query_string = """
 	PREFIX DINEN61360: <http://www.w3id.org/hsu-aut/DINEN61360#>
 	PREFIX CSS: <http://www.w3id.org/hsu-aut/css#>
@@ -128,7 +137,7 @@ def get_provided_capabilities(required_cap_iri: str) -> Tuple[CapabilityDictiona
 		?cap a ?capType;
 			^CSS:requiresCapability ?process.
 		?capType rdfs:subClassOf CSS:Capability.
-		FILTER(?capType = CaSk:ProvidedCapability || ?cap = <{required_cap_iri}>)
+		FILTER(?capType = CaSk:ProvidedCapability || ?cap = ?requiredCap)
 		?process VDI3682:hasInput ?input.
 		?input VDI3682:isCharacterizedBy ?id.
 		?de DINEN61360:has_Instance_Description ?id.
@@ -137,20 +146,19 @@ def get_provided_capabilities(required_cap_iri: str) -> Tuple[CapabilityDictiona
 		}
 	}
 	"""
-	query_string = query_string.replace('{required_cap_iri}', required_cap_iri)
-	query_handler = StateHandler().get_query_handler()
-	results = query_handler.query(query_string)
+	results = extract(context, "Capabilities", query_string, {"requiredCap": URIRef(required_cap_iri)}, lambda traversal: traversal.get_capabilities(required_cap_iri))
 	
-	property_dictionary = StateHandler().get_property_dictionary()
+	property_dictionary = context.get_property_dictionary()
 	capability_dictionary = CapabilityDictionary()
 
 	caps = set([str(row['cap']) for row in results])
+	# Outputs need to have their effect attached and are more tricky. They are queried for all capabilities at once
+	output_influences = get_output_influences_of_capabilities(context, caps)
 	for cap in caps:
 		# Input properties can be retrieved from query
 		inputs = [str(row['de']) for row in results if (str(row['cap']) == cap)]
 		input_properties = [property_dictionary.get_property(input) for input in inputs]
-		# Outputs need to have their effect attached and are more tricky
-		outputs = get_output_influences_of_capability(cap)
+		outputs = output_influences.get(cap, [])
 		capType = [str(row['capType']) for row in results if (str(row['cap']) == cap)][0]
 		capability_dictionary.add_capability(cap, capType, input_properties, outputs)
 
@@ -164,8 +172,13 @@ def get_provided_capabilities(required_cap_iri: str) -> Tuple[CapabilityDictiona
 
 	return capability_dictionary, resource_dictionary
 
-# TODO one query for both ... 
-def get_output_influences_of_capability(capability_iri: str) -> List[CapabilityPropertyInfluence] :
+def get_output_influences_of_capabilities(context: PlanningContext, capability_iris: Iterable[str]) -> Dict[str, List[CapabilityPropertyInfluence]]:
+	# One query for the output influences of all capabilities instead of one query per capability. Rows are grouped by capability afterwards.
+	# Capabilities are bound with VALUES first, without them rdflib evaluates the query for all combinations of capabilities and outputs, which is much slower than one query per capability
+	capability_iris = list(capability_iris)
+	if not capability_iris:
+		# An empty VALUES block can't be evaluated by rdflib. Without capabilities there are no output influences
+		return {}
 	query_string = """
 	PREFIX DINEN61360: <http://www.w3id.org/hsu-aut/DINEN61360#>
 	PREFIX CSS: <http://www.w3id.org/hsu-aut/css#>
@@ -177,7 +190,7 @@ def get_output_influences_of_capability(capability_iri: str) -> List[CapabilityP
 	PREFIX OM-Relation1: <http://www.openmath.org/cd/relation1#>
 	SELECT ?cap ?input_de ?inputClass ?inputExpressionGoal ?inputValue ?output_de ?outputClass ?outputValue 
 	?equalConstraint ?inputStateSubclass ?outputStateSubclass WHERE {
-		BIND(<{capability_iri}> AS ?cap)
+		VALUES ?cap { {capability_iris} }
 		?cap a CaSk:ProvidedCapability;
 			^CSS:requiresCapability ?process.
 		?process VDI3682:hasInput ?input.
@@ -213,12 +226,19 @@ def get_output_influences_of_capability(capability_iri: str) -> List[CapabilityP
 																													OM:operator OM-Relation1:eq.
 		}
 	} """
-	query_string = query_string.replace('{capability_iri}', capability_iri)
-	query_handler = StateHandler().get_query_handler()
-	results = query_handler.query(query_string)
-	property_dictionary = StateHandler().get_property_dictionary()
+	# A variable can only be bound to one value, so the list of capabilities is written into the query. Written in N3, IRIs can't change the query
+	query_string = query_string.replace('{capability_iris}', " ".join(URIRef(capability_iri).n3() for capability_iri in capability_iris))
+	results = extract(context, "Output influences", query_string, None, lambda traversal: traversal.get_output_influences(capability_iris))
+
+	rows_by_capability: Dict[str, List[ResultRow]] = defaultdict(list)
+	for row in results:
+		rows_by_capability[str(row['cap'])].append(row)
+	return {cap: get_output_influences_from_rows(context, rows) for cap, rows in rows_by_capability.items()}
+
+def get_output_influences_from_rows(context: PlanningContext, rows: List[ResultRow]) -> List[CapabilityPropertyInfluence]:
+	property_dictionary = context.get_property_dictionary()
 	influences: List[CapabilityPropertyInfluence] = []
-	for row in results: 
+	for row in rows: 
 		# for happening in range(happenings): 
 		# capDict.add_CapabilityOccurrence(str(row['cap']), "http://www.w3id.org/hsu-aut/cask#ProvidedCapability", happening, [], [])
 		property_iri = str(row['output_de'])
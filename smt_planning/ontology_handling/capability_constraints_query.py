@@ -1,8 +1,9 @@
 from typing import List
 
-from smt_planning.smt.StateHandler import StateHandler
+from smt_planning.smt.planning_context import PlanningContext
+from smt_planning.ontology_handling.graph_traversal import extract
 
-def get_capability_constraints():
+def get_capability_constraints(context: PlanningContext):
 	# Get all capability constraint IRIs and check whether its a constraint on an input or output
 	# GROUP_CONCAT is used as we're only interested in the constraints and not the individual arguments as separate entries
 	# //TODO: The BIND() clauses have to be used for rdflib as it otherwise fails with the error "variable unbound". It cannot handle GROUP_CONCAT for unbound variables. 
@@ -41,10 +42,8 @@ def get_capability_constraints():
 	GROUP BY ?cap ?constraint
 	"""
 	
-	stateHandler = StateHandler()
-	capability_dictionary = stateHandler.get_capability_dictionary()
-	query_handler = stateHandler.get_query_handler()
-	results = query_handler.query(query_string)
+	capability_dictionary = context.get_capability_dictionary()
+	results = extract(context, "Capability constraints", query_string, None, lambda traversal: traversal.get_capability_constraints(), ("inputArguments", "outputArguments"))
 	
 	for row in results:
 		# As soon as an outputArgument is present, the constraint is considered an output constraint
@@ -0,0 +1,33 @@
+import hashlib
+import os
+from typing import Dict, Iterable
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+
+def get_content_hash(content: bytes) -> str:
+	return hashlib.sha256(content).hexdigest()
+
+
+def get_local_path(location: str) -> str | None:
+	# Path of a local file given as path or file IRI. None for remote locations or files that don't exist
+	parsed_location = urlparse(location)
+	path = url2pathname(parsed_location.path) if parsed_location.scheme == "file" else location
+	if parsed_location.scheme in ("", "file") and os.path.isfile(path):
+		return path
+	return None
+
+
+def get_location_fingerprint(locations: Iterable[str]) -> Dict[str, str]:
+	'''
+	Returns the content hash of every local file in locations (paths or file IRIs). Remote locations are only identified by their IRI
+	'''
+	fingerprint = {}
+	for location in sorted(locations):
+		path = get_local_path(location)
+		if path is not None:
+			with open(path, "rb") as file:
+				fingerprint[location] = get_content_hash(file.read())
+		else:
+			fingerprint[location] = location
+	return fingerprint
@@ -0,0 +1,182 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Dict, List, Tuple
+
+from rdflib import BNode, Graph, Literal, URIRef
+from rdflib.term import Node
+
+from smt_planning.ontology_handling.file_fingerprint import get_location_fingerprint
+
+SNAPSHOT_EXTENSION = ".snapshot"
+SNAPSHOT_MAGIC = b"CASKGRPH"
+SNAPSHOT_VERSION = 1
+
+# Kinds of terms in the term table
+URI_TERM = 0
+BNODE_TERM = 1
+LITERAL_TERM = 2
+
+# Length of a string in the term table
+_LENGTH = struct.Struct("<I")
+
+
+def get_snapshot_location(ontology_file: str) -> str:
+	return ontology_file + SNAPSHOT_EXTENSION
+
+
+def _write_string(output: bytearray, value: str) -> None:
+	encoded_value = value.encode("utf-8")
+	output += _LENGTH.pack(len(encoded_value))
+	output += encoded_value
+
+
+def _read_string(buffer, offset: int) -> Tuple[str, int]:
+	length = _LENGTH.unpack_from(buffer, offset)[0]
+	offset += _LENGTH.size
+	return str(buffer[offset:offset + length], "utf-8"), offset + length
+
+
+def _decode_term(buffer, offset: int, terms: List[Node]) -> Tuple[Node, int]:
+	kind = buffer[offset]
+	value, offset = _read_string(buffer, offset + 1)
+	if kind == LITERAL_TERM:
+		# Datatypes are stored as ids of earlier terms (0 for none), so that they are stored only once
+		datatype_id = _LENGTH.unpack_from(buffer, offset)[0]
+		language, offset = _read_string(buffer, offset + _LENGTH.size)
+		return Literal(value, lang=language or None, datatype=terms[datatype_id - 1] if datatype_id else None), offset
+	if kind == BNODE_TERM:
+		return BNode(value), offset
+	return URIRef(value), offset
+
+
+class _TermTable:
+	# Assigns an id to every distinct term and encodes the terms in the order of their ids
+	def __init__(self) -> None:
+		self.term_ids: Dict[Node, int] = {}
+		self.encoded_terms = bytearray()
+
+	def get_id(self, term: Node) -> int:
+		term_id = self.term_ids.get(term)
+		if term_id is not None:
+			return term_id
+		if isinstance(term, Literal):
+			datatype_id = self.get_id(term.datatype) + 1 if term.datatype else 0
+			self.encoded_terms.append(LITERAL_TERM)
+			_write_string(self.encoded_terms, str(term))
+			self.encoded_terms += _LENGTH.pack(datatype_id)
+			_write_string(self.encoded_terms, term.language or "")
+		elif isinstance(term, BNode):
+			self.encoded_terms.append(BNODE_TERM)
+			_write_string(self.encoded_terms, str(term))
+		else:
+			self.encoded_terms.append(URI_TERM)
+			_write_string(self.encoded_terms, str(term))
+		term_id = len(self.term_ids)
+		self.term_ids[term] = term_id
+		return term_id
+
+
+def write_graph_snapshot(graph: Graph, source_locations: set, snapshot_file: str) -> None:
+	'''
+	Writes a graph to a binary snapshot: A header with the content hashes of all source files, a table of all distinct terms and all triples as term ids.
+	'''
+	term_table = _TermTable()
+	triples = array("I")
+	for triple in graph:
+		triples.extend(term_table.get_id(term) for term in triple)
+
+	header = {
+		"version": SNAPSHOT_VERSION,
+		"byteOrder": sys.byteorder,
+		"sources": get_location_fingerprint(source_locations),
+		"terms": len(term_table.term_ids),
+		"triples": len(triples) // 3
+	}
+	encoded_header = json.dumps(header).encode("utf-8")
+	# Triples are aligned to 4 bytes, so that they can be read as an array of ids directly from the mapped file
+	prefix_length = len(SNAPSHOT_MAGIC) + _LENGTH.size + len(encoded_header) + len(term_table.encoded_terms)
+	padding = bytes(-prefix_length % 4)
+
+	# Written to a temporary file first, so that loaders never see an incomplete snapshot
+	temporary_file = f"{snapshot_file}.{os.getpid()}.tmp"
+	with open(temporary_file, "wb") as output:
+		output.write(SNAPSHOT_MAGIC)
+		output.write(_LENGTH.pack(len(encoded_header)))
+		output.write(encoded_header)
+		output.write(term_table.encoded_terms)
+		output.write(padding)
+		output.write(triples.tobytes())
+	os.replace(temporary_file, snapshot_file)
+
+
+def read_snapshot_header(snapshot_file: str) -> Dict | None:
+	# Returns None if the file is not a snapshot of the current version
+	with open(snapshot_file, "rb") as file:
+		if file.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+			return None
+		header_length = _LENGTH.unpack(file.read(_LENGTH.size))[0]
+		header = json.loads(file.read(header_length))
+	if header["version"] != SNAPSHOT_VERSION or header["byteOrder"] != sys.byteorder:
+		return None
+	return header
+
+
+def is_snapshot_stale(header: Dict) -> bool:
+	'''
+	A snapshot is stale if one of the source files it was compiled from changed (or doesn't exist anymore)
+	'''
+	sources: Dict[str, str] = header["sources"]
+	return get_location_fingerprint(sources.keys()) != sources
+
+
+def load_graph_snapshot(snapshot_file: str, graph: Graph) -> List[str] | None:
+	'''
+	Adds all triples of a snapshot to the graph. The snapshot is memory-mapped, so terms and triples are read without copying the file.
+	Returns the source locations of the snapshot, or None if it is stale or no valid snapshot. The graph is unchanged in this case
+	'''
+	start_time = time.time()
+	header = read_snapshot_header(snapshot_file)
+	if header is None or is_snapshot_stale(header):
+		return None
+
+	with open(snapshot_file, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+		buffer = memoryview(mapped_file)
+		try:
+			offset = len(SNAPSHOT_MAGIC)
+			header_length = _LENGTH.unpack_from(buffer, offset)[0]
+			offset += _LENGTH.size + header_length
+
+			terms: List[Node] = []
+			for _ in range(header["terms"]):
+				term, offset = _decode_term(buffer, offset, terms)
+				terms.append(term)
+
+			offset += -offset % 4
+			term_ids = buffer[offset:offset + header["triples"] * 3 * 4].cast("I")
+			try:
+				graph.addN((terms[term_ids[index]], terms[term_ids[index + 1]], terms[term_ids[index + 2]], graph) for index in range(0, len(term_ids), 3))
+			finally:
+				term_ids.release()
+		finally:
+			buffer.release()
+
+	print(f"Time for loading snapshot {snapshot_file}: {time.time() - start_time}")
+	return list(header["sources"].keys())
+
+
+def compile_ontology(ontology_file: str, snapshot_file: str | None = None, parse_workers: int = 0) -> str:
+	'''
+	Parses an ontology with all its imports and writes it to a snapshot (by default next to the ontology). Returns the location of the snapshot
+	'''
+	# Local import because the file query handler loads snapshots
+	from smt_planning.ontology_handling.query_handlers import FileQueryHandler
+
+	snapshot_file = snapshot_file or get_snapshot_location(ontology_file)
+	query_handler = FileQueryHandler(ontology_file, use_snapshot=False, parse_workers=parse_workers)
+	write_graph_snapshot(query_handler.graph, query_handler.get_parsed_locations(), snapshot_file)
+	return snapshot_file
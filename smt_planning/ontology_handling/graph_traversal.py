@@ -0,0 +1,437 @@
+from collections import Counter
+from enum import Enum
+from typing import Callable, Dict, Iterable, List, Set, Tuple, TYPE_CHECKING
+
+from rdflib import Graph, Literal, Namespace, URIRef, Variable
+from rdflib.namespace import RDF, RDFS
+from rdflib.query import Result
+from rdflib.term import Node
+
+from smt_planning.ontology_handling.prepared_queries import QueryBindings
+
+if TYPE_CHECKING:
+	from smt_planning.smt.planning_context import PlanningContext
+
+DINEN61360 = Namespace("http://www.w3id.org/hsu-aut/DINEN61360#")
+CSS = Namespace("http://www.w3id.org/hsu-aut/css#")
+CASK = Namespace("http://www.w3id.org/hsu-aut/cask#")
+VDI3682 = Namespace("http://www.w3id.org/hsu-aut/VDI3682#")
+OM = Namespace("http://openmath.org/vocab/math#")
+OM_RELATION1 = Namespace("http://www.openmath.org/cd/relation1#")
+
+IO_RELATIONS = (VDI3682.hasInput, VDI3682.hasOutput)
+FPB_TYPES = (VDI3682.Product, VDI3682.Information, VDI3682.Energy)
+
+
+class Extraction(str, Enum):
+	"""
+	Defines how the planning problem is extracted from the ontology.
+	SPARQL: Every query is evaluated by the query handler. Works for files and endpoints
+	GRAPH_TRAVERSAL: Query results are created by walking the triples of the graph directly. Only for ontology files, much faster than rdflib's SPARQL engine
+	DIFFERENTIAL: Both, differences between query results and traversal results are collected in the planning context. Used to check the graph traversal
+	"""
+	SPARQL = "sparql"
+	GRAPH_TRAVERSAL = "graph-traversal"
+	DIFFERENTIAL = "differential"
+
+
+def create_result(variable_names: List[str], rows: Iterable[Tuple]) -> Result:
+	# Creates a SELECT result like the one of a query. None stands for an unbound variable
+	variables = [Variable(name) for name in variable_names]
+	result = Result("SELECT")
+	result.vars = variables
+	result.bindings = [{variable: value for variable, value in zip(variables, row) if value is not None} for row in rows]
+	return result
+
+
+def _get_relation_type(relation: URIRef) -> Literal:
+	# Same as BIND(STRAFTER(STR(?relation), "has") AS ?relationType)
+	return Literal(str(relation).partition("has")[2])
+
+
+def _differs_from(term: Node, literal: Literal) -> bool:
+	# Same as FILTER(?term != literal). Terms that can't be compared are filtered out
+	try:
+		return bool(term.neq(literal))
+	except TypeError:
+		return False
+
+
+class GraphTraversal:
+	"""
+	Creates the results of all queries that set up a planning problem by walking the triples of a graph instead of evaluating SPARQL.
+	Every method returns the same rows as the query it replaces, including duplicates and unbound variables, so that results can be processed
+	the same way. Closures (e.g., rdfs:subClassOf*) are computed once per graph, so the graph must not be changed afterwards
+	"""
+	def __init__(self, graph: Graph) -> None:
+		self.graph = graph
+		self._superclasses: Dict[Node, Set[Node]] = {}
+		self._list_nodes: Dict[Node, List[Node]] = {}
+
+	def _objects(self, subject: Node, predicate: URIRef) -> List[Node]:
+		return list(self.graph.objects(subject, predicate))
+
+	def _subjects(self, predicate: URIRef, object: Node) -> List[Node]:
+		return list(self.graph.subjects(predicate, object))
+
+	def _optional_objects(self, subject: Node, predicate: URIRef) -> List[Node | None]:
+		# Like OPTIONAL { subject predicate ?object }: All objects or a single unbound one
+		return self._objects(subject, predicate) or [None]
+
+	def _get_superclasses(self, class_iri: Node) -> Set[Node]:
+		# All classes reached by rdfs:subClassOf*, including the class itself
+		superclasses = self._superclasses.get(class_iri)
+		if superclasses is None:
+			superclasses = {class_iri}
+			open_classes = [class_iri]
+			while open_classes:
+				for superclass in self.graph.objects(open_classes.pop(), RDFS.subClassOf):
+					if superclass not in superclasses:
+						superclasses.add(superclass)
+						open_classes.append(superclass)
+			self._superclasses[class_iri] = superclasses
+		return superclasses
+
+	def _get_list_nodes(self, list_node: Node) -> List[Node]:
+		# All nodes reached by rdf:rest*, including the node itself, in the order of the list
+		list_nodes = self._list_nodes.get(list_node)
+		if list_nodes is None:
+			list_nodes = [list_node]
+			seen = {list_node}
+			index = 0
+			while index < len(list_nodes):
+				for rest in self.graph.objects(list_nodes[index], RDF.rest):
+					if rest not in seen:
+						seen.add(rest)
+						list_nodes.append(rest)
+				index += 1
+			self._list_nodes[list_node] = list_nodes
+		return list_nodes
+
+	def _get_simple_data_types(self, instance_description: Node) -> List[Node]:
+		# ?id a ?dataType. ?dataType rdfs:subClassOf DINEN61360:Simple_Data_Type. FILTER(?dataType != DINEN61360:Simple_Data_Type)
+		return [data_type for data_type in self.graph.objects(instance_description, RDF.type)
+				if (data_type, RDFS.subClassOf, DINEN61360.Simple_Data_Type) in self.graph and data_type != DINEN61360.Simple_Data_Type]
+
+	def _get_capabilities(self, required_cap_iri: str) -> List[Tuple[Node, Node]]:
+		# Provided capabilities and the required one with their type (see VALUES ?capType and FILTER on ?requiredCap)
+		required_cap = URIRef(required_cap_iri)
+		return [(cap, cap_type) for cap_type in (CASK.ProvidedCapability, CASK.RequiredCapability) for cap in self.graph.subjects(RDF.type, cap_type)
+				if cap_type == CASK.ProvidedCapability or cap == required_cap]
+
+	def _get_instance_description_rows(self, instance_description: Node) -> List[Tuple[Node, Node | None, Node | None, Node | None]]:
+		# Data type and optional expression goal, logic interpretation and value of an instance description
+		return [(data_type, expr_goal, log, val) for data_type in self._get_simple_data_types(instance_description)
+				for expr_goal in self._optional_objects(instance_description, DINEN61360.Expression_Goal)
+				for log in self._optional_objects(instance_description, DINEN61360.Logic_Interpretation)
+				for val in self._optional_objects(instance_description, DINEN61360.Value)]
+
+	def _create_property_result(self, groups: Dict[Tuple, List[Node]]) -> Result:
+		# Groups of ?de ?capType ?dataType ?relationType ?expr_goal ?log ?val with all their caps (GROUP_CONCAT)
+		rows = [(de, Literal(",".join(str(cap) for cap in caps)), cap_type, data_type, relation_type, expr_goal, log, val)
+				for (de, cap_type, data_type, relation_type, expr_goal, log, val), caps in groups.items()]
+		return create_result(["de", "caps", "capType", "dataType", "relationType", "expr_goal", "log", "val"], rows)
+
+	def get_resource_properties(self) -> Result:
+		'''
+		Properties of resources that provide a capability (first query of get_all_properties)
+		'''
+		groups: Dict[Tuple, List[Node]] = {}
+		for resource, cap in self.graph.subject_objects(CSS.providesCapability):
+			for de in self.graph.objects(resource, DINEN61360.has_Data_Element):
+				for instance_description in self.graph.objects(de, DINEN61360.has_Instance_Description):
+					for inout in self.graph.subjects(VDI3682.isCharacterizedBy, instance_description):
+						# FILTER NOT EXISTS { ?inout a/rdfs:subClassOf VDI3682:State. }
+						if any((inout_type, RDFS.subClassOf, VDI3682.State) in self.graph for inout_type in self.graph.objects(inout, RDF.type)):
+							continue
+						for relation in IO_RELATIONS:
+							relation_type = _get_relation_type(relation)
+							for data_type, expr_goal, log, val in self._get_instance_description_rows(instance_description):
+								groups.setdefault((de, CASK.ProvidedCapability, data_type, relation_type, expr_goal, log, val), []).append(cap)
+		return self._create_property_result(groups)
+
+	def get_capability_properties(self, required_cap_iri: str) -> Result:
+		'''
+		Properties of the inputs and outputs of provided capabilities and the required capability (second query of get_all_properties)
+		'''
+		groups: Dict[Tuple, List[Node]] = {}
+		for cap, cap_type in self._get_capabilities(required_cap_iri):
+			for process in self.graph.subjects(CSS.requiresCapability, cap):
+				for relation in IO_RELATIONS:
+					relation_type = _get_relation_type(relation)
+					for inout in self.graph.objects(process, relation):
+						for instance_description in self.graph.objects(inout, VDI3682.isCharacterizedBy):
+							for de in self.graph.subjects(DINEN61360.has_Instance_Description, instance_description):
+								for data_type, expr_goal, log, val in self._get_instance_description_rows(instance_description):
+									groups.setdefault((de, cap_type, data_type, relation_type, expr_goal, log, val), []).append(cap)
+		return self._create_property_result(groups)
+
+	def get_capabilities(self, required_cap_iri: str) -> Result:
+		'''
+		Capabilities with their input data elements and resources (see get_provided_capabilities)
+		'''
+		required_cap = URIRef(required_cap_iri)
+		rows: Dict[Tuple, None] = {}
+		for cap_type in self.graph.subjects(RDFS.subClassOf, CSS.Capability):
+			for cap in self.graph.subjects(RDF.type, cap_type):
+				if not (cap_type == CASK.ProvidedCapability or cap == required_cap):
+					continue
+				resources = self._optional_objects_of_subjects(CSS.providesCapability, cap)
+				for process in self.graph.subjects(CSS.requiresCapability, cap):
+					for input in self.graph.objects(process, VDI3682.hasInput):
+						for instance_description in self.graph.objects(input, VDI3682.isCharacterizedBy):
+							for de in self.graph.subjects(DINEN61360.has_Instance_Description, instance_description):
+								for resource in resources:
+									rows[(cap, de, resource, cap_type)] = None
+		return create_result(["cap", "de", "res", "capType"], rows.keys())
+
+	def _optional_objects_of_subjects(self, predicate: URIRef, object: Node) -> List[Node | None]:
+		# Like OPTIONAL { ?subject predicate object }
+		return self._subjects(predicate, object) or [None]
+
+	def _get_state_classes(self, state: Node) -> List[Tuple[Node, Node]]:
+		# ?state a ?stateClass. ?stateClass rdfs:subClassOf* ?stateSubclass. ?stateSubclass rdfs:subClassOf VDI3682:State.
+		return [(state_class, state_subclass) for state_class in self.graph.objects(state, RDF.type) for state_subclass in self._get_superclasses(state_class)
+				if (state_subclass, RDFS.subClassOf, VDI3682.State) in self.graph]
+
+	def _count_first_or_second_argument(self, constraint: Node, argument: Node) -> int:
+		# Number of matches of ?constraint OM:arguments/rdf:rest/rdf:first|OM:arguments/rdf:first ?argument
+		matches = 0
+		for arguments in self.graph.objects(constraint, OM.arguments):
+			for rest in self.graph.objects(arguments, RDF.rest):
+				matches += (rest, RDF.first, argument) in self.graph
+			matches += (arguments, RDF.first, argument) in self.graph
+		return matches
+
+	def _get_equal_constraints(self, input_id: Node, output_id: Node) -> List[Node | None]:
+		# All equal constraints of any capability on an input and an output (optional part of get_output_influences_of_capabilities)
+		equal_constraints: List[Node | None] = []
+		for constraint in self.graph.subjects(OM.operator, OM_RELATION1.eq):
+			matches = self._count_first_or_second_argument(constraint, input_id) * self._count_first_or_second_argument(constraint, output_id)
+			if matches:
+				equal_constraints.extend([constraint] * (matches * len(self._subjects(CSS.isRestrictedBy, constraint))))
+		return equal_constraints or [None]
+
+	def get_output_influences(self, capability_iris: Iterable[str]) -> Result:
+		'''
+		Inputs and outputs of capabilities with the same type description (see get_output_influences_of_capabilities)
+		'''
+		rows = []
+		for cap in dict.fromkeys(URIRef(capability_iri) for capability_iri in capability_iris):
+			if (cap, RDF.type, CASK.ProvidedCapability) not in self.graph:
+				continue
+			for process in self.graph.subjects(CSS.requiresCapability, cap):
+				for input in self.graph.objects(process, VDI3682.hasInput):
+					for input_class, input_state_subclass in self._get_state_classes(input):
+						for input_id in self.graph.objects(input, VDI3682.isCharacterizedBy):
+							for input_de in self.graph.subjects(DINEN61360.has_Instance_Description, input_id):
+								for td in self.graph.objects(input_de, DINEN61360.has_Type_Description):
+									for data_type in self.graph.objects(input_id, RDF.type):
+										if (data_type, RDFS.subClassOf, DINEN61360.Simple_Data_Type) not in self.graph:
+											continue
+										for input_expression_goal in self._optional_objects(input_id, DINEN61360.Expression_Goal):
+											for input_value in self._optional_objects(input_id, DINEN61360.Value):
+												for output in self.graph.objects(process, VDI3682.hasOutput):
+													for output_class, output_state_subclass in self._get_state_classes(output):
+														for output_id in self.graph.objects(output, VDI3682.isCharacterizedBy):
+															if (output_id, RDF.type, data_type) not in self.graph:
+																continue
+															for output_de in self.graph.subjects(DINEN61360.has_Instance_Description, output_id):
+																if (output_de, DINEN61360.has_Type_Description, td) not in self.graph:
+																	continue
+																for output_value in self._optional_objects(output_id, DINEN61360.Value):
+																	for equal_constraint in self._get_equal_constraints(input_id, output_id):
+																		rows.append((cap, input_de, input_class, input_expression_goal, input_value, output_de, output_class, output_value,
+																					equal_constraint, input_state_subclass, output_state_subclass))
+		return create_result(["cap", "input_de", "inputClass", "inputExpressionGoal", "inputValue", "output_de", "outputClass", "outputValue",
+							"equalConstraint", "inputStateSubclass", "outputStateSubclass"], rows)
+
+	def _get_nested_arguments(self, constraint: Node) -> List[Node]:
+		# All nodes reached by (OM:arguments/rdf:rest*/rdf:first)*, including the constraint itself
+		nested_arguments = [constraint]
+		seen = {constraint}
+		index = 0
+		while index < len(nested_arguments):
+			for arguments in self.graph.objects(nested_arguments[index], OM.arguments):
+				for list_node in self._get_list_nodes(arguments):
+					for argument in self.graph.objects(list_node, RDF.first):
+						if argument not in seen:
+							seen.add(argument)
+							nested_arguments.append(argument)
+			index += 1
+		return nested_arguments
+
+	def get_capability_constraints(self) -> Result:
+		'''
+		Constraints of capabilities with all (nested) arguments that are inputs or outputs of the capability (see get_capability_constraints)
+		'''
+		groups: Dict[Tuple[Node, Node], Tuple[Dict[str, None], Dict[str, None]]] = {}
+		for process, cap in self.graph.subject_objects(CSS.requiresCapability):
+			input_ids = {id for input in self.graph.objects(process, VDI3682.hasInput) for id in self.graph.objects(input, VDI3682.isCharacterizedBy)}
+			output_ids = {id for output in self.graph.objects(process, VDI3682.hasOutput) for id in self.graph.objects(output, VDI3682.isCharacterizedBy)}
+			for constraint in self.graph.objects(cap, CSS.isRestrictedBy):
+				nested_arguments = self._get_nested_arguments(constraint)
+				# Arguments that are no input (or output) are bound to "" (see BIND(IF(BOUND(...))))
+				input_arguments = [str(argument) for argument in nested_arguments if argument in input_ids] or [""]
+				output_arguments = [str(argument) for argument in nested_arguments if argument in output_ids] or [""]
+				group_input_arguments, group_output_arguments = groups.setdefault((cap, constraint), ({}, {}))
+				group_input_arguments.update(dict.fromkeys(input_arguments))
+				group_output_arguments.update(dict.fromkeys(output_arguments))
+		rows = [(cap, constraint, Literal(",".join(input_arguments)), Literal(",".join(output_arguments)))
+				for (cap, constraint), (input_arguments, output_arguments) in groups.items()]
+		return create_result(["cap", "constraint", "inputArguments", "outputArguments"], rows)
+
+	def get_inits(self) -> Result:
+		'''
+		Actual values of data elements that belong to inputs or outputs of provided capabilities (see get_init)
+		'''
+		provided_ids = set()
+		for cap in self.graph.subjects(RDF.type, CASK.ProvidedCapability):
+			for process in self.graph.subjects(CSS.requiresCapability, cap):
+				for relation in IO_RELATIONS:
+					for inout in self.graph.objects(process, relation):
+						provided_ids.update(self.graph.objects(inout, VDI3682.isCharacterizedBy))
+
+		rows: Dict[Tuple, None] = {}
+		for de in self.graph.subjects(RDF.type, DINEN61360.Data_Element):
+			instance_descriptions = self._objects(de, DINEN61360.has_Instance_Description)
+			if not any(instance_description in provided_ids for instance_description in instance_descriptions):
+				continue
+			for instance_description in instance_descriptions:
+				if (instance_description, DINEN61360.Expression_Goal, Literal("Actual_Value")) not in self.graph:
+					continue
+				for log in self.graph.objects(instance_description, DINEN61360.Logic_Interpretation):
+					for val in self.graph.objects(instance_description, DINEN61360.Value):
+						rows[(de, log, val)] = None
+		return create_result(["de", "log", "val"], rows.keys())
+
+	def get_open_math_applications(self) -> Result:
+		'''
+		All OpenMath applications with their operator and arguments. Positions are counted like count(?argumentList)-1 (see from_open_math_in_graph)
+		'''
+		counts: Counter[Tuple] = Counter()
+		for application, arguments in self.graph.subject_objects(OM.arguments):
+			operators = self._objects(application, OM.operator)
+			for argument_list in self._get_list_nodes(arguments):
+				for list_node in self._get_list_nodes(argument_list):
+					for arg in self.graph.objects(list_node, RDF.first):
+						for arg_type in self.graph.objects(arg, RDF.type):
+							if not str(arg_type).startswith("http://openmath.org"):
+								continue
+							for operator in operators:
+								for arg_de in self._optional_objects_of_subjects(DINEN61360.has_Instance_Description, arg):
+									for arg_value in self._optional_objects(arg, OM.value):
+										counts[(application, arg_de, operator, arg_value, arg_type, arg)] += 1
+		rows = [(application, Literal(count - 1), operator, arg_de if arg_de is not None else arg, arg_type, arg_value, arg)
+				for (application, arg_de, operator, arg_value, arg_type, arg), count in counts.items()]
+		return create_result(["application", "position", "operator", "argName", "argType", "argValue", "arg"], rows)
+
+	def get_property_pairs_across_caps(self, required_cap_iri: str) -> Result:
+		'''
+		Non-variable data elements of capability inputs and outputs with their type description and state types (see PropertyPairCache.find_pairs_across_caps)
+		'''
+		rows: Dict[Tuple, None] = {}
+		for cap, _ in self._get_capabilities(required_cap_iri):
+			for process in self.graph.subjects(CSS.requiresCapability, cap):
+				for relation in IO_RELATIONS:
+					for in_out in self.graph.objects(process, relation):
+						for de in self.graph.objects(in_out, DINEN61360.has_Data_Element):
+							if (de, RDF.type, DINEN61360.Data_Element) not in self.graph:
+								continue
+							instance_descriptions = self._objects(de, DINEN61360.has_Instance_Description)
+							if not any(True for instance_description in instance_descriptions for _ in self.graph.objects(instance_description, DINEN61360.Expression_Goal)):
+								continue
+							# FILTER NOT EXISTS { ?de DINEN61360:has_Instance_Description ?idVar. ?idVar DINEN61360:Expression_Goal "Variable". }
+							if any((instance_description, DINEN61360.Expression_Goal, Literal("Variable")) in self.graph for instance_description in instance_descriptions):
+								continue
+							for td in self.graph.objects(de, DINEN61360.has_Type_Description):
+								for fpb_subtype in self.graph.objects(in_out, RDF.type):
+									for fpb_type in FPB_TYPES:
+										if fpb_type in self._get_superclasses(fpb_subtype):
+											rows[(cap, in_out, de, td, fpb_type, fpb_subtype)] = None
+		return create_result(["cap", "inOut", "de", "td", "fpbType", "fpbSubType"], rows.keys())
+
+	def _get_non_variable_data_elements(self, instance_description: Node) -> List[Node]:
+		# ?de DINEN61360:has_Instance_Description ?id. ?id DINEN61360:Expression_Goal ?eg. FILTER(?eg != "Variable")
+		if not any(_differs_from(expression_goal, Literal("Variable")) for expression_goal in self.graph.objects(instance_description, DINEN61360.Expression_Goal)):
+			return []
+		return self._subjects(DINEN61360.has_Instance_Description, instance_description)
+
+	def _get_fpb_subtypes(self, de: Node) -> List[Tuple[Node, Node, Set[Node]]]:
+		# States of a data element with their type and all of its VDI 3682 super types
+		return [(inout, fpb_subtype, self._get_superclasses(fpb_subtype).intersection(FPB_TYPES))
+				for inout in self.graph.subjects(DINEN61360.has_Data_Element, de) for fpb_subtype in self.graph.objects(inout, RDF.type)]
+
+	def get_property_pairs_in_caps(self) -> Result:
+		'''
+		Data elements that are set equal by a property constraint with two arguments (see PropertyPairCache.find_pairs_in_caps)
+		'''
+		rows: Dict[Tuple, None] = {}
+		for constraint in self.graph.subjects(RDF.type, CSS.PropertyConstraint):
+			if (constraint, OM.operator, OM_RELATION1.eq) not in self.graph:
+				continue
+			# OM:arguments (?ID_a ?ID_b)
+			for first_node in self.graph.objects(constraint, OM.arguments):
+				for second_node in self.graph.objects(first_node, RDF.rest):
+					if (second_node, RDF.rest, RDF.nil) not in self.graph:
+						continue
+					for id_a in self.graph.objects(first_node, RDF.first):
+						for id_b in self.graph.objects(second_node, RDF.first):
+							for de_a in self._get_non_variable_data_elements(id_a):
+								for de_b in self._get_non_variable_data_elements(id_b):
+									if any(substring in str(de) for de in (de_a, de_b) for substring in ("Module_StationID", "Slide")):
+										continue
+									if not any((de_b, DINEN61360.has_Type_Description, td) in self.graph for td in self.graph.objects(de_a, DINEN61360.has_Type_Description)):
+										continue
+									for inout_a, fpb_subtype_a, fpb_types_a in self._get_fpb_subtypes(de_a):
+										for inout_b, fpb_subtype_b, fpb_types_b in self._get_fpb_subtypes(de_b):
+											if not fpb_types_a.isdisjoint(fpb_types_b):
+												rows[(de_a, de_b, inout_a, inout_b, fpb_subtype_a, fpb_subtype_b)] = None
+		return create_result(["de_a", "de_b", "inout_a", "inout_b", "fpbSubType_a", "fpbSubType_b"], rows.keys())
+
+
+def _count_rows(result: Result, variables: List[Variable], concatenated_variables: Tuple[str, ...]) -> Counter:
+	# Rows as hashable tuples. Values of GROUP_CONCAT are compared without their order, which is not defined by SPARQL
+	rows: Counter = Counter()
+	for binding in result.bindings:
+		# Aggregates without any solution have a single empty row, which is skipped when the result is iterated
+		if not binding:
+			continue
+		row = []
+		for variable in variables:
+			value = binding.get(variable)
+			if value is not None and str(variable) in concatenated_variables:
+				value = tuple(sorted(str(value).split(",")))
+			row.append(value)
+		rows[tuple(row)] += 1
+	return rows
+
+
+def find_result_differences(name: str, query_result: Result, traversal_result: Result, concatenated_variables: Tuple[str, ...] = ()) -> List[str]:
+	'''
+	Compares the rows of a query result with the rows of the graph traversal. Rows are compared as multisets, the order of rows is not defined by SPARQL
+	'''
+	assert traversal_result.vars is not None
+	variables = traversal_result.vars
+	query_rows = _count_rows(query_result, variables, concatenated_variables)
+	traversal_rows = _count_rows(traversal_result, variables, concatenated_variables)
+	differences = []
+	for row, count in (query_rows - traversal_rows).items():
+		differences.append(f"{name}: {count} row(s) only found by SPARQL: {dict(zip(map(str, variables), row))}")
+	for row, count in (traversal_rows - query_rows).items():
+		differences.append(f"{name}: {count} row(s) only found by graph traversal: {dict(zip(map(str, variables), row))}")
+	return differences
+
+
+def extract(context: "PlanningContext", name: str, query_string: str, bindings: QueryBindings | None, traverse: Callable[[GraphTraversal], Result], concatenated_variables: Tuple[str, ...] = ()) -> Result:
+	'''
+	Returns the result of a query. Depending on the extraction of the context, the query is evaluated or its result is created by traverse (see Extraction)
+	'''
+	if context.extraction == Extraction.SPARQL:
+		return context.get_query_handler().query(query_string, bindings)
+
+	traversal_result = traverse(context.get_graph_traversal())
+	if context.extraction == Extraction.DIFFERENTIAL:
+		query_result = context.get_query_handler().query(query_string, bindings)
+		context.extraction_differences.extend(find_result_differences(name, query_result, traversal_result, concatenated_variables))
+	return traversal_result
@@ -0,0 +1,132 @@
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+from multiprocessing.pool import Pool
+from pathlib import Path
+from typing import List, Set, Tuple
+from urllib.parse import urlparse
+
+from rdflib import Graph
+from rdflib.namespace import OWL
+from rdflib.term import Node
+
+from smt_planning.ontology_handling.file_fingerprint import get_local_path
+
+# Number of parsed documents that are kept per process. Shared base ontologies are imported by many ontologies, so they are only parsed once
+MAX_CACHED_DOCUMENTS = 32
+
+
+class ParsedDocument:
+	def __init__(self, triples: List[Tuple[Node, Node, Node]], imported_locations: List[str]) -> None:
+		self.triples = triples
+		# Imported files are already resolved relative to the document
+		self.imported_locations = imported_locations
+
+
+class _TripleCollector(Graph):
+	# Collects parsed triples without indexing them, they are indexed only once when they are added to the graph of the import closure
+	def __init__(self) -> None:
+		super().__init__()
+		self.collected_triples: List[Tuple[Node, Node, Node]] = []
+
+	def add(self, triple):
+		self.collected_triples.append(triple)
+		return self
+
+	def addN(self, quads):
+		self.collected_triples.extend((subject, predicate, object) for subject, predicate, object, _ in quads)
+		return self
+
+	def get_triples(self) -> List[Tuple[Node, Node, Node]]:
+		# Some parsers (e.g., JSON-LD) write to the store directly
+		return self.collected_triples + list(super().triples((None, None, None)))
+
+
+# Parsed local documents by path and modification time, least recently used first
+_document_cache: OrderedDict[Tuple[str, int], ParsedDocument] = OrderedDict()
+
+
+def parse_document(location: str) -> ParsedDocument:
+	'''
+	Parses a single file or IRI on its own without following its imports. Worker function for parsing the documents of an import closure in parallel
+	'''
+	start_time = time.time()
+	collector = _TripleCollector()
+	collector.parse(location)
+	triples = collector.get_triples()
+
+	base = Path(location).parent
+	imported_locations = []
+	for imported in {object for _, predicate, object in triples if predicate == OWL.imports}:
+		iri = str(imported)
+		if urlparse(iri).scheme == "":
+			iri = str((base / iri).resolve())
+		imported_locations.append(iri)
+	print(f"Time for parsing {location}: {time.time() - start_time}")
+	return ParsedDocument(triples, imported_locations)
+
+
+def _get_cache_key(location: str) -> Tuple[str, int] | None:
+	# Only local files can be checked for changes, remote documents are parsed every time
+	path = get_local_path(location)
+	if path is None:
+		return None
+	return (path, os.stat(path).st_mtime_ns)
+
+
+def _get_cached_document(location: str) -> ParsedDocument | None:
+	cache_key = _get_cache_key(location)
+	document = _document_cache.get(cache_key) if cache_key else None
+	if document is not None:
+		_document_cache.move_to_end(cache_key)
+	return document
+
+
+def _cache_document(location: str, document: ParsedDocument) -> None:
+	cache_key = _get_cache_key(location)
+	if cache_key is None:
+		return
+	_document_cache[cache_key] = document
+	while len(_document_cache) > MAX_CACHED_DOCUMENTS:
+		_document_cache.popitem(last=False)
+
+
+def parse_import_closure(graph: Graph, location: str, parse_workers: int = 0) -> Set[str]:
+	'''
+	Adds a document and all documents it (transitively) imports to the graph. Returns the locations of all documents.
+	The closure is resolved level by level: All documents imported by the current level are parsed, in parallel on parse_workers processes if there is more than one.
+	Parsed local files are cached as long as they are not modified.
+	'''
+	parsed_locations = {location}
+	level = [location]
+	pool: Pool | None = None
+	try:
+		while level:
+			documents = {level_location: _get_cached_document(level_location) for level_location in level}
+			uncached_locations = [level_location for level_location, document in documents.items() if document is None]
+			# Daemonic processes (e.g., workers of a batch) can't start a pool of their own
+			if parse_workers > 0 and len(uncached_locations) > 1 and not multiprocessing.current_process().daemon:
+				if pool is None:
+					pool = multiprocessing.get_context("spawn").Pool(parse_workers)
+				parsed_documents = pool.map(parse_document, uncached_locations, chunksize=1)
+			else:
+				parsed_documents = [parse_document(uncached_location) for uncached_location in uncached_locations]
+			for uncached_location, document in zip(uncached_locations, parsed_documents):
+				_cache_document(uncached_location, document)
+				documents[uncached_location] = document
+
+			next_level = []
+			for document in documents.values():
+				assert document is not None
+				graph.addN((subject, predicate, object, graph) for subject, predicate, object in document.triples)
+				for imported_location in document.imported_locations:
+					if imported_location not in parsed_locations:
+						parsed_locations.add(imported_location)
+						next_level.append(imported_location)
+			level = next_level
+	finally:
+		if pool is not None:
+			pool.close()
+			pool.join()
+	return parsed_locations
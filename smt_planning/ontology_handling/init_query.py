@@ -1,7 +1,8 @@
-from smt_planning.smt.StateHandler import StateHandler
+from smt_planning.smt.planning_context import PlanningContext
 from smt_planning.dicts.PropertyDictionary import CapabilityType
+from smt_planning.ontology_handling.graph_traversal import extract
 		
-def get_init():
+def get_init(context: PlanningContext):
 	
 	query_string = """
 		PREFIX DINEN61360: <http://www.w3id.org/hsu-aut/DINEN61360#>
@@ -21,10 +22,8 @@ def get_init():
 			VALUES ?relation { VDI3682:hasInput VDI3682:hasOutput }.
 			?inout VDI3682:isCharacterizedBy ?id2.
 		}  """
-	stateHandler = StateHandler()
-	query_handler = stateHandler.get_query_handler()
-	property_dictionary = stateHandler.get_property_dictionary()
-	results = query_handler.query(query_string)
+	property_dictionary = context.get_property_dictionary()
+	results = extract(context, "Inits", query_string, None, lambda traversal: traversal.get_inits())
 	for row in results:
 		property_dictionary.add_instance_description(str(row['de']), "", CapabilityType.ProvidedCapability, "Actual_Value", str(row['log']), str(row['val']))
 		
\ No newline at end of file
@@ -0,0 +1,81 @@
+from collections import OrderedDict
+from typing import Dict, MutableSequence
+
+from smt_planning.ontology_handling.file_fingerprint import get_location_fingerprint
+from smt_planning.ontology_handling.query_handlers import CachingQueryHandler, FileQueryHandler
+
+# Memory of one parsed triple in an rdflib graph (measured with tracemalloc, including its terms)
+ESTIMATED_BYTES_PER_TRIPLE = 1600
+
+# Positions of the counters in the statistics of a cache
+HITS = 0
+MISSES = 1
+EVICTIONS = 2
+
+
+class CachedOntology:
+	def __init__(self, query_handler: CachingQueryHandler, import_fingerprint: Dict[str, str], estimated_memory: int) -> None:
+		self.query_handler = query_handler
+		self.import_fingerprint = import_fingerprint
+		self.estimated_memory = estimated_memory
+
+
+class OntologyCache:
+	"""
+	LRU cache of parsed ontologies together with the results of all queries on them (see CachingQueryHandler). Ontologies are identified by the content hash
+	of the file and of all files it imports, so the same upload is only parsed once no matter its filename. If the imported files changed, the ontology is parsed again.
+	Least recently used ontologies are evicted once there are more than max_entries or their estimated memory exceeds max_memory bytes.
+	statistics counts hits, misses and evictions. It may be shared between processes (e.g., a multiprocessing.Array)
+	"""
+	def __init__(self, max_entries: int, max_memory: int, statistics: MutableSequence[int] | None = None) -> None:
+		self.max_entries = max_entries
+		self.max_memory = max_memory
+		self.statistics = statistics if statistics is not None else [0, 0, 0]
+		self._entries: OrderedDict[str, CachedOntology] = OrderedDict()
+		self.memory = 0
+
+	def get_query_handler(self, filename: str, content_hash: str) -> CachingQueryHandler:
+		'''
+		Returns the query handler of the ontology with the given content hash. If it is not cached (or its imports changed), the file is parsed
+		'''
+		entry = self._entries.get(content_hash)
+		if entry is not None:
+			# The file itself is identified by the hash, so only the imported files need to be checked
+			imported_locations = set(entry.import_fingerprint.keys())
+			if get_location_fingerprint(imported_locations) == entry.import_fingerprint:
+				self._entries.move_to_end(content_hash)
+				self._count(HITS)
+				return entry.query_handler
+			self._remove(content_hash)
+
+		self._count(MISSES)
+		file_query_handler = FileQueryHandler(filename)
+		imported_locations = file_query_handler.get_parsed_locations() - {filename}
+		estimated_memory = len(file_query_handler.graph) * ESTIMATED_BYTES_PER_TRIPLE
+		entry = CachedOntology(CachingQueryHandler(file_query_handler), get_location_fingerprint(imported_locations), estimated_memory)
+		self._entries[content_hash] = entry
+		self.memory += estimated_memory
+		self._evict()
+		return entry.query_handler
+
+	def _evict(self) -> None:
+		# The newest entry is always kept, even if it exceeds the memory limit on its own
+		while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self.memory > self.max_memory):
+			oldest_hash = next(iter(self._entries))
+			self._remove(oldest_hash)
+			self._count(EVICTIONS)
+
+	def _remove(self, content_hash: str) -> None:
+		entry = self._entries.pop(content_hash)
+		self.memory -= entry.estimated_memory
+
+	def _count(self, counter: int) -> None:
+		get_lock = getattr(self.statistics, "get_lock", None)
+		if get_lock is None:
+			self.statistics[counter] += 1
+			return
+		with get_lock():
+			self.statistics[counter] += 1
+
+	def __len__(self) -> int:
+		return len(self._entries)
@@ -0,0 +1,35 @@
+import re
+from typing import Dict, Mapping
+
+from rdflib.plugins.sparql import prepareQuery
+from rdflib.plugins.sparql.sparql import Query
+from rdflib.term import Identifier
+
+# Values of query variables by their name (without ?), e.g., {"requiredCap": URIRef(required_capability_iri)}
+QueryBindings = Mapping[str, Identifier]
+
+# Every query is parsed and translated to SPARQL algebra only once per process
+_prepared_queries: Dict[str, Query] = {}
+
+
+def get_prepared_query(query_string: str) -> Query:
+	'''
+	Returns the compiled query. It is prepared on first use, afterwards the same query object is used for all graphs
+	'''
+	prepared_query = _prepared_queries.get(query_string)
+	if prepared_query is None:
+		prepared_query = prepareQuery(query_string)
+		_prepared_queries[query_string] = prepared_query
+	return prepared_query
+
+
+def bind_query_text(query_string: str, bindings: QueryBindings | None) -> str:
+	'''
+	Replaces the bound variables of a query by their values, e.g., for endpoints that don't support initial bindings.
+	Values are written in N3, which fails for IRIs with characters that are not allowed in IRIs. So values can't change the structure of the query
+	'''
+	if not bindings:
+		return query_string
+	for name, value in bindings.items():
+		query_string = re.sub(rf"[?$]{re.escape(name)}\b", lambda _: value.n3(), query_string)
+	return query_string
@@ -0,0 +1,90 @@
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+
+from rdflib.query import Result
+
+# Directory for query results that are kept across processes, e.g., for repeated CLI calls on the same ontology
+DEFAULT_QUERY_CACHE_DIRECTORY = os.path.join(tempfile.gettempdir(), "caskade-planner", "query-results")
+# Number of query results that are kept in memory and in a cache directory. Older ones are removed
+MAX_CACHED_QUERY_RESULTS = 256
+
+
+def normalize_query(query_string: str) -> str:
+	# Queries that only differ in indentation or line breaks share their result
+	return " ".join(query_string.split())
+
+
+class QueryResultCache:
+	"""
+	LRU cache of query results. Results are identified by the normalized query and the version of the graph they were queried on (e.g., a content hash of all parsed files),
+	so that a changed ontology never gets the results of an old one. If cache_directory is given, results are also written to disk as SPARQL JSON results
+	"""
+	def __init__(self, max_entries: int = MAX_CACHED_QUERY_RESULTS, cache_directory: str | None = None) -> None:
+		self.max_entries = max_entries
+		self.cache_directory = cache_directory
+		self._results: OrderedDict[str, Result] = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+
+	def _get_key(self, graph_version: str, query_string: str) -> str:
+		return hashlib.sha256(f"{graph_version}\n{normalize_query(query_string)}".encode("utf-8")).hexdigest()
+
+	def get(self, graph_version: str, query_string: str) -> Result | None:
+		key = self._get_key(graph_version, query_string)
+		result = self._results.get(key)
+		if result is not None:
+			self._results.move_to_end(key)
+			self.hits += 1
+			return result
+
+		if self.cache_directory:
+			file_path = os.path.join(self.cache_directory, f"{key}.json")
+			if os.path.isfile(file_path):
+				with open(file_path, 'rb') as file:
+					result = Result.parse(file, format="json")
+				result.bindings
+				self._add(key, result)
+				self.hits += 1
+				return result
+
+		self.misses += 1
+		return None
+
+	def put(self, graph_version: str, query_string: str, result: Result) -> None:
+		'''
+		Adds the result of a query. Its bindings are collected, so that the result can be iterated by every planning problem
+		'''
+		# Bindings of rdflib reference the graph they were queried on. As plain dicts, cached results don't keep graphs in memory
+		result.bindings = [dict(binding) for binding in result.bindings]
+		key = self._get_key(graph_version, query_string)
+		self._add(key, result)
+		if self.cache_directory:
+			os.makedirs(self.cache_directory, exist_ok=True)
+			# Written to a temporary file first, so that other processes never read an incomplete result
+			file_path = os.path.join(self.cache_directory, f"{key}.json")
+			temporary_file_path = f"{file_path}.{os.getpid()}.tmp"
+			result.serialize(temporary_file_path, format="json")
+			os.replace(temporary_file_path, file_path)
+			self._remove_old_results()
+
+	def _add(self, key: str, result: Result) -> None:
+		self._results[key] = result
+		self._results.move_to_end(key)
+		while len(self._results) > self.max_entries:
+			self._results.popitem(last=False)
+
+	def _remove_old_results(self) -> None:
+		assert self.cache_directory
+		cached_files = [os.path.join(self.cache_directory, filename) for filename in os.listdir(self.cache_directory) if filename.endswith(".json")]
+		cached_files.sort(key=os.path.getmtime)
+		for cached_file in cached_files[:-self.max_entries]:
+			os.remove(cached_file)
+
+	def __len__(self) -> int:
+		return len(self._results)
+
+
+# Shared by all file query handlers of a process, so that repeated plans on an unchanged ontology don't evaluate any query again
+default_query_cache = QueryResultCache()
@@ -1,95 +1,200 @@
-from typing import TypedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple, TypedDict
 from rdflib import Graph, URIRef, Literal, Variable
 from rdflib.query import Result
-from rdflib.namespace import OWL
-from urllib.parse import urlparse
-from pathlib import Path
+import os
 import json
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from abc import ABC, abstractmethod
+from smt_planning.ontology_handling.file_fingerprint import get_content_hash, get_location_fingerprint
+from smt_planning.ontology_handling.import_closure import parse_import_closure
+from smt_planning.ontology_handling.query_cache import QueryResultCache, default_query_cache
+from smt_planning.ontology_handling.prepared_queries import QueryBindings, bind_query_text, get_prepared_query
+from smt_planning.ontology_handling.graph_traversal import GraphTraversal
 
 class QueryHandler(ABC):
 
 	@abstractmethod
-	def query(self, query_string: str) -> Result:
+	def query(self, query_string: str, bindings: QueryBindings | None = None) -> Result:
+		# Variables in bindings are bound to their values before the query is evaluated (e.g., {"requiredCap": URIRef(iri)} for ?requiredCap)
 		pass
 
+	def query_all(self, queries: List[Tuple[str, QueryBindings | None]]) -> List[Result]:
+		# Runs independent queries. Handlers that can run queries concurrently override this
+		return [self.query(query_string, bindings) for query_string, bindings in queries]
+
+	def get_graph_traversal(self) -> GraphTraversal:
+		# Only handlers with an in-memory graph can be traversed
+		raise Exception("The graph traversal extraction needs an ontology file. Use the SPARQL extraction instead.")
+
 class FileQueryHandler(QueryHandler):
-	def __init__(self, filename: str) -> None:
-		# Create a Graph
-		from smt_planning.smt.StateHandler import StateHandler
-		state_handler = StateHandler()
-		graph = Graph()
-		state_handler.set_graph(graph)
+	"""
+	Queries an ontology file with all its imports. Results are kept in query_cache (by default shared by all handlers of the process) together with a content hash of all parsed files,
+	so that repeated plans on an unchanged ontology skip query evaluation. The graph must not be changed after loading, otherwise cached results would be outdated
+	"""
+	def __init__(self, filename: str, use_snapshot: bool = True, parse_workers: int = 0, query_cache: QueryResultCache | None = default_query_cache) -> None:
+		# Every handler has its own graph, so that handlers of different planning problems don't interfere
+		self.graph = Graph()
+		self.query_cache = query_cache
+		self._graph_traversal: GraphTraversal | None = None
 
 		self._parsed = set()
-		self._parse_file(graph, filename)
-	
-	def _parse_file(self, graph: Graph, location: str) -> None:
-		"""Parse a file/IRI into ``graph`` and follow imports."""
-
-		if location in self._parsed:
-				return
-		self._parsed.add(location)
-
-		graph.parse(location)
-
-		base = Path(location).parent
-		for imported in set(graph.objects(None, OWL.imports)):
-				iri = str(imported)
-				if urlparse(iri).scheme == "":
-					iri = str((base / iri).resolve())
-				self._parse_file(graph, iri)
-
-	def query(self, query_string: str) -> Result:
-		from smt_planning.smt.StateHandler import StateHandler
-		graph = StateHandler().get_graph()
-		results = graph.query(query_string)
+		if not (use_snapshot and self._load_snapshot(filename)):
+			# Imported documents are parsed in parallel on parse_workers processes (see parse_import_closure)
+			self._parsed = parse_import_closure(self.graph, filename, parse_workers)
+		self.graph_version = get_content_hash(json.dumps(get_location_fingerprint(self._parsed)).encode("utf-8"))
+
+	def _load_snapshot(self, filename: str) -> bool:
+		"""Load a compiled snapshot (the file itself or <filename>.snapshot) instead of parsing. False if there is no up-to-date snapshot."""
+		# Local import because snapshots are compiled with a file query handler
+		from smt_planning.ontology_handling.graph_snapshot import SNAPSHOT_EXTENSION, get_snapshot_location, load_graph_snapshot
+
+		snapshot_file = filename if filename.endswith(SNAPSHOT_EXTENSION) else get_snapshot_location(filename)
+		if not os.path.isfile(snapshot_file):
+			return False
+		source_locations = load_graph_snapshot(snapshot_file, self.graph)
+		if source_locations is None:
+			if snapshot_file == filename:
+				raise Exception(f"Snapshot {snapshot_file} is outdated or invalid. Compile the ontology again.")
+			print(f"Snapshot {snapshot_file} is outdated, parsing {filename} instead.")
+			return False
+		self._parsed.update(source_locations)
+		return True
+
+	def get_parsed_locations(self) -> set:
+		# The file itself and all (transitively) imported files or IRIs
+		return set(self._parsed)
+
+	def query(self, query_string: str, bindings: QueryBindings | None = None) -> Result:
+		if self.query_cache is None:
+			return self._evaluate(query_string, bindings)
+		# Results are cached by the query with its bound values
+		bound_query_string = bind_query_text(query_string, bindings)
+		results = self.query_cache.get(self.graph_version, bound_query_string)
+		if results is None:
+			results = self._evaluate(query_string, bindings)
+			self.query_cache.put(self.graph_version, bound_query_string, results)
 		return results
+
+	def _evaluate(self, query_string: str, bindings: QueryBindings | None) -> Result:
+		# Queries are only parsed once per process, values are bound without changing the query
+		return self.graph.query(get_prepared_query(query_string), initBindings=bindings)
+
+	def get_graph_traversal(self) -> GraphTraversal:
+		# Created on first use. Closures found by the traversal are kept for all planning problems on this graph
+		if self._graph_traversal is None:
+			self._graph_traversal = GraphTraversal(self.graph)
+		return self._graph_traversal
 	
 
 
+class CachingQueryHandler(QueryHandler):
+	"""
+	Wraps another query handler and keeps the result of every query. Planning problems for different required capabilities on the same ontology 
+	share all queries that don't depend on the required capability. Only valid as long as the ontology doesn't change
+	"""
+	def __init__(self, query_handler: QueryHandler) -> None:
+		self.query_handler = query_handler
+		self.results: Dict[str, Result] = {}
+		self.hits = 0
+		self.misses = 0
+
+	def query(self, query_string: str, bindings: QueryBindings | None = None) -> Result:
+		bound_query_string = bind_query_text(query_string, bindings)
+		result = self.results.get(bound_query_string)
+		if result is not None:
+			self.hits += 1
+			return result
+
+		self.misses += 1
+		result = self.query_handler.query(query_string, bindings)
+		# Bindings are collected once, so that the result can be iterated by every planning problem
+		result.bindings
+		self.results[bound_query_string] = result
+		return result
+
+	def query_all(self, queries: List[Tuple[str, QueryBindings | None]]) -> List[Result]:
+		# Only queries without a cached result are passed on, so that they can still run concurrently
+		bound_query_strings = [bind_query_text(query_string, bindings) for query_string, bindings in queries]
+		missing_queries = {bound_query_string: query for bound_query_string, query in zip(bound_query_strings, queries) if bound_query_string not in self.results}
+		for bound_query_string, result in zip(missing_queries.keys(), self.query_handler.query_all(list(missing_queries.values()))):
+			self.misses += 1
+			result.bindings
+			self.results[bound_query_string] = result
+		self.hits += len(queries) - len(missing_queries)
+		return [self.results[bound_query_string] for bound_query_string in bound_query_strings]
+
+	def get_graph_traversal(self) -> GraphTraversal:
+		return self.query_handler.get_graph_traversal()
+
+
 class SparqlEndpointQueryHandler(QueryHandler):
-	def __init__(self, endpoint_url) -> None:
+	"""
+	Queries a SPARQL endpoint over one pooled session, so that connections are kept alive across all queries of a planning problem. 
+	Responses are requested gzip-compressed, requests time out after timeout seconds and failed requests are retried with exponential backoff.
+	Independent queries are sent concurrently on up to max_concurrent_queries connections (see query_all)
+	"""
+	def __init__(self, endpoint_url, timeout: float = 60, retries: int = 3, backoff_factor: float = 0.5, max_concurrent_queries: int = 8) -> None:
 		self.endpoint_url = endpoint_url
+		self.timeout = timeout
+		self.max_concurrent_queries = max_concurrent_queries
 		# Define the headers
 		self.headers = {
 			"Accept": "application/sparql-results+json",  # or "application/sparql-results+xml" for XML format
+			"Accept-Encoding": "gzip",
 			"Content-Type": "application/sparql-query",
 		}
 		self.params = {
 			"infer": "false"
 		}
-	
-
-	def query(self, query_string: str) -> Result:
+		# SPARQL queries don't change data, so POST requests can be retried safely
+		retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=None, raise_on_status=False)
+		adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrent_queries, max_retries=retry)
+		self.session = requests.Session()
+		self.session.mount("http://", adapter)
+		self.session.mount("https://", adapter)
+
+	def query_all(self, queries: List[Tuple[str, QueryBindings | None]]) -> List[Result]:
+		if len(queries) < 2:
+			return super().query_all(queries)
+		with ThreadPoolExecutor(max_workers=min(self.max_concurrent_queries, len(queries))) as executor:
+			return list(executor.map(lambda query: self.query(*query), queries))
+
+	def query(self, query_string: str, bindings: QueryBindings | None = None) -> Result:
+		# Endpoints get the query with all values written into it
+		query_string = bind_query_text(query_string, bindings)
 
 		# Send the request
-		response = requests.post(self.endpoint_url, data=query_string, headers=self.headers, params=self.params)
+		response = self.session.post(self.endpoint_url, data=query_string, headers=self.headers, params=self.params, timeout=self.timeout)
 
 		# Check if the request was successful
 		if response.status_code == 200:
 			# Process the results and transform bindings to be compliant with rdflib Result
-			data = json.loads(response.text)
-			bindings = data['results']['bindings']
-			labels = [Variable(label) for label in data['head']['vars']]  # Creating Variable instances for each label
+			data = response.json()
+			labels = [(Variable(label), label) for label in data['head']['vars']]  # Creating Variable instances for each label
+			# The same IRIs and values occur in many rows. Each one is created once and shared by all rows
+			terms: Dict[Tuple[str, str], URIRef | Literal] = {}
 			rows = []
-			for b in bindings:
+			for b in data['results']['bindings']:
 				row = {}
-				for label in labels:
-					label_str = str(label)
-					if label_str in b:
-						# Creating URIRef or Literal based on the type
-						value = URIRef(b[label_str]['value']) if b[label_str]['type'] == 'uri' else Literal(b[label_str]['value'])
-						row[label] = value
-					else:
-						# row[label] = None
+				for label, label_str in labels:
+					cell = b.get(label_str)
+					if cell is None:
 						continue
+					key = (cell['type'], cell['value'])
+					term = terms.get(key)
+					if term is None:
+						# Creating URIRef or Literal based on the type
+						term = URIRef(cell['value']) if cell['type'] == 'uri' else Literal(cell['value'])
+						terms[key] = term
+					row[label] = term
 				rows.append(row)
 
 			# Creating an rdflib Result object
 			result = Result('SELECT')
-			result.vars = labels  # The variables selected in the SPARQL query
+			result.vars = [label for label, _ in labels]  # The variables selected in the SPARQL query
 			result.bindings = rows  # The rows of results
 
 			return result
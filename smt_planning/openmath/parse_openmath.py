@@ -1,12 +1,15 @@
 from rdflib import Variable
+from rdflib.query import Result
 from rdflib.term import Identifier
 from typing import List, Dict, Mapping, Callable, MutableSequence
 from collections import defaultdict
-from smt_planning.dicts.name_util import convert_iri_to_z3_variable
-from smt_planning.smt.StateHandler import StateHandler
+from functools import reduce
+from z3 import ExprRef, And, Or, Distinct, If, BoolVal, IntVal, RealVal
+from smt_planning.smt.planning_context import PlanningContext
 from smt_planning.openmath.math_symbol_information import MathSymbolInformation
 from smt_planning.openmath.operator_dictionary import OperatorDictionary
 from smt_planning.openmath.application import Application
+from smt_planning.ontology_handling.graph_traversal import extract
 
 # Define some helper Variables to get binding values
 APPLICATION = Variable("application")
@@ -18,9 +21,28 @@ CONTEXT = Variable("context")
 OPERATOR = Variable("operator")
 POSITION = Variable("position")
 
-def from_open_math_in_graph( query_handler, rootApplicationIri: str, happening: int, event: int) -> str:
-	# Converts OpenMath contained in a Graph into a textual, human-readable formula
+def from_open_math_in_graph(context: PlanningContext, rootApplicationIri: str, happening: int) -> ExprRef:
+	# Converts OpenMath contained in a Graph into a Z3 expression over the property occurrences of the given happening
+	constraint_tree = get_constraint_tree(context, rootApplicationIri)
+	return get_tree_expression(context, constraint_tree, happening)
 
+
+def get_constraint_tree(context: PlanningContext, root_application_iri: str) -> Dict:
+	'''
+	Returns the OpenMath application with the given IRI as a tree: {"operator": <OpenMath operator IRI>, "arguments": [...]}. Arguments are trees themselves, 
+	{"variable": <data element IRI>} or {"literal": <value>}. Trees are parsed once per planning context (or loaded from a planning model) and used for all happenings
+	'''
+	constraint_tree = context.constraint_trees.get(root_application_iri)
+	if constraint_tree is None:
+		bindings = get_open_math_applications(context).bindings
+		# Get root application to start the whole recursive parsing procedure
+		root_application = get_root_application(bindings, root_application_iri)
+		constraint_tree = get_application_tree(root_application, bindings)
+		context.constraint_trees[root_application_iri] = constraint_tree
+	return constraint_tree
+
+
+def get_open_math_applications(context: PlanningContext) -> Result:
 	# Query to get OpenMath applications with operators and variables. Works also for nested applications. Positions stores arguments position, 
 	# so that, e.g.,  "x / y" and "y / x" can be distinguished. Protect this query at all cost...
 	# Note: We take the Data Element as ?argName instead of the actual arguments property OM:name. This is because we use DE IRIs as SMT variable names
@@ -51,47 +73,55 @@ def from_open_math_in_graph( query_handler, rootApplicationIri: str, happening:
 	GROUP BY ?application ?argDE ?operator ?argValue ?argType ?arg
 	"""
 	
-	# Fire query and get results as an array
-	queryResults = QueryCache.query(query_handler, queryString)
-	
-	# Get root application to start the whole recursive parsing procedure
-	rootApplication = get_root_application(queryResults.bindings, rootApplicationIri)
-	string = get_arguments_of_application(rootApplication, queryResults.bindings, happening, event)
-	
-	return string
-
-
-def create_expression(operator:MathSymbolInformation, argumentExpression: list[str] | str, happening: int, event: int, pad: bool):
-	# Creates a string expression for a given operator and arguments. Handles unary and binary functions 
-	arity = operator.arity
-	operatorSymbol = f" {operator.symbol} "
-	expression = ""
-	if (arity == 1):
-		# Unary operators are constructed like <operator>(argument), e.g., sin(x)
-		expression = f"{operatorSymbol}({argumentExpression})"
-	if (arity == 2):
-		# Binary operators are constructed by concatenating operator and arguments, e.g. x + y + z...
-		# if pad:
-		property_dictionary = StateHandler().get_property_dictionary()
-		padded_expression = []
-		for elem in argumentExpression:
-			try:
-				relation_type = property_dictionary.get_property_relation_type(elem)
-				if relation_type == "Input":
-					z3_variable_name = convert_iri_to_z3_variable(elem, happening, 0)
-				else:
-					z3_variable_name = convert_iri_to_z3_variable(elem, happening, 1)
-				
-				padded_expression.append(f"|{z3_variable_name}|")
-			except:
-				# If finding the property fails, just insert the element. This is a bit hacky. 
-				# Would probably be better to pass an object with type info in the argumentlist so that we can check for the type (om:variable vs om:literal) here
-				padded_expression.append(f"{elem}")
-		# else: 
-			# padded_expression = [f"{elem}" for elem in argumentExpression]
-		expression = operatorSymbol.join(padded_expression)
-
-	return expression
+	# Fire query and get results as an array. The result contains all applications, so it is only queried once per planning context
+	if context.open_math_query_result is None:
+		context.open_math_query_result = extract(context, "OpenMath applications", queryString, None, lambda traversal: traversal.get_open_math_applications())
+	return context.open_math_query_result
+
+
+def create_expression(operator:MathSymbolInformation, arguments: List[ExprRef]) -> ExprRef:
+	# Creates a Z3 expression for a given operator and already converted arguments. Handles unary and binary functions
+	symbol = operator.symbol
+	if (operator.arity == 1):
+		argument = arguments[0]
+		match symbol:
+			case "abs":
+				return If(argument >= 0, argument, -argument)
+			case "sqrt":
+				return argument ** RealVal("1/2")
+			case _:
+				raise Exception(f"The OpenMath function {symbol} is not supported in capability constraints")
+
+	# Binary operators are applied to all arguments, e.g. x + y + z...
+	match symbol:
+		case "and":
+			return And(*arguments)
+		case "or":
+			return Or(*arguments)
+		case "distinct":
+			return Distinct(*arguments)
+		case "+":
+			return reduce(lambda left, right: left + right, arguments)
+		case "-":
+			return reduce(lambda left, right: left - right, arguments)
+		case "*":
+			return reduce(lambda left, right: left * right, arguments)
+		case "/":
+			return reduce(lambda left, right: left / right, arguments)
+
+	relations = {
+		"=": lambda left, right: left == right,
+		"<": lambda left, right: left < right,
+		">": lambda left, right: left > right,
+		"<=": lambda left, right: left <= right,
+		">=": lambda left, right: left >= right,
+	}
+	if symbol not in relations:
+		raise Exception(f"The OpenMath operator {symbol} is not supported in capability constraints")
+	# Relations with more than two arguments are chained, e.g. x <= y <= z
+	relation = relations[symbol]
+	comparisons = [relation(left, right) for left, right in zip(arguments, arguments[1:])]
+	return comparisons[0] if len(comparisons) == 1 else And(*comparisons)
 
 
 def matches_Iri_and_has_no_higher_parent(bindings: MutableSequence[Mapping[Variable, Identifier]], rootApplicationIri: str):
@@ -155,7 +185,7 @@ def get_root_application(bindings: MutableSequence[Mapping[Variable, Identifier]
 
 	return rootApplications[0]
 
-def get_arguments_of_application(parent_application: Application, bindings: MutableSequence[Mapping[Variable, Identifier]], happening: int, event: int)-> str:
+def get_application_tree(parent_application: Application, bindings: MutableSequence[Mapping[Variable, Identifier]]) -> Dict:
 	# Check if there are more entries with arguments under the current element's application. This is the case for non-nested terms like x+y+z...
 	filterSameApplications: Callable[[Mapping[Variable, Identifier]], bool] = lambda binding :binding.get(APPLICATION) == parent_application.application
 	argumentEntries = list(filter(filterSameApplications, bindings))
@@ -171,24 +201,18 @@ def get_arguments_of_application(parent_application: Application, bindings: Muta
 	
 	child_applications = convert_bindings_to_applications(child_bindings)
 
-	argumentNames = list()
+	arguments = list()
 	if (len(child_applications) > 0):
 		openMathOperator = str(argumentEntries[0].get(OPERATOR))
-		operator = OperatorDictionary.getSmtSymbol(openMathOperator)
 		for entry in argumentEntries:
 			# Bit ugly to have argType here, but we have to skip on applications
 			argType = str(entry.get(ARGTYPE))
 			if argType == 'http://openmath.org/vocab/math#Application':
 				continue
-			arg_name_or_value = get_arg_name(entry)
-			argumentNames.append(arg_name_or_value)
+			arguments.append(get_argument_tree(entry))
 		
-		argumentsOfChildApplications = list()
 		for childApp in child_applications:
-			argumentsFormula = get_arguments_of_application(childApp, bindings, happening, event)
-			argumentsOfChildApplications.append(argumentsFormula)
-		
-		string = create_expression(operator, [*argumentNames, *argumentsOfChildApplications], happening, event, False)
+			arguments.append(get_application_tree(childApp, bindings))
 	else:
 		allSameOperator = all(entry.get(OPERATOR) == argumentEntries[0].get(OPERATOR) for entry in argumentEntries)
 		
@@ -198,36 +222,42 @@ def get_arguments_of_application(parent_application: Application, bindings: Muta
 			raise Exception(f"Error trying to obtain the operator of application. Multiple operators found: {str(operators)}")
 
 		openMathOperator = str(argumentEntries[0].get(OPERATOR))
-		operator = OperatorDictionary.getSmtSymbol(openMathOperator)
 		
-		# getArgNames: Callable[[Mapping[Variable, Identifier]], str] = lambda binding: str(binding.get(ARGNAME))
 		for entry in argumentEntries:
-			arg_name_or_value = get_arg_name(entry)
-			argumentNames.append(arg_name_or_value)
-		
-		string = create_expression(operator, argumentNames, happening, event, True)
+			arguments.append(get_argument_tree(entry))
 	
-	return string
+	return {"operator": openMathOperator, "arguments": arguments}
 
 
-def get_arg_name(entry: Mapping[Variable, Identifier]):
+def get_argument_tree(entry: Mapping[Variable, Identifier]) -> Dict:
+	# Variables are data elements, literals are kept as their value
 	argType = str(entry.get(ARGTYPE))
 	if argType == 'http://openmath.org/vocab/math#Variable':
-		return str(entry.get(ARGNAME))
+		return {"variable": str(entry.get(ARGNAME))}
 	elif argType == 'http://openmath.org/vocab/math#Literal':
-		return str(entry.get(ARGVALUE))
-
-
-class QueryCache:
-	query_result = None
-
-	@staticmethod
-	def query(query_handler, query_string: str):
-		if(QueryCache.query_result is None):
-			QueryCache.query_result = query_handler.query(query_string)		
-
-		return QueryCache.query_result
-	
-	@staticmethod
-	def reset():
-		QueryCache.query_result = None
\ No newline at end of file
+		return {"literal": str(entry.get(ARGVALUE))}
+	raise Exception(f"Unknown OpenMath argument type {argType}")
+
+
+def get_tree_expression(context: PlanningContext, tree: Dict, happening: int) -> ExprRef:
+	# Variables are the Z3 variables of property occurrences (inputs before, outputs after a happening), literals are converted to Z3 values
+	if "variable" in tree:
+		property_iri = tree["variable"]
+		property_dictionary = context.get_property_dictionary()
+		event = 0 if property_dictionary.get_property_relation_type(property_iri) == "Input" else 1
+		return property_dictionary.get_property_occurence(property_iri, happening, event).z3_variable
+	if "literal" in tree:
+		return to_z3_value(tree["literal"])
+
+	operator = OperatorDictionary.getSmtSymbol(tree["operator"])
+	arguments = [get_tree_expression(context, argument, happening) for argument in tree["arguments"]]
+	return create_expression(operator, arguments)
+
+
+def to_z3_value(value: str) -> ExprRef:
+	if value.lower() in ("true", "false"):
+		return BoolVal(value.lower() == "true")
+	try:
+		return IntVal(int(value))
+	except ValueError:
+		return RealVal(value)
@@ -1,6 +1,18 @@
-from typing import Optional
+import contextlib
+import json
+import os
+import sys
+import time
+from typing import Iterator, List, Optional, TextIO
 from smt_planning import __app_name__, __version__
+from smt_planning.ontology_handling import graph_snapshot
+from smt_planning.ontology_handling.graph_traversal import Extraction
+from smt_planning.ontology_handling.query_cache import QueryResultCache, default_query_cache
 from smt_planning.smt.cask_to_smt import CaskadePlanner
+from smt_planning.smt.horizon_search import HorizonStrategy
+from smt_planning.smt.minimal_unsat_core import AssertionTracking
+from smt_planning.smt.planning_model import is_planning_model
+from smt_planning.smt.unsat_core_cache import DEFAULT_CACHE_DIRECTORY, compute_unsat_core
 import typer
 
 app = typer.Typer()
@@ -10,10 +22,40 @@ def _version_callback(value: bool) -> None:
 		typer.echo(f"{__app_name__} v{__version__}")
 		raise typer.Exit()
 
+def _stream_solutions(planner: CaskadePlanner, output: TextIO, max_happenings: int, max_solutions: int | None, time_limit: float | None, incremental: bool, portfolio_workers: int, horizon_strategy: HorizonStrategy, enumeration_workers: int) -> None:
+	# Every result is written as one JSON line and flushed right away, so that consumers can start with the first plans
+	for result in planner.iterate_solutions(max_happenings, max_solutions, time_limit, incremental, portfolio_workers, horizon_strategy, enumeration_workers):
+		output.write(json.dumps(result.to_json()) + "\n")
+		output.flush()
+
+@contextlib.contextmanager
+def _stream_output(stream: bool, plan_file: str | None) -> Iterator[TextIO]:
+	'''
+	Output for streamed plans, either the plan file or stdout. While streaming, timings are printed to stderr, so that stdout only contains JSON lines
+	'''
+	if not stream:
+		yield sys.stdout
+		return
+	# Worker processes are spawned and print to the file descriptor of stdout, so it is redirected to stderr as a whole. Plans are written to a copy of the original one
+	sys.stdout.flush()
+	stdout_descriptor = os.dup(sys.stdout.fileno())
+	os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+	output = open(plan_file, 'w') if plan_file else open(stdout_descriptor, 'w', closefd=False)
+	try:
+		yield output
+	finally:
+		output.close()
+		sys.stdout.flush()
+		os.dup2(stdout_descriptor, sys.stdout.fileno())
+		os.close(stdout_descriptor)
+
+def _get_query_cache(query_cache_directory: str | None) -> QueryResultCache:
+	return QueryResultCache(cache_directory=query_cache_directory) if query_cache_directory else default_query_cache
+
 @app.command()
 def plan_from_file(
 	ontology_file: str = typer.Argument(
-		help="Path to your ontology that is used for generating the planning problem",
+		help="Path to your ontology that is used for generating the planning problem. Can also be a planning model created with export-model",
 	),
 	required_capability_iri: str = typer.Argument(
 		help="IRI of the required capability to plan for.",
@@ -48,12 +90,111 @@ def plan_from_file(
 		"-all",
 		help="Find all possible solutions instead of just one (default: False)",
 	),
+	incremental: bool = typer.Option(
+		False,
+		"--incremental",
+		"-inc",
+		help="Keep one solver across all happenings and only add the constraints of each new happening (default: False)",
+	),
+	portfolio_workers: int = typer.Option(
+		0,
+		"--portfolio-workers",
+		"-pw",
+		help="Number of worker processes that check different numbers of happenings in parallel. 0 checks them one after another (default: 0)",
+	),
+	horizon_strategy: HorizonStrategy = typer.Option(
+		HorizonStrategy.LINEAR,
+		"--horizon-strategy",
+		"-hs",
+		case_sensitive=False,
+		help="Order in which numbers of happenings are checked: linear (1, 2, 3, ...), exponential (1, 2, 4, ... then binary search) or binary (max first, then binary search) (default: linear)",
+	),
+	unsat_core_timeout: Optional[float] = typer.Option(
+		None,
+		"--unsat-core-timeout",
+		"-uct",
+		help="Time in seconds for minimizing the unsat core. After that, the smallest core found so far is returned (default: no limit)",
+	),
+	assertion_tracking: AssertionTracking = typer.Option(
+		AssertionTracking.GROUP,
+		"--assertion-tracking",
+		"-at",
+		case_sensitive=False,
+		help="How assertions are tracked for unsat cores: individual (one literal per assertion), group (one literal per constraint family) or none (no unsat core) (default: group)",
+	),
+	lazy_unsat_core: bool = typer.Option(
+		False,
+		"--lazy-unsat-core",
+		"-luc",
+		help="Don't compute the unsat core if no plan is found. Instead, return a handle that can be passed to the unsat-core command (default: False)",
+	),
+	stream: bool = typer.Option(
+		False,
+		"--stream",
+		"-st",
+		help="Write every plan with the minimal number of happenings as one line of NDJSON as soon as it is found. Written to the plan file if given, otherwise to stdout (default: False)",
+	),
+	max_solutions: Optional[int] = typer.Option(
+		None,
+		"--max-solutions",
+		"-ms",
+		help="Maximum number of plans to stream (default: no limit)",
+	),
+	solution_time_limit: Optional[float] = typer.Option(
+		None,
+		"--solution-time-limit",
+		"-stl",
+		help="Time in seconds after which no more plans are streamed (default: no limit)",
+	),
+	enumeration_workers: int = typer.Option(
+		0,
+		"--enumeration-workers",
+		"-ew",
+		help="Number of worker processes that stream plans in parallel, each one for a different capability at happening 0. 0 streams them one after another (default: 0)",
+	),
+	query_cache_directory: Optional[str] = typer.Option(
+		None,
+		"--query-cache-directory",
+		"-qcd",
+		help="Directory in which query results are cached, so that later calls on the unchanged ontology skip all queries (default: results are only cached in memory)",
+	),
+	parse_workers: int = typer.Option(
+		0,
+		"--parse-workers",
+		"-psw",
+		help="Number of worker processes that parse the files imported by the ontology in parallel. 0 parses them one after another (default: 0)",
+	),
+	time_budget: Optional[float] = typer.Option(
+		None,
+		"--time-budget",
+		"-tb",
+		help="Time in seconds for the whole planning. If exceeded, a timeout result with everything found so far is returned (default: no limit)",
+	),
+	extraction: Extraction = typer.Option(
+		Extraction.SPARQL,
+		"--extraction",
+		"-ex",
+		case_sensitive=False,
+		help="How the planning problem is extracted from the ontology: sparql (rdflib evaluates all queries) or graph-traversal (walks the triples directly, much faster). Check an ontology with check-extraction first (default: sparql)",
+	),
 ) -> None:
-	planner = CaskadePlanner(required_capability_iri)
-	planner.with_file_query_handler(ontology_file)
-	result = planner.cask_to_smt(max_happenings, problem_file, model_file, plan_file, find_all_solutions)
-	result_json = result.to_json()
-	print(result_json)
+	with _stream_output(stream, plan_file) as output:
+		planner = CaskadePlanner(required_capability_iri)
+		if is_planning_model(ontology_file):
+			planner.with_model_file(ontology_file)
+		else:
+			planner.with_file_query_handler(ontology_file, parse_workers, _get_query_cache(query_cache_directory))
+		planner.with_unsat_core_time_budget(unsat_core_timeout)
+		planner.with_assertion_tracking(assertion_tracking)
+		planner.with_lazy_unsat_core(lazy_unsat_core, DEFAULT_CACHE_DIRECTORY)
+		planner.with_time_budget(time_budget)
+		planner.with_extraction(extraction)
+		if stream:
+			_stream_solutions(planner, output, max_happenings, max_solutions, solution_time_limit, incremental, portfolio_workers, horizon_strategy, enumeration_workers)
+			return
+		result = planner.cask_to_smt(max_happenings, problem_file, model_file, plan_file, find_all_solutions, incremental, portfolio_workers, horizon_strategy)
+		result_json = result.to_json()
+		print(result_json)
 
 
 @app.command()
@@ -94,13 +235,313 @@ def plan_from_endpoint(
 		"-all",
 		help="Find all possible solutions instead of just one (default: False)",
 	),
+	incremental: bool = typer.Option(
+		False,
+		"--incremental",
+		"-inc",
+		help="Keep one solver across all happenings and only add the constraints of each new happening (default: False)",
+	),
+	portfolio_workers: int = typer.Option(
+		0,
+		"--portfolio-workers",
+		"-pw",
+		help="Number of worker processes that check different numbers of happenings in parallel. 0 checks them one after another (default: 0)",
+	),
+	horizon_strategy: HorizonStrategy = typer.Option(
+		HorizonStrategy.LINEAR,
+		"--horizon-strategy",
+		"-hs",
+		case_sensitive=False,
+		help="Order in which numbers of happenings are checked: linear (1, 2, 3, ...), exponential (1, 2, 4, ... then binary search) or binary (max first, then binary search) (default: linear)",
+	),
+	unsat_core_timeout: Optional[float] = typer.Option(
+		None,
+		"--unsat-core-timeout",
+		"-uct",
+		help="Time in seconds for minimizing the unsat core. After that, the smallest core found so far is returned (default: no limit)",
+	),
+	assertion_tracking: AssertionTracking = typer.Option(
+		AssertionTracking.GROUP,
+		"--assertion-tracking",
+		"-at",
+		case_sensitive=False,
+		help="How assertions are tracked for unsat cores: individual (one literal per assertion), group (one literal per constraint family) or none (no unsat core) (default: group)",
+	),
+	lazy_unsat_core: bool = typer.Option(
+		False,
+		"--lazy-unsat-core",
+		"-luc",
+		help="Don't compute the unsat core if no plan is found. Instead, return a handle that can be passed to the unsat-core command (default: False)",
+	),
+	stream: bool = typer.Option(
+		False,
+		"--stream",
+		"-st",
+		help="Write every plan with the minimal number of happenings as one line of NDJSON as soon as it is found. Written to the plan file if given, otherwise to stdout (default: False)",
+	),
+	max_solutions: Optional[int] = typer.Option(
+		None,
+		"--max-solutions",
+		"-ms",
+		help="Maximum number of plans to stream (default: no limit)",
+	),
+	solution_time_limit: Optional[float] = typer.Option(
+		None,
+		"--solution-time-limit",
+		"-stl",
+		help="Time in seconds after which no more plans are streamed (default: no limit)",
+	),
+	enumeration_workers: int = typer.Option(
+		0,
+		"--enumeration-workers",
+		"-ew",
+		help="Number of worker processes that stream plans in parallel, each one for a different capability at happening 0. 0 streams them one after another (default: 0)",
+	),
+	query_timeout: float = typer.Option(
+		60,
+		"--query-timeout",
+		"-qt",
+		help="Time in seconds after which a query to the endpoint is cancelled (default: 60)",
+	),
+	query_retries: int = typer.Option(
+		3,
+		"--query-retries",
+		"-qr",
+		help="Number of retries with exponential backoff if a query to the endpoint fails (default: 3)",
+	),
+	time_budget: Optional[float] = typer.Option(
+		None,
+		"--time-budget",
+		"-tb",
+		help="Time in seconds for the whole planning. If exceeded, a timeout result with everything found so far is returned (default: no limit)",
+	),
 ) -> None:
+	with _stream_output(stream, plan_file) as output:
+		planner = CaskadePlanner(required_capability_iri)
+		planner.with_endpoint_query_handler(endpoint_url, query_timeout, query_retries)
+		planner.with_unsat_core_time_budget(unsat_core_timeout)
+		planner.with_assertion_tracking(assertion_tracking)
+		planner.with_lazy_unsat_core(lazy_unsat_core, DEFAULT_CACHE_DIRECTORY)
+		planner.with_time_budget(time_budget)
+		if stream:
+			_stream_solutions(planner, output, max_happenings, max_solutions, solution_time_limit, incremental, portfolio_workers, horizon_strategy, enumeration_workers)
+			return
+		result = planner.cask_to_smt(max_happenings, problem_file, model_file, plan_file, find_all_solutions, incremental, portfolio_workers, horizon_strategy)
+		result_json = result.to_json()
+		print(result_json)
+
+
+
+@app.command()
+def plan_batch_from_file(
+	ontology_file: str = typer.Argument(
+		help="Path to your ontology that is used for generating the planning problems",
+	),
+	required_capability_iris: List[str] = typer.Argument(
+		help="IRIs of all required capabilities to plan for.",
+	),
+	max_happenings: int = typer.Option(
+		20,
+		"--max-happenings",
+		"-mh",
+		help="Maximum number of happenings to consider (default: 20)",
+	),
+	plan_file: str = typer.Option(
+		None,
+		"--plan-file",
+		"-plan",
+		help="Path to where the results of all capabilities will be stored as JSON (default: None)",
+	),
+	find_all_solutions: bool = typer.Option(
+		False,
+		"--find-all-solutions",
+		"-all",
+		help="Find all possible solutions instead of just one (default: False)",
+	),
+	incremental: bool = typer.Option(
+		False,
+		"--incremental",
+		"-inc",
+		help="Keep one solver across all happenings and only add the constraints of each new happening (default: False)",
+	),
+	horizon_strategy: HorizonStrategy = typer.Option(
+		HorizonStrategy.LINEAR,
+		"--horizon-strategy",
+		"-hs",
+		case_sensitive=False,
+		help="Order in which numbers of happenings are checked: linear (1, 2, 3, ...), exponential (1, 2, 4, ... then binary search) or binary (max first, then binary search) (default: linear)",
+	),
+	unsat_core_timeout: Optional[float] = typer.Option(
+		None,
+		"--unsat-core-timeout",
+		"-uct",
+		help="Time in seconds for minimizing the unsat core. After that, the smallest core found so far is returned (default: no limit)",
+	),
+	assertion_tracking: AssertionTracking = typer.Option(
+		AssertionTracking.GROUP,
+		"--assertion-tracking",
+		"-at",
+		case_sensitive=False,
+		help="How assertions are tracked for unsat cores: individual (one literal per assertion), group (one literal per constraint family) or none (no unsat core) (default: group)",
+	),
+	lazy_unsat_core: bool = typer.Option(
+		False,
+		"--lazy-unsat-core",
+		"-luc",
+		help="Don't compute the unsat core if no plan is found. Instead, return a handle that can be passed to the unsat-core command (default: False)",
+	),
+	time_budget: Optional[float] = typer.Option(
+		None,
+		"--time-budget",
+		"-tb",
+		help="Time in seconds for planning each capability. If exceeded, a timeout result with everything found so far is returned (default: no limit)",
+	),
+	query_cache_directory: Optional[str] = typer.Option(
+		None,
+		"--query-cache-directory",
+		"-qcd",
+		help="Directory in which query results are cached, so that later calls on the unchanged ontology skip all queries (default: results are only cached in memory)",
+	),
+	parse_workers: int = typer.Option(
+		0,
+		"--parse-workers",
+		"-psw",
+		help="Number of worker processes that parse the files imported by the ontology in parallel. 0 parses them one after another (default: 0)",
+	),
+	batch_workers: int = typer.Option(
+		0,
+		"--batch-workers",
+		"-bw",
+		help="Number of worker processes that plan for different capabilities in parallel. 0 plans for them one after another (default: 0)",
+	),
+	extraction: Extraction = typer.Option(
+		Extraction.SPARQL,
+		"--extraction",
+		"-ex",
+		case_sensitive=False,
+		help="How the planning problem is extracted from the ontology: sparql (rdflib evaluates all queries) or graph-traversal (walks the triples directly, much faster). Check an ontology with check-extraction first (default: sparql)",
+	),
+) -> None:
+	planner = CaskadePlanner(required_capability_iris[0])
+	planner.with_file_query_handler(ontology_file, parse_workers, _get_query_cache(query_cache_directory))
+	planner.with_unsat_core_time_budget(unsat_core_timeout)
+	planner.with_assertion_tracking(assertion_tracking)
+	planner.with_lazy_unsat_core(lazy_unsat_core, DEFAULT_CACHE_DIRECTORY)
+	planner.with_time_budget(time_budget)
+	planner.with_extraction(extraction)
+	results = planner.plan_batch(required_capability_iris, max_happenings, find_all_solutions, incremental, horizon_strategy, batch_workers)
+	if plan_file:
+		with open(plan_file, 'w') as output:
+			json.dump(results, output, indent=2)
+	print(results)
+
+
+@app.command()
+def unsat_core(
+	handle: str = typer.Argument(
+		help="Unsat core handle of a planning result that was created with --lazy-unsat-core",
+	),
+	unsat_core_timeout: Optional[float] = typer.Option(
+		None,
+		"--unsat-core-timeout",
+		"-uct",
+		help="Time in seconds for minimizing the unsat core. After that, the smallest core found so far is returned (default: no limit)",
+	),
+	cache_directory: str = typer.Option(
+		DEFAULT_CACHE_DIRECTORY,
+		"--cache-directory",
+		"-cd",
+		help="Directory in which encodings of unsat results are cached",
+	),
+) -> None:
+	try:
+		unsat_core = compute_unsat_core(handle, unsat_core_timeout, cache_directory)
+	except ValueError as error:
+		typer.echo(str(error), err=True)
+		raise typer.Exit(code=1)
+	print({"handle": handle, "unsatCore": unsat_core})
+
+
+@app.command()
+def compile_ontology(
+	ontology_file: str = typer.Argument(
+		help="Path to your ontology that is compiled together with all its imports",
+	),
+	snapshot_file: Optional[str] = typer.Option(
+		None,
+		"--snapshot-file",
+		"-sf",
+		help="Path to the binary snapshot. Snapshots next to the ontology are used automatically when planning from the ontology file (default: <ontology_file>.snapshot)",
+	),
+	parse_workers: int = typer.Option(
+		0,
+		"--parse-workers",
+		"-psw",
+		help="Number of worker processes that parse the files imported by the ontology in parallel. 0 parses them one after another (default: 0)",
+	),
+) -> None:
+	start_time = time.time()
+	snapshot_file = graph_snapshot.compile_ontology(ontology_file, snapshot_file, parse_workers)
+	print(f"Compiled {ontology_file} to {snapshot_file} in {time.time() - start_time}")
+
+
+@app.command()
+def export_model(
+	ontology_file: str = typer.Argument(
+		help="Path to your ontology that the planning problem is extracted from",
+	),
+	required_capability_iri: str = typer.Argument(
+		help="IRI of the required capability to plan for.",
+	),
+	planning_model_file: str = typer.Argument(
+		help="Path to the planning model. Pass it to plan-from-file instead of the ontology to plan without loading the ontology",
+	),
+	parse_workers: int = typer.Option(
+		0,
+		"--parse-workers",
+		"-psw",
+		help="Number of worker processes that parse the files imported by the ontology in parallel. 0 parses them one after another (default: 0)",
+	),
+	extraction: Extraction = typer.Option(
+		Extraction.SPARQL,
+		"--extraction",
+		"-ex",
+		case_sensitive=False,
+		help="How the planning problem is extracted from the ontology: sparql (rdflib evaluates all queries) or graph-traversal (walks the triples directly, much faster). Check an ontology with check-extraction first (default: sparql)",
+	),
+) -> None:
+	start_time = time.time()
 	planner = CaskadePlanner(required_capability_iri)
-	planner.with_endpoint_query_handler(endpoint_url)
-	result = planner.cask_to_smt(max_happenings, problem_file, model_file, plan_file, find_all_solutions)
-	result_json = result.to_json()
-	print(result_json)
+	planner.with_file_query_handler(ontology_file, parse_workers)
+	planner.with_extraction(extraction)
+	planner.export_model(planning_model_file)
+	print(f"Exported the planning model for {required_capability_iri} from {ontology_file} to {planning_model_file} in {time.time() - start_time}")
+
 
+@app.command()
+def check_extraction(
+	ontology_file: str = typer.Argument(
+		help="Path to your ontology that is extracted with SPARQL queries and with the graph traversal",
+	),
+	required_capability_iri: str = typer.Argument(
+		help="IRI of the required capability to plan for.",
+	),
+	parse_workers: int = typer.Option(
+		0,
+		"--parse-workers",
+		"-psw",
+		help="Number of worker processes that parse the files imported by the ontology in parallel. 0 parses them one after another (default: 0)",
+	),
+) -> None:
+	start_time = time.time()
+	planner = CaskadePlanner(required_capability_iri)
+	planner.with_file_query_handler(ontology_file, parse_workers)
+	differences = planner.find_extraction_differences()
+	if differences:
+		for difference in differences:
+			typer.echo(difference, err=True)
+		raise typer.Exit(code=1)
+	print(f"SPARQL queries and graph traversal extract the same planning problem from {ontology_file} (checked in {time.time() - start_time})")
 
 
 @app.callback()
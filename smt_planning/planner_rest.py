@@ -1,14 +1,26 @@
 import os
 import tempfile
+import json
+import uuid
+import time
+from typing import Dict
 from flask import Flask, Response, request, jsonify
-from werkzeug.utils import secure_filename
 from werkzeug.datastructures import ImmutableMultiDict, FileStorage
 from flask_cors import CORS
 
-from smt_planning.smt.cask_to_smt import CaskadePlanner
+from smt_planning.ontology_handling.file_fingerprint import get_content_hash
+from smt_planning.ontology_handling.graph_traversal import Extraction
+from smt_planning.planning_jobs import PlanningJobs
+from smt_planning.planning_worker_pool import PlanningWorkerPool, PoolOverloadedError, PoolUnavailableError, QueryHandlerSource
+from smt_planning.smt.horizon_search import HorizonStrategy
+from smt_planning.smt.minimal_unsat_core import AssertionTracking
 
-UPLOAD_FOLDER = tempfile.gettempdir()
+UPLOAD_FOLDER = os.path.join(tempfile.gettempdir(), "caskade-planner", "uploads")
 ALLOWED_EXTENSIONS = {'txt', 'ttl', 'xml', 'owl', 'json'}
+# Seconds that clients are asked to wait before they retry an overloaded request
+RETRY_AFTER_SECONDS = 5
+# Seconds between two checks for new progress events of a job
+PROGRESS_POLL_INTERVAL = 0.2
 
 # Create API 
 app = Flask(__name__)
@@ -16,13 +28,16 @@ cors = CORS(app)
 app.secret_key = 'the random string'
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+planning_worker_pool: PlanningWorkerPool | None = None
+planning_jobs = PlanningJobs.from_environment()
+
 
 def allowed_file(filename: str) -> bool:
 	return '.' in filename and \
 		filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def setup_planner_with_file(files: ImmutableMultiDict[str, FileStorage], required_capability_iri: str) -> CaskadePlanner | tuple[Response, int]:
+def save_ontology_file(files: ImmutableMultiDict[str, FileStorage]) -> str | tuple[Response, int]:
 	if 'ontology-file' not in files:
 		return jsonify({'error': 'No file part'}), 400
 	
@@ -33,59 +48,226 @@ def setup_planner_with_file(files: ImmutableMultiDict[str, FileStorage], require
 		return jsonify({'error': 'No selected file'}), 400
 	
 	if file and allowed_file(file.filename):
-		filename = secure_filename(file.filename)
-		filename = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-		file.save(filename)
-
-		planner = CaskadePlanner(required_capability_iri)
-		planner.with_file_query_handler(filename)
-		return planner
+		# Uploads are stored under the hash of their content. Identical uploads share one file (and its parsed graph in the workers' ontology caches)
+		# and concurrent uploads with the same filename don't overwrite each other
+		content = file.read()
+		extension = file.filename.rsplit('.', 1)[1].lower()
+		filename = os.path.join(app.config['UPLOAD_FOLDER'], f"{get_content_hash(content)}.{extension}")
+		if not os.path.exists(filename):
+			os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+			temporary_filename = f"{filename}.{uuid.uuid4().hex}.tmp"
+			with open(temporary_filename, 'wb') as temporary_file:
+				temporary_file.write(content)
+			os.replace(temporary_filename, filename)
+		return filename
 	else: 
 		return jsonify({'error': 'File type not allowed'}), 400
 
 
+def get_planning_worker_pool() -> PlanningWorkerPool:
+	# The pool is normally started by create_app(). It is created on first use if the app is served directly
+	global planning_worker_pool
+	if planning_worker_pool is None:
+		planning_worker_pool = PlanningWorkerPool.from_environment()
+	return planning_worker_pool
+
+
+def pool_error_response(error: Exception) -> tuple[Response, int]:
+	response = jsonify({'error': str(error)})
+	if isinstance(error, PoolOverloadedError):
+		# Too many requests: Clients should retry after a short while
+		response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+		return response, 429
+	return response, 503
+
+
 @app.get('/ping')
 def ping():
 	return Response(status=204)
 
-# Wait for POST requests with a query param ?mode to /plan
-@app.post('/plan') # type: ignore
-def generate_and_solve_plan():
-	if (not request.is_json):
-		return jsonify({"message": "Request must be JSON"}), 400
-	
-	# Get JSON request body
-	data = request.get_json()
+def parse_planning_request(data: Dict) -> QueryHandlerSource | tuple[Response, int]:
+	# Validates a planning request and returns the source of its ontology. Defaults are set in data
 	mode = data.get('mode')
-	required_capability_iri = data.get('requiredCapabilityIri')
 
 	if mode == 'file':
-		planner = setup_planner_with_file(request.files, required_capability_iri) # type: ignore
-		# If the planner is a tuple, it contains an error response
-		if isinstance(planner, tuple):
-			return planner
+		filename = save_ontology_file(request.files) # type: ignore
+		# If the result is a tuple, it contains an error response
+		if isinstance(filename, tuple):
+			return filename
+		query_handler_source = ("upload", filename)
 		
 	elif mode == 'sparql-endpoint':
 		endpoint_url = data.get('endpointUrl')
 		
 		if not endpoint_url:
 			return jsonify({'error': 'No endpoint-url provided'}), 400
-		planner = CaskadePlanner(required_capability_iri)
-		planner.with_endpoint_query_handler(endpoint_url)
+		query_handler_source = ("sparql-endpoint", endpoint_url)
+
+	elif mode == 'preloaded':
+		ontology_name = data.get('ontologyName')
+		if not get_planning_worker_pool().has_ontology(ontology_name):
+			return jsonify({'error': f"Unknown ontologyName. Must be one of {list(get_planning_worker_pool().preloaded_ontologies.keys())}"}), 400
+		query_handler_source = ("preloaded", ontology_name)
 
-	max_happenings = data.get('maxHappenings')
-	find_all_solutions = data.get('findAllSolutions', False)
+	else:
+		return jsonify({'error': "Unknown mode. Must be one of ['file', 'sparql-endpoint', 'preloaded']"}), 400
+
+	try:
+		HorizonStrategy(data.get('horizonStrategy', HorizonStrategy.LINEAR.value))
+	except ValueError:
+		return jsonify({'error': f"Unknown horizonStrategy. Must be one of {[strategy.value for strategy in HorizonStrategy]}"}), 400
+	try:
+		AssertionTracking(data.get('assertionTracking', AssertionTracking.GROUP.value))
+	except ValueError:
+		return jsonify({'error': f"Unknown assertionTracking. Must be one of {[tracking.value for tracking in AssertionTracking]}"}), 400
+	try:
+		extraction = Extraction(data.get('extraction', Extraction.SPARQL.value))
+	except ValueError:
+		return jsonify({'error': f"Unknown extraction. Must be one of {[extraction.value for extraction in Extraction]}"}), 400
+	if extraction != Extraction.SPARQL and mode == 'sparql-endpoint':
+		return jsonify({'error': "SPARQL endpoints can only be queried with the extraction 'sparql'"}), 400
 	
 	# In case None gets passed as a max_happening, set back to default value of 5
-	if max_happenings == None:
-		max_happenings = 5
-	result = planner.cask_to_smt(max_happenings, None, None, None, find_all_solutions)
+	if data.get('maxHappenings') == None:
+		data['maxHappenings'] = 5
+	return query_handler_source
+
+# Wait for POST requests with a query param ?mode to /plan
+@app.post('/plan') # type: ignore
+def generate_and_solve_plan():
+	if (not request.is_json):
+		return jsonify({"message": "Request must be JSON"}), 400
+	
+	# Get JSON request body
+	data = request.get_json()
+	query_handler_source = parse_planning_request(data)
+	# If the result contains a response, it is an error response
+	if isinstance(query_handler_source[0], Response):
+		return query_handler_source
+
+	# Planning happens in a worker process of the pool. Requests wait there if all workers are busy
+	pool = get_planning_worker_pool()
+	try:
+		if data.get('stream', False):
+			# Each result is sent as one line of NDJSON as soon as it is found (chunked transfer encoding)
+			solutions = pool.stream(query_handler_source, data)
+			ndjson_lines = (json.dumps(solution) + "\n" for solution in solutions)
+			return Response(ndjson_lines, mimetype='application/x-ndjson')
+		result = pool.solve(query_handler_source, data)
+	except (PoolOverloadedError, PoolUnavailableError) as error:
+		return pool_error_response(error)
 	if result == None:
 		return jsonify({'error': 'No plan found'}), 204
-	return jsonify(result.to_json())
+	return jsonify(result)
+
+# Plans for a list of required capabilities on the same ontology. Returns the result of every capability by its IRI
+@app.post('/plan-batch') # type: ignore
+def generate_and_solve_plan_batch():
+	if (not request.is_json):
+		return jsonify({"message": "Request must be JSON"}), 400
+	
+	data = request.get_json()
+	query_handler_source = parse_planning_request(data)
+	# If the result contains a response, it is an error response
+	if isinstance(query_handler_source[0], Response):
+		return query_handler_source
+	required_capability_iris = data.get('requiredCapabilityIris')
+	if not isinstance(required_capability_iris, list) or len(required_capability_iris) == 0:
+		return jsonify({'error': 'No requiredCapabilityIris provided'}), 400
+
+	try:
+		results = get_planning_worker_pool().solve_batch(query_handler_source, data)
+	except (PoolOverloadedError, PoolUnavailableError) as error:
+		return pool_error_response(error)
+	return jsonify(results)
+
+# Starts planning in the background and returns a job that can be polled with GET /plans/<jobId>
+@app.post('/plans') # type: ignore
+def create_planning_job():
+	if (not request.is_json):
+		return jsonify({"message": "Request must be JSON"}), 400
+	
+	data = request.get_json()
+	query_handler_source = parse_planning_request(data)
+	# If the result contains a response, it is an error response
+	if isinstance(query_handler_source[0], Response):
+		return query_handler_source
+
+	try:
+		future, job_state, progress_events = get_planning_worker_pool().start_job(query_handler_source, data)
+	except (PoolOverloadedError, PoolUnavailableError) as error:
+		return pool_error_response(error)
+	job = planning_jobs.add(future, job_state, progress_events)
+	response = jsonify(job.to_json())
+	response.headers['Location'] = f"/plans/{job.job_id}"
+	return response, 202
+
+@app.get('/plans/<job_id>')
+def get_planning_job(job_id: str):
+	job = planning_jobs.get(job_id)
+	if job is None:
+		return jsonify({'error': f"Unknown job {job_id}"}), 404
+	return jsonify(job.to_json())
+
+# Streams the progress of a job as server-sent events. The last event contains the job once it is done
+@app.get('/plans/<job_id>/events')
+def get_planning_job_events(job_id: str):
+	job = planning_jobs.get(job_id)
+	if job is None:
+		return jsonify({'error': f"Unknown job {job_id}"}), 404
+
+	def generate_events():
+		sent_events = 0
+		while True:
+			# Checked before the events are read, so that no event of a finished job is missed
+			is_done = job.future.done()
+			progress_events = job.progress_events[sent_events:]
+			for progress_event in progress_events:
+				yield f"event: {progress_event['eventType']}\ndata: {json.dumps(progress_event)}\n\n"
+			sent_events += len(progress_events)
+			if is_done:
+				yield f"event: job_{job.get_status().value}\ndata: {json.dumps(job.to_json())}\n\n"
+				return
+			time.sleep(PROGRESS_POLL_INTERVAL)
+
+	return Response(generate_events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+# Cancels a queued or running job. Finished jobs are deleted together with their result
+@app.delete('/plans/<job_id>')
+def delete_planning_job(job_id: str):
+	job = planning_jobs.get(job_id)
+	if job is None:
+		return jsonify({'error': f"Unknown job {job_id}"}), 404
+	if job.future.done():
+		planning_jobs.remove(job_id)
+		return Response(status=204)
+	job.cancel()
+	return jsonify(job.to_json()), 202
+
+# Computes the unsat core of an earlier unsat result that was created with lazyUnsatCore
+@app.get('/unsat-core/<handle>')
+def get_unsat_core(handle: str):
+	timeout = request.args.get('timeout', type=float)
+	try:
+		unsat_core = get_planning_worker_pool().compute_unsat_core(handle, timeout)
+	except (PoolOverloadedError, PoolUnavailableError) as error:
+		return pool_error_response(error)
+	except ValueError as error:
+		return jsonify({'error': str(error)}), 404
+	return jsonify({'handle': handle, 'unsatCore': unsat_core})
+
+# Current load of the worker pool
+@app.get('/status')
+def get_status():
+	return jsonify(get_planning_worker_pool().get_status())
+
+def create_app() -> Flask:
+	# Starts all planning workers (and preloads their ontologies) before the first request is accepted
+	get_planning_worker_pool().start()
+	return app
 
 def run():
-	app.run()
+	create_app().run(threaded=True)
 
 if __name__ == '__main__': 
 	run()
\ No newline at end of file
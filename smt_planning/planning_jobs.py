@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from datetime import datetime
+from enum import Enum
+from typing import Dict, List
+
+
+class PlanningJobStatus(str, Enum):
+	QUEUED = "queued"
+	RUNNING = "running"
+	FINISHED = "finished"
+	FAILED = "failed"
+	CANCELLED = "cancelled"
+
+
+class PlanningJob:
+	"""
+	A planning request that is solved in the background by the worker pool. The future returns the JSON of the result together with the start and end time of planning
+	"""
+	def __init__(self, future: Future, job_state: Dict, progress_events: List[Dict]) -> None:
+		self.job_id = uuid.uuid4().hex
+		self.future = future
+		# Shared with the worker process, see run_planning_job
+		self.job_state = job_state
+		self.progress_events = progress_events
+		self.submit_time = time.time()
+		# Time at which the job was finished, failed or cancelled. Jobs are evicted relative to this time
+		self.finish_time: float | None = None
+		self.cancel_requested = False
+		future.add_done_callback(self._set_finish_time)
+
+	def _set_finish_time(self, future: Future) -> None:
+		self.finish_time = time.time()
+
+	def get_status(self) -> PlanningJobStatus:
+		if self.future.cancelled():
+			return PlanningJobStatus.CANCELLED
+		if not self.future.done():
+			# The future is already running while it waits in the call queue of the executor, so the worker's start time is used
+			return PlanningJobStatus.RUNNING if "startTime" in self.job_state else PlanningJobStatus.QUEUED
+		if self.future.exception() is not None:
+			return PlanningJobStatus.FAILED
+		# Interrupted jobs still have a (timeout) result
+		return PlanningJobStatus.CANCELLED if self.cancel_requested else PlanningJobStatus.FINISHED
+
+	def cancel(self) -> None:
+		'''
+		Removes a queued job from the queue. A running job is interrupted and finishes shortly after with a timeout result
+		'''
+		self.cancel_requested = True
+		if not self.future.cancel():
+			self.job_state["cancelRequested"] = True
+
+	def to_json(self) -> Dict:
+		status = self.get_status()
+		job_json = {
+			"jobId": self.job_id,
+			"status": status.value,
+			"timeSubmitted": str(datetime.fromtimestamp(self.submit_time)),
+			"timings": {}
+		}
+		if status == PlanningJobStatus.FAILED:
+			job_json["error"] = str(self.future.exception())
+		elif self.future.done() and not self.future.cancelled():
+			job_result = self.future.result()
+			job_json["timings"] = {
+				"queueTime": job_result["startTime"] - self.submit_time,
+				"planningTime": job_result["endTime"] - job_result["startTime"]
+			}
+			job_json["result"] = job_result["result"]
+		else:
+			job_json["timings"] = {"elapsedTime": time.time() - self.submit_time}
+			# Latest progress of a running job, all events can be streamed from /plans/<jobId>/events
+			latest_events = self.progress_events[-1:]
+			job_json["progress"] = latest_events[0] if latest_events else None
+		return job_json
+
+
+class PlanningJobs:
+	"""
+	All jobs of the jobs API. Finished jobs are kept for time_to_live seconds so that their results can be fetched, afterwards they are evicted
+	"""
+	def __init__(self, time_to_live: float) -> None:
+		self.time_to_live = time_to_live
+		self._jobs: Dict[str, PlanningJob] = {}
+		self._lock = threading.Lock()
+
+	@staticmethod
+	def from_environment() -> "PlanningJobs":
+		'''
+		Creates the job registry with the time to live from CASKADE_JOB_TTL (default: 3600 seconds)
+		'''
+		return PlanningJobs(float(os.environ.get("CASKADE_JOB_TTL", 3600)))
+
+	def add(self, future: Future, job_state: Dict, progress_events: List[Dict]) -> PlanningJob:
+		job = PlanningJob(future, job_state, progress_events)
+		with self._lock:
+			self._evict_expired_jobs()
+			self._jobs[job.job_id] = job
+		return job
+
+	def get(self, job_id: str) -> PlanningJob | None:
+		with self._lock:
+			self._evict_expired_jobs()
+			return self._jobs.get(job_id)
+
+	def remove(self, job_id: str) -> None:
+		with self._lock:
+			self._jobs.pop(job_id, None)
+
+	def _evict_expired_jobs(self) -> None:
+		now = time.time()
+		expired_job_ids = [job_id for job_id, job in self._jobs.items() if job.finish_time is not None and now - job.finish_time > self.time_to_live]
+		for job_id in expired_job_ids:
+			del self._jobs[job_id]
@@ -1,15 +1,17 @@
 
 import json
 from datetime import datetime
-from typing import List, Dict, Set
+from typing import List, Dict, Set, TYPE_CHECKING
 from z3 import ModelRef, RatNumRef, IntNumRef, BoolRef
 
-from smt_planning.smt.StateHandler import StateHandler
 from smt_planning.dicts.PropertyDictionary import Property
 from enum import Enum
 from datetime import datetime
 from typing import Dict
 
+if TYPE_CHECKING:
+	from smt_planning.smt.planning_context import PlanningContext
+
 class PropertyAppearance:
 	def __init__(self, property: Property, event: int, value: RatNumRef | BoolRef | IntNumRef) -> None:
 		self.property = property
@@ -23,6 +25,9 @@ class PropertyAppearance:
 			self.value = float(decimal_value)
 		elif type(value).__name__ == 'BoolRef':
 			self.value = value.__bool__()
+		elif type(value).__name__ == 'bool':
+			# Bool values are already converted to Python bools when the model is extracted
+			self.value = value
 		elif type(value).__name__ == 'IntNumRef':
 			self.value = int(str(value))
 		else:
@@ -122,6 +127,9 @@ class Plan:
 		
 		for capability_iri in capability_iris:
 			step = next((step for step in self.plan_steps if step.step_number == index), None)
+			if step is None:
+				# No capability is used in this happening. Happens in plans with more happenings than necessary
+				break
 			# Find the correct capability and add. Assumption: Every capability can only appear once per step - that should make sense
 			capability_appearances = [capability_appearance for capability_appearance in step.capability_appearances if capability_appearance.capability_iri == capability_iri] # type: ignore
 			if capability_appearances:
@@ -139,31 +147,92 @@ class Plan:
 		return dict
 
 
+class HorizonProbe:
+	"""
+	A single check of the planning problem with a fixed number of happenings. Used to report which bounds were probed during planning and how long each took
+	"""
+	def __init__(self, happenings: int, result: str, encoding_time: float, solving_time: float):
+		self.happenings = happenings
+		self.result = result
+		self.encoding_time = encoding_time
+		self.solving_time = solving_time
+
+	def to_json(self) -> Dict[str, object]:
+		dict = {
+			"happenings": self.happenings,
+			"result": self.result,
+			"encodingTime": self.encoding_time,
+			"solvingTime": self.solving_time
+		}
+		return dict
+
+
+class ProgressEventType(str, Enum):
+	SETUP_DONE = "setup_done"
+	HAPPENING_ENCODED = "happening_encoded"
+	HAPPENING_SOLVED = "happening_solved"
+
+
+class ProgressEvent:
+	"""
+	Progress of a running planning call that is reported to the progress callback of a planner. 
+	Happenings, assertions and result are only set for events of a single happening. Duration is the time for setup, encoding or solving, respectively
+	"""
+	def __init__(self, event_type: ProgressEventType, elapsed_time: float, max_happenings: int, duration: float, happenings: int | None = None, assertions: int | None = None, result: str | None = None):
+		self.event_type = event_type
+		self.elapsed_time = elapsed_time
+		self.max_happenings = max_happenings
+		self.duration = duration
+		self.happenings = happenings
+		self.assertions = assertions
+		self.result = result
+
+	def to_json(self) -> Dict[str, object]:
+		dict = {
+			"eventType": self.event_type.value,
+			"elapsedTime": self.elapsed_time,
+			"maxHappenings": self.max_happenings,
+			"duration": self.duration,
+			"happenings": self.happenings,
+			"assertions": self.assertions,
+			"result": self.result
+		}
+		return dict
+
+
 class PlanningResultType(Enum):
     SAT = "sat"
     UNSAT = "unsat"
     MULTIPLE_SAT = "multiple_sat"
+    TIMEOUT = "timeout"
 
 
 class PlanningResult:
 	"""
-	A class that defines the overall planning result. Contains a type that is either "sat", "unsat", or "multiple_sat". 
+	A class that defines the overall planning result. Contains a type that is either "sat", "unsat", "multiple_sat" or "timeout". 
 	If sat, planning_result contains a single plan.
 	If multiple_sat, planning_result contains multiple alternative plans.
 	If unsat, plan is empty and unsat cores are returned
+	If timeout, the time budget was exceeded. Plans contains all plans found so far (if solutions were enumerated) or the smallest plan found so far (if the minimal number of happenings was searched)
+	Plans are derived from models with the dictionaries of the given planning context
 	"""
 
-	def __init__(self, result_type: PlanningResultType, model: Dict[str, bool | float | int] | None, unsat_core: List | None, models: List[Dict[str, bool | float | int]] | None = None):
+	def __init__(self, result_type: PlanningResultType, model: Dict[str, bool | float | int] | None, unsat_core: List | None, models: List[Dict[str, bool | float | int]] | None = None, context: "PlanningContext | None" = None):
 		self.time_created = datetime.now()
 		self.result_type = result_type
+		self.horizon_probes: List[HorizonProbe] = []
+		# Only set for unsat results if the unsat core is computed lazily
+		self.unsat_core_handle: str | None = None
+		# False if smaller numbers of happenings could not be checked in time, so the plans may not have the minimal number of happenings
+		self.proven_minimal = True
 		if result_type == PlanningResultType.SAT:
 			assert model is not None
-			self.derive_plan_from_model(model)
+			self.derive_plan_from_model(model, context)
 			self.plans = None
 			self.unsat_core = None
 		elif result_type == PlanningResultType.MULTIPLE_SAT:
 			assert models is not None
-			self.derive_plans_from_models(models)
+			self.derive_plans_from_models(models, context)
 			self.plan = None  # Keep for backward compatibility
 			self.unsat_core = None
 		elif result_type == PlanningResultType.UNSAT:
@@ -171,22 +240,32 @@ class PlanningResult:
 			self.plan = None
 			self.plans = None
 			self.unsat_core = unsat_core
+		elif result_type == PlanningResultType.TIMEOUT:
+			self.derive_plans_from_models(models or [], context)
+			self.plan = None
+			self.unsat_core = None
+
+	def get_deepest_unsat_horizon(self) -> int:
+		"""Largest number of happenings that was proven to be unsat. All smaller numbers are unsat as well"""
+		unsat_horizons = [probe.happenings for probe in self.horizon_probes if probe.result == "unsat"]
+		return max(unsat_horizons, default=0)
 
 
-	def derive_plan_from_model(self, model: Dict[str, bool | float | int]):
-		self.plan = self._derive_single_plan_from_model(model)
+	def derive_plan_from_model(self, model: Dict[str, bool | float | int], context: "PlanningContext | None"):
+		self.plan = self._derive_single_plan_from_model(model, context)
 
-	def derive_plans_from_models(self, models: List[Dict[str, bool | float | int]]):
+	def derive_plans_from_models(self, models: List[Dict[str, bool | float | int]], context: "PlanningContext | None"):
 		"""Derive multiple plans from multiple models"""
 		self.plans = []
 		for model in models:
-			plan = self._derive_single_plan_from_model(model)
+			plan = self._derive_single_plan_from_model(model, context)
 			self.plans.append(plan)
 
-	def _derive_single_plan_from_model(self, model: Dict[str, bool | float | int]) -> Plan:
+	def _derive_single_plan_from_model(self, model: Dict[str, bool | float | int], context: "PlanningContext | None") -> Plan:
 		"""Helper method to derive a single plan from a model (extracted from derive_plan_from_model)"""
-		property_dictionary = StateHandler().get_property_dictionary()
-		capability_dictionary = StateHandler().get_capability_dictionary()
+		assert context is not None, "A planning context is needed to derive plans from models"
+		property_dictionary = context.get_property_dictionary()
+		capability_dictionary = context.get_capability_dictionary()
 
 		# Loop over all the vars and sort everything out (try to find the corresponding property or capability):
 		plan = Plan([])
@@ -229,7 +308,7 @@ class PlanningResult:
 		return plan
 
 	def to_json(self) -> Dict[str, object]:
-		if self.result_type == PlanningResultType.MULTIPLE_SAT:
+		if self.result_type in (PlanningResultType.MULTIPLE_SAT, PlanningResultType.TIMEOUT):
 			plans_dict = [plan.to_json() for plan in self.plans] if self.plans else []
 			unsat_core_json = {}
 			plan_dict = {}  # Keep for backward compatibility
@@ -247,6 +326,10 @@ class PlanningResult:
 			"resultType": str(self.result_type),
 			"unsatCore": unsat_core_json,
 			"plan": plan_dict,
-			"plans": plans_dict  # New field for multiple plans
+			"plans": plans_dict,  # New field for multiple plans
+			"horizonProbes": [probe.to_json() for probe in self.horizon_probes],
+			"unsatCoreHandle": self.unsat_core_handle,
+			"deepestUnsatHorizon": self.get_deepest_unsat_horizon(),
+			"provenMinimal": self.proven_minimal
 		}
 		return dict
\ No newline at end of file
@@ -0,0 +1,372 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterator, List, MutableSequence, Tuple
+
+from smt_planning.ontology_handling.graph_traversal import Extraction
+from smt_planning.ontology_handling.ontology_cache import OntologyCache
+from smt_planning.ontology_handling.query_handlers import FileQueryHandler
+from smt_planning.planning_result import PlanningResult
+from smt_planning.smt.cask_to_smt import CaskadePlanner
+from smt_planning.smt.horizon_search import HorizonStrategy
+from smt_planning.smt.minimal_unsat_core import AssertionTracking
+from smt_planning.smt.unsat_core_cache import DEFAULT_CACHE_DIRECTORY, compute_unsat_core
+
+# Query handler source of a planning request: ("file", path), ("sparql-endpoint", url), ("upload", path of an uploaded file) or ("preloaded", ontology name)
+QueryHandlerSource = Tuple[str, str]
+
+# Seconds after which a running job checks whether it was cancelled
+CANCELLATION_POLL_INTERVAL = 0.5
+# Limits of streamed requests that don't set maxSolutions or solutionTimeLimit. Requested limits can't exceed them either
+DEFAULT_MAX_STREAM_SOLUTIONS = 100
+DEFAULT_MAX_STREAM_TIME = 300
+
+# Query handlers of all preloaded ontologies by name. Each worker process parses them once when it is started
+_preloaded_ontologies: Dict[str, Tuple[str, FileQueryHandler]] = {}
+# Uploaded ontologies that were parsed by this worker
+_ontology_cache: OntologyCache | None = None
+
+
+class PoolOverloadedError(Exception):
+	"""Raised if a request is submitted while all workers are busy and the request queue is full"""
+
+
+class PoolUnavailableError(Exception):
+	"""Raised if the worker pool is not running, e.g., because it is shut down or a worker process crashed"""
+
+
+def _initialize_worker(preloaded_ontologies: Dict[str, str], ontology_cache_size: int, ontology_cache_memory: int, ontology_cache_statistics: MutableSequence[int]) -> None:
+	global _ontology_cache
+	_ontology_cache = OntologyCache(ontology_cache_size, ontology_cache_memory, ontology_cache_statistics)
+	for name, filename in preloaded_ontologies.items():
+		print(f"Preloading ontology {name} from {filename}")
+		_preloaded_ontologies[name] = (filename, FileQueryHandler(filename))
+
+
+def _warm_up() -> int:
+	return os.getpid()
+
+
+def _create_planner(query_handler_source: QueryHandlerSource, planning_request: Dict) -> CaskadePlanner:
+	# planning_request contains the (already validated) fields of a REST planning request
+	planner = CaskadePlanner(planning_request.get('requiredCapabilityIri'))
+	mode, location = query_handler_source
+	if mode == "preloaded":
+		filename, query_handler = _preloaded_ontologies[location]
+		# Workers of a portfolio can't share the parsed graph, they load the file again
+		planner.with_query_handler(query_handler, ("file", filename))
+	elif mode == "upload":
+		assert _ontology_cache is not None
+		# Uploads are stored under their content hash (see get_upload_location)
+		content_hash = os.path.splitext(os.path.basename(location))[0]
+		planner.with_query_handler(_ontology_cache.get_query_handler(location, content_hash), ("file", location))
+	else:
+		planner.with_query_handler_source(query_handler_source)
+
+	planner.with_unsat_core_time_budget(planning_request.get('unsatCoreTimeout'))
+	planner.with_assertion_tracking(AssertionTracking(planning_request.get('assertionTracking', AssertionTracking.GROUP.value)))
+	# Lazy encodings are cached on disk, because the unsat core may be computed by another worker later on
+	planner.with_lazy_unsat_core(planning_request.get('lazyUnsatCore', False), DEFAULT_CACHE_DIRECTORY)
+	planner.with_time_budget(planning_request.get('timeBudget'))
+	planner.with_extraction(Extraction(planning_request.get('extraction', Extraction.SPARQL.value)))
+	return planner
+
+
+def _solve(planner: CaskadePlanner, planning_request: Dict) -> PlanningResult:
+	horizon_strategy = HorizonStrategy(planning_request.get('horizonStrategy', HorizonStrategy.LINEAR.value))
+	return planner.cask_to_smt(planning_request.get('maxHappenings', 5), None, None, None, planning_request.get('findAllSolutions', False),
+							planning_request.get('incremental', False), planning_request.get('portfolioWorkers', 0), horizon_strategy)
+
+
+def solve_planning_request(query_handler_source: QueryHandlerSource, planning_request: Dict) -> Dict:
+	'''
+	Worker function: Plans for a single request and returns the JSON of the result
+	'''
+	planner = _create_planner(query_handler_source, planning_request)
+	return _solve(planner, planning_request).to_json()
+
+
+def solve_batch_request(query_handler_source: QueryHandlerSource, planning_request: Dict) -> Dict[str, Dict]:
+	'''
+	Worker function: Plans for all requiredCapabilityIris of a batch request and returns the JSON of every result by capability IRI
+	'''
+	planner = _create_planner(query_handler_source, planning_request)
+	horizon_strategy = HorizonStrategy(planning_request.get('horizonStrategy', HorizonStrategy.LINEAR.value))
+	return planner.plan_batch(planning_request['requiredCapabilityIris'], planning_request.get('maxHappenings', 5), planning_request.get('findAllSolutions', False),
+						   planning_request.get('incremental', False), horizon_strategy, planning_request.get('batchWorkers', 0))
+
+
+def _interrupt_on_cancellation(planner: CaskadePlanner, state: Dict, finished: threading.Event) -> None:
+	# state lives in the manager process and is polled until planning is finished. Planning resets interrupts when it starts, so they are repeated until planning ends
+	def wait_for_cancellation():
+		while not finished.wait(CANCELLATION_POLL_INTERVAL):
+			if state.get("cancelRequested", False) and not planner._interrupted:
+				planner.interrupt()
+
+	threading.Thread(target=wait_for_cancellation, daemon=True).start()
+
+
+def run_planning_job(query_handler_source: QueryHandlerSource, planning_request: Dict, job_state: Dict, progress_events: List[Dict]) -> Dict:
+	'''
+	Worker function: Plans for a job of the jobs API. job_state and progress_events are shared with the API process: The worker sets its startTime
+	and appends the JSON of every progress event, the API sets cancelRequested to interrupt planning, which then ends with a timeout result.
+	Returns the JSON of the result together with the start and end time of planning
+	'''
+	start_time = time.time()
+	job_state["startTime"] = start_time
+	planner = _create_planner(query_handler_source, planning_request)
+	planner.with_progress_callback(lambda event: progress_events.append(event.to_json()))
+	finished = threading.Event()
+	_interrupt_on_cancellation(planner, job_state, finished)
+	try:
+		result = _solve(planner, planning_request)
+	finally:
+		finished.set()
+	return {"result": result.to_json(), "startTime": start_time, "endTime": time.time()}
+
+
+def stream_planning_request(query_handler_source: QueryHandlerSource, planning_request: Dict, results: "queue.Queue[Dict | None]", stream_state: Dict) -> None:
+	'''
+	Worker function: Puts the JSON of every plan into results as soon as it is found. None marks the end of the stream.
+	The API process sets cancelRequested in stream_state if the client is gone, planning and enumeration then stop
+	'''
+	finished = threading.Event()
+	try:
+		planner = _create_planner(query_handler_source, planning_request)
+		_interrupt_on_cancellation(planner, stream_state, finished)
+		horizon_strategy = HorizonStrategy(planning_request.get('horizonStrategy', HorizonStrategy.LINEAR.value))
+		solutions = planner.iterate_solutions(planning_request.get('maxHappenings', 5), planning_request.get('maxSolutions'), planning_request.get('solutionTimeLimit'),
+										planning_request.get('incremental', False), planning_request.get('portfolioWorkers', 0), horizon_strategy, planning_request.get('enumerationWorkers', 0))
+		try:
+			for solution in solutions:
+				if stream_state.get("cancelRequested", False):
+					break
+				results.put(solution.to_json())
+		finally:
+			# Stops the enumeration workers, if there are any
+			solutions.close()
+	finally:
+		finished.set()
+		results.put(None)
+
+
+def get_unsat_core(handle: str, time_budget: float | None) -> List[str]:
+	'''
+	Worker function: Computes the unsat core of a lazy unsat result
+	'''
+	return compute_unsat_core(handle, time_budget, DEFAULT_CACHE_DIRECTORY)
+
+
+class PlanningWorkerPool:
+	"""
+	Pool of worker processes that plan for the REST API. Every worker has its own Z3 context and its own parsed copy of all preloaded ontologies.
+	Requests that can't be started right away wait in a queue of limited size. If the queue is full, further requests are rejected with PoolOverloadedError
+	"""
+	def __init__(self, workers: int, max_queued_requests: int, preloaded_ontologies: Dict[str, str] | None = None, ontology_cache_size: int = 16, ontology_cache_memory: int = 1024 * 1024 * 1024,
+			  max_stream_solutions: int = DEFAULT_MAX_STREAM_SOLUTIONS, max_stream_time: float = DEFAULT_MAX_STREAM_TIME) -> None:
+		self.workers = workers
+		self.max_queued_requests = max_queued_requests
+		self.preloaded_ontologies = preloaded_ontologies or {}
+		# Limits of the ontology cache of each worker (number of ontologies and estimated bytes)
+		self.ontology_cache_size = ontology_cache_size
+		self.ontology_cache_memory = ontology_cache_memory
+		# Limits of streamed requests (number of plans and seconds), so that no stream occupies a worker forever
+		self.max_stream_solutions = max_stream_solutions
+		self.max_stream_time = max_stream_time
+		# Hits, misses and evictions of the ontology caches of all workers
+		self.ontology_cache_statistics = multiprocessing.get_context("spawn").Array("q", 3)
+		self._executor: ProcessPoolExecutor | None = None
+		self._manager = None
+		self._lock = threading.Lock()
+		# Requests that are currently planned or wait for a worker
+		self._pending_requests = 0
+
+	@staticmethod
+	def from_environment() -> "PlanningWorkerPool":
+		'''
+		Creates a pool from environment variables: CASKADE_PLANNING_WORKERS (default: number of cores), CASKADE_MAX_QUEUED_REQUESTS (default: 2 * workers),
+		CASKADE_PRELOADED_ONTOLOGIES (default: none), a list of name=path pairs separated by semicolons, as well as CASKADE_ONTOLOGY_CACHE_SIZE (default: 16) 
+		and CASKADE_ONTOLOGY_CACHE_MEMORY (default: 1024 MB) that limit the ontology cache of each worker. CASKADE_MAX_STREAM_SOLUTIONS (default: 100)
+		and CASKADE_MAX_STREAM_TIME (default: 300 seconds) limit streamed requests
+		'''
+		workers = int(os.environ.get("CASKADE_PLANNING_WORKERS", os.cpu_count() or 1))
+		max_queued_requests = int(os.environ.get("CASKADE_MAX_QUEUED_REQUESTS", 2 * workers))
+		preloaded_ontologies = {}
+		for entry in os.environ.get("CASKADE_PRELOADED_ONTOLOGIES", "").split(";"):
+			if not entry.strip():
+				continue
+			name, filename = entry.split("=", 1)
+			preloaded_ontologies[name.strip()] = filename.strip()
+		ontology_cache_size = int(os.environ.get("CASKADE_ONTOLOGY_CACHE_SIZE", 16))
+		ontology_cache_memory = int(os.environ.get("CASKADE_ONTOLOGY_CACHE_MEMORY", 1024)) * 1024 * 1024
+		max_stream_solutions = int(os.environ.get("CASKADE_MAX_STREAM_SOLUTIONS", DEFAULT_MAX_STREAM_SOLUTIONS))
+		max_stream_time = float(os.environ.get("CASKADE_MAX_STREAM_TIME", DEFAULT_MAX_STREAM_TIME))
+		return PlanningWorkerPool(workers, max_queued_requests, preloaded_ontologies, ontology_cache_size, ontology_cache_memory, max_stream_solutions, max_stream_time)
+
+	def start(self) -> None:
+		'''
+		Starts all worker processes and waits until they have preloaded their ontologies
+		'''
+		with self._lock:
+			if self._executor is not None:
+				return
+			self._start_executor()
+			executor = self._executor
+		assert executor is not None
+		# Workers are started on demand. Submitting one task per worker while none is idle starts all of them
+		warm_up_tasks = [executor.submit(_warm_up) for _ in range(self.workers)]
+		worker_ids = {task.result() for task in warm_up_tasks}
+		print(f"Started {len(worker_ids)} planning workers")
+
+	def _start_executor(self) -> None:
+		# Spawn instead of fork so that workers don't inherit any Z3 internals or threads of the API process
+		context = multiprocessing.get_context("spawn")
+		worker_arguments = (self.preloaded_ontologies, self.ontology_cache_size, self.ontology_cache_memory, self.ontology_cache_statistics)
+		self._executor = ProcessPoolExecutor(self.workers, mp_context=context, initializer=_initialize_worker, initargs=worker_arguments)
+
+	def _restart_executor(self) -> None:
+		# The broken executor is shut down without waiting, its remaining workers are terminated with it
+		assert self._executor is not None
+		self._executor.shutdown(wait=False, cancel_futures=True)
+		self._start_executor()
+
+	def shutdown(self) -> None:
+		with self._lock:
+			if self._executor is not None:
+				self._executor.shutdown(wait=False, cancel_futures=True)
+				self._executor = None
+			if self._manager is not None:
+				self._manager.shutdown()
+				self._manager = None
+
+	def has_ontology(self, name: str) -> bool:
+		return name in self.preloaded_ontologies
+
+	def get_status(self) -> Dict:
+		return {
+			"workers": self.workers,
+			"maxQueuedRequests": self.max_queued_requests,
+			"pendingRequests": self._pending_requests,
+			"preloadedOntologies": list(self.preloaded_ontologies.keys()),
+			"ontologyCache": self.get_ontology_cache_statistics()
+		}
+
+	def get_ontology_cache_statistics(self) -> Dict:
+		hits, misses, evictions = self.ontology_cache_statistics[:]
+		return {
+			"maxEntriesPerWorker": self.ontology_cache_size,
+			"maxMemoryPerWorker": self.ontology_cache_memory,
+			"hits": hits,
+			"misses": misses,
+			"evictions": evictions,
+			"hitRate": hits / (hits + misses) if hits + misses > 0 else None
+		}
+
+	def submit(self, function: Callable, *arguments) -> Future:
+		'''
+		Submits a function to the pool. Raises PoolOverloadedError if the request queue is full and PoolUnavailableError if the pool is not running
+		'''
+		if self._executor is None:
+			self.start()
+
+		with self._lock:
+			if self._executor is None:
+				raise PoolUnavailableError("The planning worker pool is shut down")
+			if self._pending_requests >= self.workers + self.max_queued_requests:
+				raise PoolOverloadedError(f"All {self.workers} planning workers are busy and {self.max_queued_requests} requests are already waiting")
+			try:
+				future = self._executor.submit(function, *arguments)
+			except BrokenProcessPool:
+				# A worker crashed (e.g., out of memory). Replace the pool so that following requests work again
+				self._restart_executor()
+				raise PoolUnavailableError("A planning worker crashed, the worker pool is restarted")
+			self._pending_requests += 1
+			executor = self._executor
+
+		future.add_done_callback(lambda future: self._finish_request(executor, future))
+		return future
+
+	def _finish_request(self, executor: ProcessPoolExecutor, future: Future) -> None:
+		with self._lock:
+			self._pending_requests -= 1
+			# Futures of requests that were cancelled while queued have no exception. A broken executor is only replaced once, even if several of its requests failed
+			if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool) and self._executor is executor:
+				self._restart_executor()
+
+	def _get_result(self, future: Future):
+		try:
+			return future.result()
+		except BrokenProcessPool:
+			raise PoolUnavailableError("A planning worker crashed while planning")
+
+	def solve(self, query_handler_source: QueryHandlerSource, planning_request: Dict) -> Dict:
+		future = self.submit(solve_planning_request, query_handler_source, planning_request)
+		return self._get_result(future)
+
+	def solve_batch(self, query_handler_source: QueryHandlerSource, planning_request: Dict) -> Dict[str, Dict]:
+		future = self.submit(solve_batch_request, query_handler_source, planning_request)
+		return self._get_result(future)
+
+	def stream(self, query_handler_source: QueryHandlerSource, planning_request: Dict) -> Iterator[Dict]:
+		'''
+		Submits a streaming request and returns an iterator over the JSON of all plans found by the worker. The number of plans and the time for enumeration
+		are limited by max_stream_solutions and max_stream_time. If the iterator is closed early (e.g., because the client disconnected), the worker is stopped.
+		Errors after the first result are yielded as a last {"error": ...} line, because the response has already been started
+		'''
+		manager = self._get_manager()
+		results = manager.Queue()
+		stream_state = manager.dict()
+		limited_request = {
+			**planning_request,
+			'maxSolutions': min(planning_request.get('maxSolutions') or self.max_stream_solutions, self.max_stream_solutions),
+			'solutionTimeLimit': min(planning_request.get('solutionTimeLimit') or self.max_stream_time, self.max_stream_time)
+		}
+		future = self.submit(stream_planning_request, query_handler_source, limited_request, results, stream_state)
+
+		def iterate_results() -> Iterator[Dict]:
+			try:
+				while True:
+					try:
+						result = results.get(timeout=1)
+					except queue.Empty:
+						# The worker puts None at the end, unless it crashed
+						if future.done() and future.exception() is not None:
+							self._get_result(future)
+						continue
+					if result is None:
+						break
+					yield result
+				self._get_result(future)
+			except Exception as error:
+				yield {"error": str(error)}
+			finally:
+				# Queued requests are removed, running ones are interrupted like cancelled jobs
+				if not future.done() and not future.cancel():
+					stream_state["cancelRequested"] = True
+
+		return iterate_results()
+
+	def _get_manager(self):
+		# Shared objects (queues, job states, progress events) between the API process and workers are created by a manager that is started on first use
+		with self._lock:
+			if self._manager is None:
+				self._manager = multiprocessing.get_context("spawn").Manager()
+			return self._manager
+
+	def start_job(self, query_handler_source: QueryHandlerSource, planning_request: Dict) -> Tuple[Future, Dict, List[Dict]]:
+		'''
+		Submits a job of the jobs API. Returns its future together with the state and progress events that are shared with the worker (see run_planning_job)
+		'''
+		manager = self._get_manager()
+		job_state = manager.dict()
+		progress_events = manager.list()
+		future = self.submit(run_planning_job, query_handler_source, planning_request, job_state, progress_events)
+		return future, job_state, progress_events
+
+	def compute_unsat_core(self, handle: str, time_budget: float | None) -> List[str]:
+		future = self.submit(get_unsat_core, handle, time_budget)
+		return self._get_result(future)
@@ -0,0 +1,80 @@
+import multiprocessing
+import time
+from typing import Dict, List, Tuple, TYPE_CHECKING
+
+from smt_planning.ontology_handling.query_handlers import CachingQueryHandler
+from smt_planning.smt.horizon_search import HorizonStrategy
+from smt_planning.smt.unsat_core_cache import DEFAULT_CACHE_DIRECTORY
+
+if TYPE_CHECKING:
+	from smt_planning.smt.cask_to_smt import CaskadePlanner
+
+# Planner of a worker process. It keeps the parsed ontology and all cached query results for every capability the worker plans for
+_batch_planner: "CaskadePlanner | None" = None
+
+
+def _initialize_batch_worker(query_handler_source: Tuple[str, str], planner_settings: Dict, time_budget: float | None) -> None:
+	global _batch_planner
+	# Local import because cask_to_smt imports this module
+	from smt_planning.smt.cask_to_smt import CaskadePlanner
+
+	planner = CaskadePlanner("")
+	planner.with_query_handler_source(query_handler_source)
+	planner.with_query_handler(CachingQueryHandler(planner.query_handler), query_handler_source)
+	planner._apply_settings(planner_settings)
+	if planner.lazy_unsat_core and not planner.unsat_core_cache_directory:
+		# Cached encodings of a worker must be written to disk, otherwise they are lost with the worker process
+		planner.with_lazy_unsat_core(True, DEFAULT_CACHE_DIRECTORY)
+	planner.with_time_budget(time_budget)
+	_batch_planner = planner
+
+
+def plan_for_capability(required_capability_iri: str, max_happenings: int, find_all_solutions: bool, incremental: bool, horizon_strategy: HorizonStrategy) -> Tuple[str, Dict]:
+	'''
+	Worker function: Plans for one required capability of a batch and returns the JSON of the result
+	'''
+	assert _batch_planner is not None
+	_batch_planner.required_capability_iri = required_capability_iri
+	result = _batch_planner.cask_to_smt(max_happenings, None, None, None, find_all_solutions, incremental, 0, horizon_strategy)
+	return required_capability_iri, result.to_json()
+
+
+def plan_batch(planner: "CaskadePlanner", required_capability_iris: List[str], max_happenings: int, find_all_solutions: bool, incremental: bool, horizon_strategy: HorizonStrategy) -> Dict[str, Dict]:
+	'''
+	Plans for all required capabilities one after another with the query handler of the planner. Results of queries that don't depend on the required capability are reused
+	'''
+	start_time = time.time()
+	query_handler = planner.query_handler
+	required_capability_iri = planner.required_capability_iri
+	caching_query_handler = CachingQueryHandler(query_handler)
+	planner.query_handler = caching_query_handler
+	results = {}
+	try:
+		for iri in required_capability_iris:
+			planner.required_capability_iri = iri
+			results[iri] = planner.cask_to_smt(max_happenings, None, None, None, find_all_solutions, incremental, 0, horizon_strategy).to_json()
+	finally:
+		planner.query_handler = query_handler
+		planner.required_capability_iri = required_capability_iri
+	print(f"Time for planning {len(required_capability_iris)} capabilities: {time.time() - start_time}. Shared query results: {caching_query_handler.hits}, own queries: {caching_query_handler.misses}")
+	return results
+
+
+def plan_batch_in_parallel(planner: "CaskadePlanner", required_capability_iris: List[str], max_happenings: int, find_all_solutions: bool, incremental: bool, horizon_strategy: HorizonStrategy, workers: int) -> Dict[str, Dict]:
+	'''
+	Distributes the required capabilities across a pool of worker processes. Every worker loads the ontology once and reuses it (and all query results 
+	that don't depend on the required capability) for all capabilities it plans for
+	'''
+	print(f"Started planning {len(required_capability_iris)} capabilities on {workers} workers. This may take a while...")
+	start_time = time.time()
+	# Spawn instead of fork so that workers don't inherit any planning state or Z3 internals of this process
+	initializer_arguments = (planner.query_handler_source, planner._get_settings(), planner.time_budget)
+	pool = multiprocessing.get_context("spawn").Pool(processes=min(workers, len(required_capability_iris)) or 1, initializer=_initialize_batch_worker, initargs=initializer_arguments)
+	try:
+		arguments = [(iri, max_happenings, find_all_solutions, incremental, horizon_strategy) for iri in required_capability_iris]
+		results = dict(pool.starmap(plan_for_capability, arguments, chunksize=1))
+	finally:
+		pool.terminate()
+	print(f"Time for planning {len(required_capability_iris)} capabilities: {time.time() - start_time}")
+	# Same order as the given capabilities
+	return {iri: results[iri] for iri in required_capability_iris}
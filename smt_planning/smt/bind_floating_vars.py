@@ -1,15 +1,15 @@
-from smt_planning.smt.StateHandler import StateHandler
+from smt_planning.smt.planning_context import PlanningContext
 from smt_planning.smt.property_links import get_related_properties
 from z3 import BoolSort, IntSort, RealSort, Bool
 
-def bind_floating_variables():
+def bind_floating_variables(context: PlanningContext):
 	# All the related props of output values at 0_0 need to be bound. Otherwise if they are floating, the goal at happening_1 value can be taken for 0_0. 
 	# This in turn leads to no capabilities getting invoked
-	property_dictionary = StateHandler().get_property_dictionary()
+	property_dictionary = context.get_property_dictionary()
 	goal_binding_assertions = []
 	for goal in property_dictionary.goals:
 		# add all goals themselves as we need to look into them as well.
-		properties_related_to_goal = get_related_properties(goal)
+		properties_related_to_goal = get_related_properties(context, goal)
 		
 		# If a single one of the properties related to goal is bound as an init, we can skip it. Else, bind
 		if any(prop.iri in property_dictionary.inits.keys() for prop in properties_related_to_goal): continue
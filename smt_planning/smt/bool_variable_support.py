@@ -1,19 +1,20 @@
 from typing import List
 from z3 import Implies, Not
 
-from smt_planning.smt.StateHandler import StateHandler
+from smt_planning.smt.planning_context import PlanningContext
 
-def getPropositionSupports(happenings: int, event_bound: int) -> List:
+def getPropositionSupports(context: PlanningContext, happenings: int, event_bound: int, first_happening: int = 0) -> List:
 	'''
 	Proposition support takes care of continuing property values. 
 	It ensures that property values cannot randomly change from one happending to the next one.
 	'''
 	
 	supports = []
-	property_dictionary = StateHandler().get_property_dictionary()
+	property_dictionary = context.get_property_dictionary()
 	properties = property_dictionary.provided_properties.values()
 
-	for happening in range(happenings)[1:]:
+	# Happening 0 has no predecessor, so supports start at happening 1 at the earliest
+	for happening in range(max(first_happening, 1), happenings):
 		for property in properties:
 			if property.data_type == "http://www.w3id.org/hsu-aut/DINEN61360#Boolean":
 				property_current_happening_start = property.occurrences[happening][0].z3_variable
@@ -1,14 +1,14 @@
 from typing import List
 from z3 import Implies, Not, BoolRef, ArithRef
 
-from smt_planning.smt.StateHandler import StateHandler
+from smt_planning.smt.planning_context import PlanningContext
 from smt_planning.smt.property_links import get_related_properties
 
-def capability_effects_smt(happenings: int, event_bound: int) -> List[BoolRef]:
-	property_dictionary = StateHandler().get_property_dictionary()
-	capability_dictionary = StateHandler().get_capability_dictionary()
+def capability_effects_smt(context: PlanningContext, happenings: int, event_bound: int, first_happening: int = 0) -> List[BoolRef]:
+	property_dictionary = context.get_property_dictionary()
+	capability_dictionary = context.get_capability_dictionary()
 	effects_smt = []
-	for happening in range(happenings):
+	for happening in range(first_happening, happenings):
 		for property_iri, effect_list in property_dictionary.effects.items():
 			for effect in effect_list:
 				#property_iri = effect.iri
@@ -24,7 +24,7 @@ def capability_effects_smt(happenings: int, event_bound: int) -> List[BoolRef]:
 					# Case 2: Dynamic, formula effect
 					# TODO: Formula effects are currently handled in capability_constraints. Would be better in effects.py, but we need the data we have here...
 					pass
-				related_properties = get_related_properties(property_iri)
+				related_properties = get_related_properties(context, property_iri)
 				for related_property in related_properties:
 					property = property_dictionary.get_property_occurence(related_property.iri, happening, 1)
 					effect_smt = Implies(current_capability, effect_property == property.z3_variable)
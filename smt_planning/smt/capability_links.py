@@ -3,7 +3,7 @@ from typing import List, Mapping, Set
 from rdflib import Graph, Variable
 from rdflib.term import Identifier 
 
-from smt_planning.smt.StateHandler import StateHandler
+from smt_planning.smt.planning_context import PlanningContext
 from smt_planning.dicts.PropertyDictionary import Property
 from smt_planning.smt.property_links import get_related_properties
 from smt_planning.dicts.CapabilityDictionary import Capability
@@ -14,9 +14,9 @@ class CapabilityPair:
 		self.capability_b = capability_b
 		self.property = property
 
-def get_related_capabilities(capability_iri:str, property_iri:str) -> List[Capability]:
+def get_related_capabilities(context: PlanningContext, capability_iri:str, property_iri:str) -> List[Capability]:
 	# Get all related properties and extract their capabilities
-	property_partners = get_related_properties(property_iri)
+	property_partners = get_related_properties(context, property_iri)
 
 	# Create a set to get only unique values. We don't want the original cap, that's why its added in the beginning
 	related_capability_iris = set()
@@ -29,7 +29,7 @@ def get_related_capabilities(capability_iri:str, property_iri:str) -> List[Capab
 
 	# get the capability objects for each entry
 	related_capabilities = []
-	capability_dictionary = StateHandler().get_capability_dictionary()
+	capability_dictionary = context.get_capability_dictionary()
 	for related_capability_iri in related_capability_iris:
 		capability = capability_dictionary.get_capability(related_capability_iri)
 		if capability.capability_type == 'http://www.w3id.org/hsu-aut/cask#ProvidedCapability':
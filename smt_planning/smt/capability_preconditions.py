@@ -1,13 +1,13 @@
 from typing import List
 from z3 import Implies, BoolRef, Not
 
-from smt_planning.smt.StateHandler import StateHandler
+from smt_planning.smt.planning_context import PlanningContext
 
-def capability_preconditions_smt(happenings: int, event_bound: int) -> List[BoolRef]:
-	property_dictionary = StateHandler().get_property_dictionary()
-	capability_dictionary = StateHandler().get_capability_dictionary()
+def capability_preconditions_smt(context: PlanningContext, happenings: int, event_bound: int, first_happening: int = 0) -> List[BoolRef]:
+	property_dictionary = context.get_property_dictionary()
+	capability_dictionary = context.get_capability_dictionary()
 	preconditions_smt = []
-	for happening in range(happenings):
+	for happening in range(first_happening, happenings):
 		for property_iri, precondition_list in property_dictionary.preconditions.items():
 			for precondition in precondition_list:
 				currentCap = capability_dictionary.get_capability_occurrence(precondition.cap_iri, happening).z3_variable
@@ -1,19 +1,21 @@
 import json 
 import time
 
-from typing import List
+from typing import Callable, Dict, Iterator, List, Tuple
 
-from smt_planning.ontology_handling.query_handlers import FileQueryHandler, SparqlEndpointQueryHandler
-from smt_planning.planning_result import PlanningResultType, PlanningResult
+from smt_planning.ontology_handling.query_handlers import QueryHandler, FileQueryHandler, SparqlEndpointQueryHandler
+from smt_planning.ontology_handling.query_cache import QueryResultCache, default_query_cache
+from smt_planning.ontology_handling.graph_traversal import Extraction
+from smt_planning.planning_result import PlanningResultType, PlanningResult, HorizonProbe, ProgressEvent, ProgressEventType
 from smt_planning.dicts.PropertyDictionary import Property
-from z3 import Solver, Optimize, unsat, sat, Bool, Z3_OP_IMPLIES, Or, Not, And
-from smt_planning.smt.StateHandler import StateHandler
-from smt_planning.openmath.parse_openmath import QueryCache
-from smt_planning.smt.property_links import get_related_properties, set_required_capability, reset_property_pairs
+from z3 import Solver, Optimize, CheckSatResult, unsat, sat, unknown, Bool, Z3_OP_IMPLIES, Or, Not, And, is_implies
+from smt_planning.smt.planning_context import PlanningContext
+from smt_planning.smt.planning_model import create_planning_context, create_planning_model, read_planning_model, write_planning_model
 from smt_planning.ontology_handling.related_inits import find_all_related_inits
 from smt_planning.ontology_handling.capability_and_property_query import get_all_properties, get_provided_capabilities
 from smt_planning.ontology_handling.init_query import get_init
 from smt_planning.ontology_handling.capability_constraints_query import get_capability_constraints
+from smt_planning.openmath.parse_openmath import get_open_math_applications
 from smt_planning.smt.variable_declaration import create_property_dictionary_with_occurrences, create_capability_dictionary_with_occurrences, create_resource_ids
 from smt_planning.smt.capability_preconditions import capability_preconditions_smt
 from smt_planning.smt.capability_effects import capability_effects_smt
@@ -27,20 +29,185 @@ from smt_planning.smt.real_variable_contin_change import get_real_variable_conti
 from smt_planning.smt.capability_mutexes import get_capability_mutexes
 from smt_planning.smt.fix_constants import fix_constants
 from smt_planning.smt.bind_floating_vars import bind_floating_variables
+from smt_planning.smt.parallel_planning import plan_with_horizon_portfolio
+from smt_planning.smt.parallel_enumeration import iterate_solutions_in_parallel
+from smt_planning.smt.batch_planning import plan_batch, plan_batch_in_parallel
+from smt_planning.smt.horizon_search import HorizonStrategy, search_horizon
+from smt_planning.smt.minimal_unsat_core import AssertionTracking, find_minimal_unsat_core
+from smt_planning.smt.unsat_core_cache import cache_unsat_encoding
+
+# Maximum number of solutions that are collected if all solutions are requested
+DEFAULT_MAX_SOLUTIONS = 10
+# Fixed upper bound for number of events in one happening. Currently no events, so we just have the start and end of a happening.
+# Used by all encodings, including those of portfolio and enumeration workers
+EVENT_BOUND = 2
 
 class CaskadePlanner:
 
-	assertion_dictionary = {}
 	required_capability_iri: str
 
 	def __init__(self, required_capability_iri: str) -> None:
 		self.required_capability_iri = required_capability_iri
+		# Time in seconds after which minimizing the unsat core stops and the smallest core found so far is returned. None means no limit
+		self.unsat_core_time_budget: float | None = None
+		self.assertion_tracking = AssertionTracking.GROUP
+		# Tracking that is used while encoding. Horizons that never need an unsat core are encoded without tracking
+		self._current_tracking = self.assertion_tracking
+		# If lazy, unsat results only contain a handle. The unsat core can be computed later with compute_unsat_core
+		self.lazy_unsat_core = False
+		self.unsat_core_cache_directory: str | None = None
+		# Solver of the last sat result. Used to continue with the enumeration of further solutions
+		self._last_sat_solver: Solver | None = None
+		# State of the current planning problem. Created whenever the planning problem is set up
+		self.context: PlanningContext | None = None
+		# Time in seconds for the whole planning call (setup, solving, unsat core). None means no limit
+		self.time_budget: float | None = None
+		self._deadline: float | None = None
+		# Set by interrupt(). Planning then ends like an exceeded time budget
+		self._interrupted = False
+		# Solver whose check is currently running. Only this check is stopped by interrupt()
+		self._running_solver: Solver | None = None
+		# Called with a ProgressEvent after setup and after every happening was encoded and solved
+		self.progress_callback: Callable[[ProgressEvent], None] | None = None
+		self._planning_start_time = 0.0
+		self._max_happenings = 0
+		# How the planning problem is extracted from the ontology (see Extraction)
+		self.extraction = Extraction.SPARQL
+		# Planning model that planning problems are created from instead of querying an ontology (see with_model_file)
+		self.planning_model: Dict | None = None
+
+	def with_file_query_handler(self, filename: str, parse_workers: int = 0, query_cache: QueryResultCache | None = default_query_cache):
+		self.query_handler = FileQueryHandler(filename, parse_workers=parse_workers, query_cache=query_cache)
+		self.query_handler_source = ("file", filename)
+		self.planning_model = None
+
+	def with_endpoint_query_handler(self, endpoint_url, timeout: float = 60, retries: int = 3):
+		self.query_handler = SparqlEndpointQueryHandler(endpoint_url, timeout, retries)
+		self.query_handler_source = ("sparql-endpoint", endpoint_url)
+		self.planning_model = None
+
+	def with_query_handler(self, query_handler: QueryHandler, query_handler_source: Tuple[str, str]):
+		# Reuses an existing query handler, e.g., a preloaded ontology. The source is needed to recreate the handler in worker processes
+		self.query_handler = query_handler
+		self.query_handler_source = query_handler_source
+		self.planning_model = None
+
+	def with_model_file(self, model_file: str):
+		# Plans from a planning model that was exported before (see export_model). The ontology is neither loaded nor queried
+		self.planning_model = read_planning_model(model_file)
+		self.query_handler = None
+		self.query_handler_source = ("model", model_file)
+
+	def with_query_handler_source(self, query_handler_source: Tuple[str, str]):
+		# Recreates a query handler from its source, e.g., in a worker process
+		mode, location = query_handler_source
+		if mode == "file":
+			self.with_file_query_handler(location)
+		elif mode == "sparql-endpoint":
+			self.with_endpoint_query_handler(location)
+		elif mode == "model":
+			self.with_model_file(location)
+		else:
+			raise ValueError(f"Unknown query handler mode {mode}")
+
+	def with_extraction(self, extraction: Extraction):
+		# Graph traversal is only possible for ontology files, endpoints are always queried with SPARQL
+		self.extraction = extraction
+
+	def with_unsat_core_time_budget(self, time_budget: float | None):
+		self.unsat_core_time_budget = time_budget
+
+	def with_assertion_tracking(self, assertion_tracking: AssertionTracking):
+		self.assertion_tracking = assertion_tracking
+		self._current_tracking = assertion_tracking
+
+	def with_lazy_unsat_core(self, lazy: bool = True, cache_directory: str | None = None):
+		# cache_directory is needed if the unsat core is computed in another process
+		self.lazy_unsat_core = lazy
+		self.unsat_core_cache_directory = cache_directory
+
+	def with_time_budget(self, time_budget: float | None):
+		self.time_budget = time_budget
+
+	def with_progress_callback(self, progress_callback: Callable[[ProgressEvent], None] | None):
+		self.progress_callback = progress_callback
+
+	def _report_progress(self, event_type: ProgressEventType, duration: float, happenings: int | None = None, assertions: int | None = None, result: str | None = None):
+		if self.progress_callback is None:
+			return
+		elapsed_time = time.time() - self._planning_start_time
+		self.progress_callback(ProgressEvent(event_type, elapsed_time, self._max_happenings, duration, happenings, assertions, result))
+
+	def _start_time_budget(self):
+		self._deadline = None if self.time_budget is None else time.time() + self.time_budget
+		# An interrupt only stops the planning call it was sent to, the planner can be used again afterwards
+		self._interrupted = False
+
+	def interrupt(self):
+		'''
+		Stops planning, e.g., from another thread. A running check of this planner is interrupted and planning ends with a timeout result.
+		Checks of other planners in the same process keep running
+		'''
+		self._interrupted = True
+		running_solver = self._running_solver
+		if running_solver is not None:
+			running_solver.interrupt()
+
+	def _check(self, solver: Solver) -> CheckSatResult:
+		# Without a running solver, an interrupt can't stop the check. Interrupts that were sent before the check are handled here
+		self._running_solver = solver
+		try:
+			if self._interrupted:
+				return unknown
+			return solver.check()
+		finally:
+			self._running_solver = None
+
+	def _get_remaining_time(self) -> float | None:
+		if self._interrupted:
+			return 0
+		if self._deadline is None:
+			return None
+		return max(self._deadline - time.time(), 0)
+
+	def _is_out_of_time(self) -> bool:
+		return self._interrupted or (self._deadline is not None and time.time() >= self._deadline)
+
+	def _check_with_time_budget(self, solver: Solver) -> CheckSatResult:
+		# Z3 stops the check and returns unknown when the remaining time is up
+		remaining_time = self._get_remaining_time()
+		if remaining_time is not None:
+			solver.set(timeout=max(int(remaining_time * 1000), 1))
+		return self._check(solver)
+
+	def _create_timeout_result(self, probes: List[HorizonProbe], models: List[Dict] | None = None, proven_minimal: bool = True) -> PlanningResult:
+		if self._interrupted:
+			print("Planning was interrupted")
+		else:
+			print(f"Time budget of {self.time_budget}s exceeded")
+		result = PlanningResult(PlanningResultType.TIMEOUT, None, None, models, self.context)
+		result.horizon_probes = probes
+		result.proven_minimal = proven_minimal
+		return result
 
-	def with_file_query_handler(self, filename: str):
-		self.query_handler = FileQueryHandler(filename)
-
-	def with_endpoint_query_handler(self, endpoint_url):
-		self.query_handler = SparqlEndpointQueryHandler(endpoint_url)
+	def _get_settings(self) -> Dict:
+		# All settings that are needed to recreate this planner in another process
+		settings = {
+			"unsatCoreTimeBudget": self.unsat_core_time_budget,
+			"assertionTracking": self.assertion_tracking.value,
+			"lazyUnsatCore": self.lazy_unsat_core,
+			"unsatCoreCacheDirectory": self.unsat_core_cache_directory,
+			"deadline": self._deadline,
+			"extraction": self.extraction.value
+		}
+		return settings
+
+	def _apply_settings(self, settings: Dict):
+		self.with_unsat_core_time_budget(settings["unsatCoreTimeBudget"])
+		self.with_assertion_tracking(AssertionTracking(settings["assertionTracking"]))
+		self.with_lazy_unsat_core(settings["lazyUnsatCore"], settings["unsatCoreCacheDirectory"])
+		self._deadline = settings["deadline"]
+		self.with_extraction(Extraction(settings["extraction"]))
 
 	def add_comment(self, solver: Solver, comment_text: str):
 		# Adds a comment to the smt output in a pretty hackish way: 
@@ -54,7 +221,7 @@ class CaskadePlanner:
 		replaced_model = {}
 		for model_declaration in model.decls():
 			declaration_name = model_declaration.name()
-			if declaration_name in self.assertion_dictionary:
+			if declaration_name in self._get_context().assertion_dictionary:
 				continue
 			else:
 				value = model[model_declaration]
@@ -85,260 +252,489 @@ class CaskadePlanner:
 			with open(plan_location, 'w') as json_file:
 				json.dump(result, json_file, default=lambda o: o.to_json(), indent=4)
 
-	def cask_to_smt(self, max_happenings: int = 5, problem_location = None, model_location = None, plan_location = None, find_all_solutions: bool = False) -> PlanningResult:
-		print("Started planning. This may take a while...")
-		start_time = time.time()
-		state_handler = StateHandler()
-		state_handler.set_query_handler(self.query_handler)
-		reset_property_pairs()
-
-		# Set required cap to property link finding. TODO: Could be better moved to state handler
-		set_required_capability(self.required_capability_iri)
-
-		happenings = 0
-		# Fixed upper bound for number of events in one happening. Currently no events, so we just have the start and end of a happening
-		event_bound = 2
-		solver_result = unsat
-
-		# needs to be reset for new planning request, otherwise it will keep the old data annd not be able to solve the problem at all or solve the problem incorrectly
-		QueryCache.reset()
-		# state_handler.reset_caches()
+	def _track_assertions(self, solver: Solver, assertions: List, name_prefix: str, happenings: int) -> None:
+		# Adds all assertions with a unique tracking name so that they can be retransformed when an unsat core is extracted
+		if self._current_tracking == AssertionTracking.NONE:
+			solver.add(*assertions)
+			return
+
+		if self._current_tracking == AssertionTracking.GROUP:
+			# One tracking name for the whole family. The group is stored as a list and split up again when the core is minimized
+			if len(assertions) == 0:
+				return
+			group_name = f'{name_prefix}_{happenings}'
+			self._get_context().assertion_dictionary[group_name] = list(assertions)
+			solver.assert_and_track(And(*assertions), group_name)
+			return
+
+		assertion_counter = 0
+		for assertion in assertions:
+			assertion_counter += 1
+			assertion_name = f'{name_prefix}_{assertion_counter}_{happenings}'
+			self._get_context().assertion_dictionary[assertion_name] = assertion
+			solver.assert_and_track(assertion, assertion_name)
+
+	def _get_context(self) -> PlanningContext:
+		assert self.context is not None, "The planning problem must be set up before its context can be used"
+		return self.context
+
+	def _setup_planning_problem(self) -> None:
+		"""Queries the ontology and stores all dictionaries in a new planning context. Must be done once before constraints are added"""
+		if self.planning_model is not None:
+			# Planning models already contain all dictionaries, they are only recreated
+			start_time = time.time()
+			self.context = create_planning_context(self.planning_model, self.required_capability_iri)
+			print(f"Time for creating the planning problem from the planning model: {time.time() - start_time}")
+			return
+
+		# A new context for every planning problem, otherwise old data would be used and the problem could not be solved at all or would be solved incorrectly
+		context = PlanningContext(self.query_handler, self.required_capability_iri, self.extraction)
+		self.context = context
 			
 		# Get all properties connected to provided capabilities as inputs or outputs as well as all instance descriptions 
-		property_dictionary = get_all_properties(self.required_capability_iri)
-		state_handler.set_property_dictionary(property_dictionary)
-		find_all_related_inits()	# after all properties were assigned, add the related ones to the inits
+		property_dictionary = get_all_properties(context, self.required_capability_iri)
+		context.set_property_dictionary(property_dictionary)
+		find_all_related_inits(context)	# after all properties were assigned, add the related ones to the inits
 
 		# Get provided capabilities and their influence on output objects as well as resources that provide capabilities
-		cap_and_res_dictionary = get_provided_capabilities(self.required_capability_iri)
+		cap_and_res_dictionary = get_provided_capabilities(context, self.required_capability_iri)
 		capability_dictionary = cap_and_res_dictionary[0]
 		resource_dictionary = cap_and_res_dictionary[1]
-		state_handler.set_capability_dictionary(capability_dictionary)
-		state_handler.set_resource_dictionary(resource_dictionary)
+		context.set_capability_dictionary(capability_dictionary)
+		context.set_resource_dictionary(resource_dictionary)
 
 		# Capability Constraints to store
-		get_capability_constraints()
+		get_capability_constraints(context)
 		
 		# Get all inits and goals of planning problem based on the instance descriptions
-		get_init()
+		get_init(context)
+
+	def find_extraction_differences(self) -> List[str]:
+		'''
+		Sets up the planning problem with SPARQL queries and the graph traversal at the same time and returns all differences between query results and traversal results.
+		Empty if the graph traversal extracts the same planning problem as the queries. Only possible for ontology files
+		'''
+		if self.planning_model is not None:
+			raise Exception("Extractions can only be compared on an ontology, not on a planning model")
+		extraction = self.extraction
+		self.extraction = Extraction.DIFFERENTIAL
+		try:
+			self._setup_planning_problem()
+			context = self._get_context()
+			# Queries that are otherwise only run while constraints are encoded
+			context.property_pairs.get_property_pairs()
+			get_open_math_applications(context)
+		finally:
+			self.extraction = extraction
+		return context.extraction_differences
+
+	def export_model(self, model_file: str) -> None:
+		'''
+		Extracts the planning problem from the ontology and writes it to a planning model, which can be planned from without the ontology (see with_model_file).
+		Afterwards, this planner plans from the planning model as well and the ontology's graph is released
+		'''
+		start_time = time.time()
+		self._setup_planning_problem()
+		planning_model = create_planning_model(self._get_context())
+		write_planning_model(planning_model, model_file)
+		# The graph is only referenced by the query handler and the context
+		self.context = None
+		self.query_handler = None
+		self.query_handler_source = ("model", model_file)
+		self.planning_model = planning_model
+		print(f"Time for exporting the planning model to {model_file}: {time.time() - start_time}")
+
+	def _add_happening_constraints(self, solver: Solver, happenings: int, event_bound: int, first_happening: int = 0, problem_location = None) -> None:
+		"""
+		Adds all constraints that belong to the happenings first_happening..happenings-1 to the solver. 
+		Constraints of earlier happenings are expected to be in the solver already (incremental mode). Init and goal are not added here.
+		"""
+		context = self._get_context()
+		property_dictionary = context.get_property_dictionary()
+		capability_dictionary = context.get_capability_dictionary()
+		time_loop_start = time.time()
+
+		# ------------------------------Variable Declaration------------------------------------------ 	
+		# Get all properties connected to provided capabilities as inputs or outputs
+		create_property_dictionary_with_occurrences(context, happenings, event_bound)
+
+		time_after_prop_dict = time.time()
+		print(f"Time for PropertyDictionary: {time_after_prop_dict - time_loop_start}")
+
+		# Get provided capabilities and transform to boolean SMT variables
+		create_capability_dictionary_with_occurrences(context, happenings)
+
+		time_after_cap_dict = time.time()
+		print(f"Time for CapabilityDictionary: {time_after_cap_dict - time_after_prop_dict}")
+
+		# ------------------------------Ressource IDs---------------------------------------------------
+		self.add_comment(solver, "Start of resource ids")
+		resource_ids = create_resource_ids(context, happenings, event_bound, first_happening)
+		self._track_assertions(solver, resource_ids, "resourceId", happenings)
+
+		# ------------------------Constraint Proposition (H1 + H2) --> bool properties------------------
+		self.add_comment(solver, "Start of constraints proposition")
+		bool_constraints = context.happening_templates.get_constraints("boolConstraint", get_bool_constraints, happenings, event_bound, first_happening)
+		self._track_assertions(solver, bool_constraints, "boolConstraint", happenings)
+
+		time_after_constraint_prop = time.time()
+		print(f"Time for constraint proposition: {time_after_constraint_prop - time_after_cap_dict}")
+
+		# ---------------------Constraint Real Variable (H5) --> real properties-----------------------------
+		self.add_comment(solver, "Start of constraints real variables")
+		variable_constraints = context.happening_templates.get_constraints("varConstraint", get_variable_constraints, happenings, event_bound, first_happening)
+		self._track_assertions(solver, variable_constraints, "varConstraint", happenings)
+
+		time_after_var_constraints = time.time()
+		print(f"Time for var constraints: {time_after_var_constraints - time_after_constraint_prop}")
+
+		# ----------------- Capability Precondition ------------------------------------------------------
+		self.add_comment(solver, "Start of preconditions")
+		precondition_constraints = context.happening_templates.get_constraints("precond", capability_preconditions_smt, happenings, event_bound, first_happening)
+		self._track_assertions(solver, precondition_constraints, "precond", happenings)
+
+		time_after_preconds = time.time()
+		print(f"Time for preconditions: {time_after_preconds - time_after_var_constraints}")
+
+		# --------------------------------------- Capability Effect ---------------------------------------
+		self.add_comment(solver, "Start of effects")
+		effects = context.happening_templates.get_constraints("effect", capability_effects_smt, happenings, event_bound, first_happening)
+		self._track_assertions(solver, effects, "effect", happenings)
+
+		time_after_effects = time.time()
+		print(f"Time for effects: {time_after_effects - time_after_preconds}")
+
+		# ---------------- Constraints Capability mutexes (H14) -----------------------------------------
+		self.add_comment(solver, "Start of capability mutexes")
+		capability_mutexes = context.happening_templates.get_constraints("capMutex", lambda context, happenings, event_bound, first_happening: get_capability_mutexes(context, happenings, first_happening), happenings, event_bound, first_happening)
+		self._track_assertions(solver, capability_mutexes, "capMutex", happenings)
+		
+		time_after_mutexes = time.time()
+		print(f"Time for mutexes: {time_after_mutexes - time_after_effects}")
+
+		# ------------------- Proposition support (P5 + P6) ----------------------------
+		self.add_comment(solver, "Start of proposition support")
+		proposition_supports = getPropositionSupports(context, happenings, event_bound, first_happening)
+		self._track_assertions(solver, proposition_supports, "support", happenings)
+		
+		time_after_prop_support = time.time()
+		print(f"Time for prop support: {time_after_prop_support - time_after_mutexes}")
+
+		# ----------------- Continuous change on real variables (P11) ------------------
+		self.add_comment(solver, "Start of real variable continuous change")
+		real_variable_cont_changes = get_real_variable_continuous_changes(context, happenings, event_bound, first_happening)
+		self._track_assertions(solver, real_variable_cont_changes, "realVarContChange", happenings)
+
+		time_after_realVarContChange = time.time()
+		print(f"Time for real var conti change: {time_after_realVarContChange - time_after_prop_support}")
+
+
+		# Capability constraints are OpenMath expressions in RDF that are compiled directly into Z3 expressions over the property occurrences
+		self.add_comment(solver, "Start of capability constraints")
+
+		if problem_location:
+			with open(problem_location, 'w', encoding='utf-8') as file:
+				file.write(solver.to_smt2())
+
+		capability_constraints = context.happening_templates.get_constraints("capConstraint", capability_constraints_smt, happenings, event_bound, first_happening)
+		self._track_assertions(solver, capability_constraints, "capConstraint", happenings)
+
+		time_after_cap_constraints = time.time()
+		print(f"Time for cap constraints: {time_after_cap_constraints - time_after_realVarContChange}")
+
+
+		self.add_comment(solver, "Start of constants")
+		constant_expressions = fix_constants(property_dictionary, capability_dictionary, happenings, event_bound, first_happening)
+		self._track_assertions(solver, constant_expressions, "constant", happenings)
+			
+		time_after_constants = time.time()
+		print(f"Time for constants: {time_after_constants - time_after_cap_constraints}")
+
+	def _add_initial_constraints(self, solver: Solver) -> None:
+		"""Adds the constraints on the initial state. These only refer to happening 0 and are thus independent of the number of happenings"""
+		time_before_inits = time.time()
+
+		# ---------------- Init  --------------------------------------------------------
+		self.add_comment(solver, "Start of init")
+		init_constraints = init_smt(self._get_context())
+		self._track_assertions(solver, init_constraints, "init", 0)
+
+		time_after_inits = time.time()
+		print(f"Time for inits: {time_after_inits - time_before_inits}")
+
+		self.add_comment(solver, "Start of floating variable bindings")
+		binding_expressions = bind_floating_variables(self._get_context())
+		self._track_assertions(solver, binding_expressions, "binding", 0)
+				
+		time_after_binding_floating_values = time.time()
+		print(f"Time for binding free values: {time_after_binding_floating_values - time_after_inits}")
+
+	def _add_goal_constraints(self, solver: Solver, happenings: int) -> None:
+		"""Adds the goal constraints, which are bound to the last happening and thus need to be replaced whenever the number of happenings changes"""
+		time_before_goals = time.time()
+
+		# ---------------------- Goal ------------------------------------------------- 
+		self.add_comment(solver, "Start of goal")
+		goal_constraints = goal_smt(self._get_context(), happenings)
+		self._track_assertions(solver, goal_constraints, "goal", happenings)
+
+		time_after_goals = time.time()
+		print(f"Time for goals: {time_after_goals - time_before_goals}")
+
+	def _encode_horizon(self, happenings: int, event_bound: int, problem_location = None, with_unsat_core: bool = True) -> Solver:
+		"""
+		Creates a fresh solver containing the whole planning problem for exactly the given number of happenings.
+		If with_unsat_core is False, no assertions are tracked since no unsat core will be extracted from this solver
+		"""
+		solver = Solver()
+		solver.set(unsat_core=True)
+		solver.reset()
+		self._current_tracking = self.assertion_tracking if with_unsat_core else AssertionTracking.NONE
+		try:
+			self._add_happening_constraints(solver, happenings, event_bound, 0, problem_location)
+			self._add_initial_constraints(solver)
+			self._add_goal_constraints(solver, happenings)
+		finally:
+			self._current_tracking = self.assertion_tracking
+		return solver
+
+	def _create_sat_result(self, solver: Solver, find_all_solutions: bool, problem_location = None, model_location = None, plan_location = None) -> PlanningResult | None:
+		"""Creates the result after the solver returned sat. Returns None if no model could be obtained"""
+		self._last_sat_solver = solver
+		if not find_all_solutions:
+			# Original behavior: return first solution found
+			model = solver.model()
+			replaced_model = self._extract_model_dict(model)
+			
+			# Create the result
+			result = PlanningResult(PlanningResultType.SAT, replaced_model, None, context=self.context)
+			self._save_optional_outputs(result, solver, model, problem_location, model_location, plan_location)
+			return result
+		
+		# Find all solutions
+		all_models = list(self._enumerate_models(solver, DEFAULT_MAX_SOLUTIONS, self._get_remaining_time()))
+		if self._is_out_of_time():
+			# Horizon probes are set by the caller
+			return self._create_timeout_result([], all_models)
+		
+		if len(all_models) == 1:
+			# Only one solution found, return as single solution
+			result = PlanningResult(PlanningResultType.SAT, all_models[0], None, context=self.context)
+			self._save_optional_outputs(result, solver, None, problem_location, model_location, plan_location)
+			return result
+		elif len(all_models) > 1:
+			# Multiple solutions found
+			result = PlanningResult(PlanningResultType.MULTIPLE_SAT, None, None, all_models, self.context)
+			self._save_optional_outputs(result, solver, None, problem_location, model_location, plan_location)
+			return result
+		
+		return None
+
+	def _enumerate_models(self, solver: Solver, max_solutions: int | None = None, time_limit: float | None = None, start_time: float | None = None) -> Iterator[Dict]:
+		"""
+		Yields the model of the solver's last (sat) check and all further models that use a different combination of capabilities.
+		Stops after max_solutions models or time_limit seconds after start_time, if given. Previous models are not kept, only their blocking clauses
+		"""
+		if start_time is None:
+			start_time = time.time()
+		capability_dictionary = self._get_context().get_capability_dictionary()
+		all_capabilities = {**capability_dictionary.provided_capabilities, **capability_dictionary.required_capabilities}
+		solution_count = 0
+		solver_result = sat
+
+		while solver_result == sat:
+			solution_count += 1
+			model = solver.model()
+			replaced_model = self._extract_model_dict(model)
+			print(f"Found solution {solution_count}")
+			print(f"Model has {len(replaced_model)} variables")
+			yield replaced_model
+
+			if max_solutions is not None and solution_count >= max_solutions:
+				print(f"Reached limit of {max_solutions} solutions - stopping search")
+				return
+
+			# Collect all TRUE capabilities from this solution
+			true_capabilities = []
+			for capability in all_capabilities.values():
+				for occurrence in capability.occurrences.values():
+					# Check the capability variable directly in the Z3 model, not in the replaced dict
+					try:
+						z3_value = model.eval(occurrence.z3_variable)
+						is_true = bool(z3_value)
+						
+						if is_true:
+							true_capabilities.append(occurrence.z3_variable)
+					except Exception as e:
+						continue
+			
+			print(f"Found {len(true_capabilities)} true capabilities in solution")
+			if not true_capabilities:
+				# Nothing to exclude, so the same solution would be found over and over again
+				print("  No true capabilities found - this might indicate a problem!")
+				return
+
+			# Exclude this exact combination: NOT (all true capabilities are true)
+			# This means at least one of the currently true capabilities must be false
+			solver.add(Not(And(*true_capabilities)))
+
+			if time_limit is not None:
+				remaining_time = time_limit - (time.time() - start_time)
+				if remaining_time <= 0:
+					print(f"Reached time limit of {time_limit}s - stopping search")
+					return
+				solver.set(timeout=max(int(remaining_time * 1000), 1))
+
+			# Try to find another solution
+			solver_result = self._check(solver)
+
+	def iterate_solutions(self, max_happenings: int = 5, max_solutions: int | None = None, time_limit: float | None = None, incremental: bool = False, portfolio_workers: int = 0, horizon_strategy: HorizonStrategy = HorizonStrategy.LINEAR, enumeration_workers: int = 0) -> Iterator[PlanningResult]:
+		"""
+		Finds the minimal number of happenings like cask_to_smt and then yields every plan with this number of happenings as soon as it is found.
+		Plans differ in the capabilities they use. Enumeration stops after max_solutions plans or time_limit seconds (counted from the start of planning).
+		If enumeration_workers is set, the search space is split up and enumerated by that many worker processes (see iterate_solutions_in_parallel).
+		If there is no plan, a single unsat result is yielded. Only the first result contains the horizon probes
+		"""
+		start_time = time.time()
+		result = self.cask_to_smt(max_happenings, None, None, None, False, incremental, portfolio_workers, horizon_strategy)
+		if self._deadline is not None:
+			# Enumeration must end with the overall time budget
+			time_limits = [limit for limit in (time_limit, self._deadline - start_time) if limit is not None]
+			time_limit = min(time_limits)
+		if result.result_type != PlanningResultType.SAT:
+			yield result
+			return
+
+		happenings = min(probe.happenings for probe in result.horizon_probes if probe.result == str(sat))
+		solver = self._last_sat_solver
+		if solver is None:
+			# Portfolio workers solved the problem in another process, so the smallest satisfiable horizon is encoded again here
+			solver = self._encode_horizon(happenings, EVENT_BOUND, None, False)
+			self._check(solver)
+		self._last_sat_solver = None
+
+		if enumeration_workers > 0:
+			first_model = self._extract_model_dict(solver.model())
+			solutions = iterate_solutions_in_parallel(self, happenings, first_model, enumeration_workers, max_solutions, time_limit, start_time)
+		else:
+			solutions = (PlanningResult(PlanningResultType.SAT, model, None, context=self.context) for model in self._enumerate_models(solver, max_solutions, time_limit, start_time))
+
+		horizon_probes = result.horizon_probes
+		for solution in solutions:
+			solution.horizon_probes = horizon_probes
+			horizon_probes = []
+			yield solution
+
+	def plan_batch(self, required_capability_iris: List[str], max_happenings: int = 5, find_all_solutions: bool = False, incremental: bool = False, horizon_strategy: HorizonStrategy = HorizonStrategy.LINEAR, workers: int = 0) -> Dict[str, Dict]:
+		"""
+		Plans for every required capability of the list on the ontology of this planner and returns the JSON of each result by capability IRI.
+		The ontology is loaded once and query results that don't depend on the required capability are shared between the capabilities.
+		If workers is set, the capabilities are distributed across that many worker processes. The time budget applies to every capability
+		"""
+		if workers > 0:
+			return plan_batch_in_parallel(self, required_capability_iris, max_happenings, find_all_solutions, incremental, horizon_strategy, workers)
+		return plan_batch(self, required_capability_iris, max_happenings, find_all_solutions, incremental, horizon_strategy)
+
+	def _get_unsat_core_time_budget(self) -> float | None:
+		# Minimizing the core must not exceed the overall time budget either
+		time_budgets = [time_budget for time_budget in (self.unsat_core_time_budget, self._get_remaining_time()) if time_budget is not None]
+		return min(time_budgets, default=None)
+
+	def _get_minimal_unsat_core(self, solver: Solver) -> List[str]:
+		"""Extracts the unsat core of the last check, minimizes it and returns it in string form"""
+		time_before_muc = time.time()
+		unsat_core = solver.unsat_core()
+		if self.assertion_tracking == AssertionTracking.NONE:
+			print("Assertions are not tracked, no unsat core can be extracted")
+			return []
+
+		# Retransform unsat core to insert original properties instead of assertion_name. Groups are refined to their individual assertions
+		transformed_unsat_core = []
+		for core in unsat_core:
+			core_elem = self._get_context().assertion_dictionary[str(core)]
+			if isinstance(core_elem, list):
+				transformed_unsat_core.extend(core_elem)
+			else:
+				transformed_unsat_core.append(core_elem)
+
+		muc = find_minimal_unsat_core(transformed_unsat_core, self._get_unsat_core_time_budget())
+		unsat_core_string = []
+		for core in muc:
+			unsat_core_string.append(str(core))
+		end_time_muc = time.time()
+		print(f"Time for finding MUC: {end_time_muc - time_before_muc}")
+		return unsat_core_string
+
+	def _create_unsat_result(self, solver: Solver) -> PlanningResult:
+		"""Creates the result after the solver returned unsat. In lazy mode, the encoding is cached and only a handle to compute the unsat core is returned"""
+		if not self.lazy_unsat_core:
+			return PlanningResult(PlanningResultType.UNSAT, None, self._get_minimal_unsat_core(solver))
+
+		tracking_names = [str(assertion.arg(0)) for assertion in solver.assertions() if is_implies(assertion) and str(assertion.arg(0)) in self._get_context().assertion_dictionary]
+		handle = cache_unsat_encoding(solver, tracking_names, self.assertion_tracking, self.unsat_core_cache_directory)
+		print(f"Unsat core can be computed later with handle {handle}")
+		result = PlanningResult(PlanningResultType.UNSAT, None, [])
+		result.unsat_core_handle = handle
+		return result
+
+	def cask_to_smt(self, max_happenings: int = 5, problem_location = None, model_location = None, plan_location = None, find_all_solutions: bool = False, incremental: bool = False, portfolio_workers: int = 0, horizon_strategy: HorizonStrategy = HorizonStrategy.LINEAR) -> PlanningResult:
+		"""
+		Checks for a plan with 1..max_happenings happenings and returns the first one found.
+		In incremental mode, one solver is kept alive across all happenings. Only the constraints of the newly added happening are asserted 
+		in every iteration, while the goal constraints are added inside a push / pop scope. This lets Z3 keep what it has learned so far.
+		If portfolio_workers is set, the different numbers of happenings are checked in parallel by that many worker processes.
+		The horizon_strategy defines in which order numbers of happenings are checked (see HorizonStrategy). Incremental mode only applies to the linear strategy.
+		If a time budget is set and exceeded, a timeout result is returned.
+		"""
+		self._last_sat_solver = None
+		self._start_time_budget()
+		self._planning_start_time = time.time()
+		self._max_happenings = max_happenings
+		if portfolio_workers > 0:
+			return plan_with_horizon_portfolio(self, max_happenings, portfolio_workers, problem_location, model_location, plan_location, find_all_solutions)
+
+		print("Started planning. This may take a while...")
+		start_time = time.time()
+		
+		happenings = 0
+		event_bound = EVENT_BOUND
+		solver_result = unsat
+
+		self._setup_planning_problem()
 		
 		time_before_loop = time.time()
 		print(f"Time for setup: {time_before_loop - start_time}")
+		self._report_progress(ProgressEventType.SETUP_DONE, time_before_loop - start_time)
+		if self._is_out_of_time():
+			return self._create_timeout_result([])
 
-		while (happenings < max_happenings and solver_result == unsat):
-			time_loop_start = time.time()
-			# SMT Solver
+		if horizon_strategy != HorizonStrategy.LINEAR:
+			return search_horizon(self, max_happenings, horizon_strategy, event_bound, problem_location, model_location, plan_location, find_all_solutions)
+
+		probes: List[HorizonProbe] = []
+		if incremental:
+			# One solver for all happenings
 			solver = Solver()
 			solver.set(unsat_core=True)
-			solver.reset()
-			
+
+		while (happenings < max_happenings and solver_result == unsat):
+			if self._is_out_of_time():
+				return self._create_timeout_result(probes)
+			time_loop_start = time.time()
 			solver_result = unsat
 			happenings += 1
 
-			# ------------------------------Variable Declaration------------------------------------------ 	
-			# Get all properties connected to provided capabilities as inputs or outputs
-			create_property_dictionary_with_occurrences(happenings, event_bound)
-
-			time_after_prop_dict = time.time()
-			print(f"Time for PropertyDictionary: {time_after_prop_dict - time_loop_start}")
-
-			# Get provided capabilities and transform to boolean SMT variables
-			create_capability_dictionary_with_occurrences(happenings)
-
-			time_after_cap_dict = time.time()
-			print(f"Time for CapabilityDictionary: {time_after_cap_dict - time_after_prop_dict}")
-
-			# ------------------------------Ressource IDs---------------------------------------------------
-			self.add_comment(solver, "Start of resource ids")
-			resource_ids = create_resource_ids(happenings, event_bound)
-			resource_id_counter = 0
-			for resource_id in resource_ids:
-				resource_id_counter += 1
-				assertion_name = f'resourceId_{resource_id_counter}_{happenings}'
-				self.assertion_dictionary[assertion_name] = resource_id
-				solver.assert_and_track(resource_id, assertion_name)
-
-			# ------------------------Constraint Proposition (H1 + H2) --> bool properties------------------
-			self.add_comment(solver, "Start of constraints proposition")
-			bool_constraints = get_bool_constraints(happenings, event_bound)
-			bool_constraint_counter = 0
-			for bool_constraint in bool_constraints:
-				bool_constraint_counter += 1
-				assertion_name = f'boolConstraint_{bool_constraint_counter}_{happenings}'
-				self.assertion_dictionary[assertion_name] = bool_constraint
-				solver.assert_and_track(bool_constraint, assertion_name)
-
-			time_after_constraint_prop = time.time()
-			print(f"Time for constraint proposition: {time_after_constraint_prop - time_after_cap_dict}")
-
-			# ---------------------Constraint Real Variable (H5) --> real properties-----------------------------
-			self.add_comment(solver, "Start of constraints real variables")
-			variable_constraints = get_variable_constraints(happenings, event_bound)
-			variable_constraint_counter = 0
-			for variable_constraint in variable_constraints:
-				variable_constraint_counter += 1
-				assertion_name = f'varConstraint_{variable_constraint_counter}_{happenings}'
-				self.assertion_dictionary[assertion_name] = variable_constraint
-				solver.assert_and_track(variable_constraint, assertion_name)
-
-			time_after_var_constraints = time.time()
-			print(f"Time for var constraints: {time_after_var_constraints - time_after_constraint_prop}")
-
-			# ----------------- Capability Precondition ------------------------------------------------------
-			self.add_comment(solver, "Start of preconditions")
-			precondition_constraints = capability_preconditions_smt(happenings, event_bound)
-			precondition_counter = 0
-			for precondition in precondition_constraints:
-				precondition_counter += 1
-				assertion_name = f'precond_{precondition_counter}_{happenings}'
-				self.assertion_dictionary[assertion_name] = precondition
-				solver.assert_and_track(precondition, assertion_name)
-
-			time_after_preconds = time.time()
-			print(f"Time for preconditions: {time_after_preconds - time_after_constraint_prop}")
-
-			# --------------------------------------- Capability Effect ---------------------------------------
-			self.add_comment(solver, "Start of effects")
-			effects = capability_effects_smt(happenings, event_bound)
-			effect_counter = 0
-			for effect in effects:
-				effect_counter += 1
-				assertion_name = f'effect_{effect_counter}_{happenings}'
-				self.assertion_dictionary[assertion_name] = effect
-				solver.assert_and_track(effect, assertion_name)
-
-			time_after_effects = time.time()
-			print(f"Time for effects: {time_after_effects - time_after_preconds}")
-
-			# ---------------- Constraints Capability mutexes (H14) -----------------------------------------
-			self.add_comment(solver, "Start of capability mutexes")
-			capability_mutexes = get_capability_mutexes(happenings)
-			capability_mutex_counter = 0
-			for capability_mutex in capability_mutexes:
-				capability_mutex_counter += 1
-				assertion_name = f'capMutex_{capability_mutex_counter}_{happenings}'
-				self.assertion_dictionary[assertion_name] = capability_mutex
-				solver.assert_and_track(capability_mutex, assertion_name)
-			
-			time_after_mutexes = time.time()
-			print(f"Time for mutexes: {time_after_mutexes - time_after_effects}")
-
-			# ---------------- Init  --------------------------------------------------------
-			self.add_comment(solver, "Start of init")
-			init_constraints = init_smt()
-			init_counter = 0
-			for init in init_constraints:
-				init_counter += 1
-				assertion_name = f'init_{init_counter}_{happenings}'
-				self.assertion_dictionary[assertion_name] = init
-				solver.assert_and_track(init, assertion_name)
-
-			time_after_inits = time.time()
-			print(f"Time for inits: {time_after_inits - time_after_mutexes}")
-
-			# ---------------------- Goal ------------------------------------------------- 
-			self.add_comment(solver, "Start of goal")
-			goal_constraints = goal_smt(happenings)
-			goal_counter = 0
-			for goal in goal_constraints:
-				goal_counter += 1
-				assertion_name = f'goal_{goal_counter}_{happenings}'
-				self.assertion_dictionary[assertion_name] = goal
-				solver.assert_and_track(goal, assertion_name)
-
-			time_after_goals = time.time()
-			print(f"Time for goals: {time_after_goals - time_after_mutexes}")
-
-			# ------------------- Proposition support (P5 + P6) ----------------------------
-			self.add_comment(solver, "Start of proposition support")
-			proposition_supports = getPropositionSupports(happenings, event_bound)
-			suppport_counter = 0
-			for support in proposition_supports:
-				suppport_counter += 1
-				assertion_name = f'support_{suppport_counter}_{happenings}'
-				self.assertion_dictionary[assertion_name] = support
-				solver.assert_and_track(support, assertion_name)
-			
-			time_after_prop_support = time.time()
-			print(f"Time for prop support: {time_after_prop_support - time_after_goals}")
-
-			# ----------------- Continuous change on real variables (P11) ------------------
-			self.add_comment(solver, "Start of real variable continuous change")
-			real_variable_cont_changes = get_real_variable_continuous_changes(happenings, event_bound)
-			real_variable_cont_change_counter = 0
-			for real_variable_cont_change in real_variable_cont_changes:
-				real_variable_cont_change_counter += 1
-				assertion_name = f'realVarContChange_{real_variable_cont_change_counter}_{happenings}'
-				self.assertion_dictionary[assertion_name] = real_variable_cont_change
-				solver.assert_and_track(real_variable_cont_change, assertion_name)
-
-			time_after_realVarContChange = time.time()
-			print(f"Time for real var conti change: {time_after_realVarContChange - time_after_prop_support}")
-
-
-			# Capability constraints are expressions in smt2 form that cannot be added programmatically, because we only have the whole expression in string form 
-			# after parsing it from OpenMath RDF. Hence, we must read it as string into a temp solver and then add all assertions into our main solver
-			self.add_comment(solver, "Start of capability constraints")
-
-			if problem_location:
-				with open(problem_location, 'w', encoding='utf-8') as file:
-					file.write(solver.to_smt2())
-
-			temp_solver = Solver()
-			# Add property z3 variables (they are needed for constraints in the next step)
-			temp_solver_string = "\n".join(
-				[f'(declare-fun {occurrence.z3_variable.sexpr()} () {occurrence.type})' for occurrence in property_dictionary.get_all_property_occurences()]
-			)
-			# Add capability z3 variables (they are needed for constraints in the next step)
-			temp_solver_string += "\n".join(
-				[f'(declare-fun {occurrence.z3_variable.sexpr()} () Bool)' for occurrence in capability_dictionary.get_all_capability_occurrences()]
-			)
-			# Add constraints
-			constraints = capability_constraints_smt(happenings, event_bound)
-			for constraint in constraints:
-				temp_solver_string += f"\n{constraint}" 
-
-			temp_solver.from_string(temp_solver_string)
-			temp_solver_assertions = temp_solver.assertions()
-
-			# add all assertions back into main solver, now with tracking
-			cap_constraint_counter = 0
-			for capability_constraint_assertion in temp_solver_assertions:
-				cap_constraint_counter += 1
-				assertion_name = f'capConstraint_{cap_constraint_counter}_{happenings}'
-				self.assertion_dictionary[assertion_name] = capability_constraint_assertion
-				solver.assert_and_track(capability_constraint_assertion, assertion_name)
-
-			time_after_cap_constraints = time.time()
-			print(f"Time for cap constraints: {time_after_cap_constraints - time_after_realVarContChange}")
-
-
-			self.add_comment(solver, "Start of constants")
-			constant_expressions = fix_constants(property_dictionary, capability_dictionary, happenings, event_bound)
-			constant_counter = 0
-			for constant_expression in constant_expressions:
-				constant_counter += 1
-				assertion_name = f'constant_{constant_counter}'
-				self.assertion_dictionary[assertion_name] = constant_expression
-				solver.assert_and_track(constant_expression, assertion_name)
-				
-			time_after_constants = time.time()
-			print(f"Time for constants: {time_after_constants - time_after_cap_constraints}")
-			
-
-			self.add_comment(solver, "Start of floating variable bindings")
-			binding_expressions = bind_floating_variables()
-			binding_counter = 0
-			for binding_expression in binding_expressions:
-				binding_counter += 1
-				assertion_name = f'binding_{binding_counter}'
-				self.assertion_dictionary[assertion_name] = binding_expression
-				solver.assert_and_track(binding_expression, assertion_name)
-					
-			time_after_binding_floating_values = time.time()
-			print(f"Time for binding free values: {time_after_binding_floating_values - time_after_constants}")
+			if incremental:
+				# Only the newly added happening needs to be encoded, all earlier ones are still in the solver
+				self._add_happening_constraints(solver, happenings, event_bound, happenings - 1, problem_location)
+				if happenings == 1:
+					self._add_initial_constraints(solver)
+				solver.push()
+				self._add_goal_constraints(solver, happenings)
+			else:
+				# Only the last horizon needs tracked assertions for the unsat core
+				solver = self._encode_horizon(happenings, event_bound, problem_location, happenings == max_happenings)
 
-			
 			# Optimize by minimizing number of used capabilities to prevent unnecessary use of capabilities
 			#constraints = solver.assertions()
 			# opt = Optimize()
@@ -350,134 +746,38 @@ class CaskadePlanner:
 			end_time = time.time()
 			print(f"Time for generating SMT overall: {end_time - start_time}")	
 			print(f"Time for generating this happening: {end_time - time_loop_start}")	
+			number_of_assertions = len(solver.assertions())
+			self._report_progress(ProgressEventType.HAPPENING_ENCODED, end_time - time_loop_start, happenings, number_of_assertions)
 
 			# Check satisfiability and get the model
-			solver_result = solver.check()
+			solver_result = self._check_with_time_budget(solver)
 			end_time_solver = time.time()
-			print(f"Number of Assertions: {len(solver.assertions())}")
+			print(f"Number of Assertions: {number_of_assertions}")
 			print(f"Time for solving SMT: {end_time_solver - end_time}")
+			self._report_progress(ProgressEventType.HAPPENING_SOLVED, end_time_solver - end_time, happenings, number_of_assertions, str(solver_result))
+			probes.append(HorizonProbe(happenings, str(solver_result), end_time - time_loop_start, end_time_solver - end_time))
 
 			if solver_result == unsat:
 				print(f"No solution with {happenings} happening(s) found.")
+				# Remove the goal of this horizon before the next happening is added. In the last iteration, the scope is kept to extract the unsat core
+				if incremental and happenings < max_happenings:
+					solver.pop()
+			elif solver_result == unknown:
+				return self._create_timeout_result(probes)
 			else:
-				if not find_all_solutions:
-					# Original behavior: return first solution found
-					model = solver.model()
-					replaced_model = self._extract_model_dict(model)
-					
-					# Create the result
-					result = PlanningResult(PlanningResultType.SAT, replaced_model, None)
-					self._save_optional_outputs(result, solver, model, problem_location, model_location, plan_location)
+				result = self._create_sat_result(solver, find_all_solutions, problem_location, model_location, plan_location)
+				if result is not None:
+					result.horizon_probes = probes
 					return result
-				else:
-					# Find all solutions
-					all_models = []
-					solution_count = 0
-					
-					while solver_result == sat:
-						solution_count += 1
-						model = solver.model()
-						replaced_model = self._extract_model_dict(model)
-						all_models.append(replaced_model)
-						
-						print(f"Found solution {solution_count}")
-						print(f"Model has {len(replaced_model)} variables")
-						
-						# For debugging, limit to 10 solutions to prevent infinite loops during testing
-						if solution_count >= 10:
-							print("Reached debug limit of 10 solutions - stopping search")
-							break
-						
-						# Create a constraint that excludes this solution
-						capability_dictionary = state_handler.get_capability_dictionary()
-						
-						# Collect all TRUE capabilities from this solution
-						true_capabilities = []
-						all_capabilities = {**capability_dictionary.provided_capabilities, **capability_dictionary.required_capabilities}
-						
-						for capability in all_capabilities.values():
-							for occurrence in capability.occurrences.values():
-								# Check the capability variable directly in the Z3 model, not in the replaced dict
-								try:
-									z3_value = model.eval(occurrence.z3_variable)
-									is_true = bool(z3_value)
-									
-									if is_true:
-										true_capabilities.append(occurrence.z3_variable)
-								except Exception as e:
-									continue
-						
-						print(f"Found {len(true_capabilities)} true capabilities in solution")
-						if true_capabilities:
-							capability_names = [str(cap).replace('http://example.org/ontologies/', '') for cap in true_capabilities]
-							print(f"  Capabilities: {capability_names}")
-						
-						
-						if true_capabilities:
-							# Exclude this exact combination: NOT (all true capabilities are true)
-							# This means at least one of the currently true capabilities must be false
-							exclusion_constraint = Not(And(*true_capabilities))
-							solver.add(exclusion_constraint)
-							print(f"  Added exclusion constraint to prevent this exact combination")
-						else:
-							print("  No true capabilities found - this might indicate a problem!")
-						
-						# Try to find another solution
-						solver_result = solver.check()
-					
-					if len(all_models) == 1:
-						# Only one solution found, return as single solution
-						result = PlanningResult(PlanningResultType.SAT, all_models[0], None)
-						self._save_optional_outputs(result, solver, None, problem_location, model_location, plan_location)
-						return result
-					elif len(all_models) > 1:
-						# Multiple solutions found
-						result = PlanningResult(PlanningResultType.MULTIPLE_SAT, None, None, all_models)
-						self._save_optional_outputs(result, solver, None, problem_location, model_location, plan_location)
-						return result
-					else:
-						print(f"No solution with {happenings} happening(s) found.")
+				print(f"No solution with {happenings} happening(s) found.")
 				
 		
-		unsat_core = solver.unsat_core()
-		# Retransform unsat core to insert original properties instead of assertion_name
-		transformed_unsat_core = []
-		for core in unsat_core:
-			core_elem = self.assertion_dictionary[str(core)]
-			transformed_unsat_core.append(core_elem)
-
-		muc = find_minimal_unsat_core(transformed_unsat_core)
-		unsat_core_string = []
-		for core in muc:
-			unsat_core_string.append(str(core))
-		result = PlanningResult(PlanningResultType.UNSAT, None, unsat_core_string)
-		end_time_muc = time.time()
-		print(f"Time for finding MUC: {end_time_muc - end_time_solver}")
+		result = self._create_unsat_result(solver)
+		result.horizon_probes = probes
 		return result
 
 
 
-def is_unsat_core(core):
-	s = Solver()
-	for c in core:
-		s.add(c)
-	return s.check() == unsat
-
-def find_minimal_unsat_core(core):
-	# Überprüfen, ob der initiale Core unsatisfiable ist
-	if not is_unsat_core(core):
-		return core
-	
-	# Versuche, eine minimale unsatisfiable Menge zu finden
-	for i in range(len(core)):
-		reduced_core = core[:i] + core[i+1:]
-		if is_unsat_core(reduced_core):
-			return find_minimal_unsat_core(reduced_core)
-	
-	# Wenn keine Verkleinerung möglich ist, gebe den aktuellen Core zurück
-	return core
-
-
 # Checks if a variable is already asserted
 def find_variable_in_expression(expression, variable):
 	# The first layer of equations consists of implies because of all the names needed for unsat cores. 
@@ -1,16 +1,15 @@
 from z3 import Implies, Not, Or
 from typing import List
 
-from smt_planning.smt.StateHandler import StateHandler
+from smt_planning.smt.planning_context import PlanningContext
 from smt_planning.dicts.CapabilityDictionary import Capability
 from smt_planning.smt.property_links import get_related_properties
 from smt_planning.smt.capability_links import get_related_capabilities
 
-def get_bool_constraints(happenings: int, event_bound: int) -> List:
+def get_bool_constraints(context: PlanningContext, happenings: int, event_bound: int, first_happening: int = 0) -> List:
 
-	stateHandler = StateHandler()	
-	property_dictionary = stateHandler.get_property_dictionary()
-	capability_dictionary = stateHandler.get_capability_dictionary()
+	property_dictionary = context.get_property_dictionary()
+	capability_dictionary = context.get_capability_dictionary()
 	
 	constraints = []
 	properties = property_dictionary.provided_properties.values()
@@ -23,13 +22,13 @@ def get_bool_constraints(happenings: int, event_bound: int) -> List:
 		
 		related_capabilities: List[Capability] = []
 		for capability_iri in property_capability_iris:
-			current_cap_related_capabilities = get_related_capabilities(capability_iri, original_property.iri)
+			current_cap_related_capabilities = get_related_capabilities(context, capability_iri, original_property.iri)
 			related_capabilities.extend(current_cap_related_capabilities)
 		
 		all_capabilities = [*capabilities, *related_capabilities]
 		
 		# Get all properties (this one and its related ones)
-		related_properties = get_related_properties(original_property.iri)
+		related_properties = get_related_properties(context, original_property.iri)
 		all_properties = [original_property, *related_properties]
 
 		all_true_setting_capabilities: List[Capability] = []
@@ -41,7 +40,7 @@ def get_bool_constraints(happenings: int, event_bound: int) -> List:
 				if capability.sets_property_false(property):
 					all_false_setting_capabilities.append(capability)
 
-		for happening in range(happenings):
+		for happening in range(first_happening, happenings):
 			prop_start = original_property.occurrences[happening][0].z3_variable
 			prop_end = original_property.occurrences[happening][1].z3_variable
 			all_true_setting_capability_variables = [cap.occurrences[happening].z3_variable for cap in all_true_setting_capabilities]
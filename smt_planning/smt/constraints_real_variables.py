@@ -1,17 +1,16 @@
 from z3 import Implies, Not, And
 from typing import List
 
-from smt_planning.smt.StateHandler import StateHandler
+from smt_planning.smt.planning_context import PlanningContext
 from smt_planning.dicts.PropertyDictionary import Property
 from smt_planning.dicts.CapabilityDictionary import Capability
 from smt_planning.smt.property_links import get_related_properties
 from smt_planning.smt.capability_links import get_related_capabilities
 
-def get_variable_constraints(happenings: int, event_bound: int) -> List:
+def get_variable_constraints(context: PlanningContext, happenings: int, event_bound: int, first_happening: int = 0) -> List:
 
-	stateHandler = StateHandler()
-	property_dictionary = stateHandler.get_property_dictionary()
-	capability_dictionary = stateHandler.get_capability_dictionary()
+	property_dictionary = context.get_property_dictionary()
+	capability_dictionary = context.get_capability_dictionary()
 	
 	constraints = []
 	properties = property_dictionary.provided_properties.values()
@@ -24,13 +23,13 @@ def get_variable_constraints(happenings: int, event_bound: int) -> List:
 		
 		related_capabilities: List[Capability] = []
 		for capability_iri in property_capability_iris:
-			current_cap_related_capabilities = get_related_capabilities(capability_iri, original_property.iri)
+			current_cap_related_capabilities = get_related_capabilities(context, capability_iri, original_property.iri)
 			related_capabilities.extend(current_cap_related_capabilities)
 		
 		all_capabilities = [*capabilities, *related_capabilities]
 		
 		# Get all properties (this one and its related ones)
-		related_properties = get_related_properties(original_property.iri)
+		related_properties = get_related_properties(context, original_property.iri)
 		all_properties = [original_property, *related_properties]
 
 		all_capabilities_with_numeric_influence: List[Capability] = []
@@ -42,7 +41,7 @@ def get_variable_constraints(happenings: int, event_bound: int) -> List:
 					break	
 
 
-		for happening in range(happenings):
+		for happening in range(first_happening, happenings):
 			prop_start = original_property.occurrences[happening][0].z3_variable
 			prop_end = original_property.occurrences[happening][1].z3_variable
 			all_capability_variables_with_numeric_influence = [cap.occurrences[happening].z3_variable for cap in all_capabilities_with_numeric_influence]
@@ -3,13 +3,14 @@ from z3 import BoolRef, ArithRef
 from smt_planning.dicts.PropertyDictionary import PropertyDictionary, Property
 from smt_planning.dicts.CapabilityDictionary import CapabilityDictionary
 
-def fix_constants(property_dictionary: PropertyDictionary, capability_dictionary: CapabilityDictionary, happenings: int, event_bound: int):
+def fix_constants(property_dictionary: PropertyDictionary, capability_dictionary: CapabilityDictionary, happenings: int, event_bound: int, first_happening: int = 0):
 	# TODO: Add a real logic to find constants. For now hard coded. Rule for constants: properties that are not written by caps
 	constants : List[Property]  = [prop for prop in property_dictionary.provided_properties.values() if "Module_StationID" in prop.iri]
 	constant_expressions : List[BoolRef | ArithRef | bool] = []
 	for constant in constants:
-		occurences_vars = [prop.z3_variable for prop in constant.get_all_occurrences()]
-		constant_constraint = [occurences_vars[i] == occurences_vars[i+1] for i in range(len(occurences_vars) - 1)]
+		occurrences = [occ for occ in constant.get_all_occurrences() if occ.happening < happenings]
+		# Chain all occurrences. Links ending in happenings before first_happening have already been created before
+		constant_constraint = [occurrences[i].z3_variable == occurrences[i+1].z3_variable for i in range(len(occurrences) - 1) if occurrences[i+1].happening >= first_happening]
 		constant_expressions.extend(constant_constraint)
 
 	return constant_expressions
@@ -1,10 +1,10 @@
 from z3 import Not
 
-from smt_planning.smt.StateHandler import StateHandler
+from smt_planning.smt.planning_context import PlanningContext
 from smt_planning.smt.property_links import get_related_properties
 
-def goal_smt(happenings: int):
-	property_dictionary = StateHandler().get_property_dictionary()
+def goal_smt(context: PlanningContext, happenings: int):
+	property_dictionary = context.get_property_dictionary()
 	goals = []
 	for goal_property_iri, goal_value_expressions in property_dictionary.goals.items():
 		# Every goal may consist of multiple value expressions (e.g., goal > 5 , goal <= 10). Create assertions for every goal expression
@@ -47,7 +47,7 @@ def goal_smt(happenings: int):
 		# 2: Relate goals. We need to get all outputs of the required capability and make sure that related output properties are bound to the valu of these outputs
 		# Only constrain output properties because we are only interested in the final output. The input depends on the capability and must not be "over-constrained"
 		# Handle related properties of every init property
-		related_properties = get_related_properties(goal_property_iri)
+		related_properties = get_related_properties(context, goal_property_iri)
 		for related_property in related_properties:
 			if (related_property.relation_type == "Input"): continue
 			try:
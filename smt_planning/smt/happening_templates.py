@@ -0,0 +1,63 @@
+from typing import Callable, Dict, List, Tuple, TYPE_CHECKING
+
+from z3 import And, BoolRef, ExprRef, substitute
+
+if TYPE_CHECKING:
+	from smt_planning.smt.planning_context import PlanningContext
+
+# Constraint families are built with the same signature as capability_preconditions_smt: (context, happenings, event_bound, first_happening) -> constraints
+ConstraintFamily = Callable[["PlanningContext", int, int, int], List]
+
+
+class HappeningTemplates:
+	"""
+	Many constraint families have the same shape in every happening. Such a family is built only once over the variables of happening 0 (its template).
+	Constraints of further happenings are instantiated from the template by substituting all happening-0 variables with the ones of the respective happening.
+	Templates are only valid for the dictionaries of their planning context
+	"""
+	def __init__(self, context: "PlanningContext"):
+		self.context = context
+		self.templates: Dict[str, List[BoolRef]] = {}
+		self.substitutions: Dict[int, List[Tuple[ExprRef, ExprRef]]] = {}
+
+	def get_constraints(self, family_name: str, build_family: ConstraintFamily, happenings: int, event_bound: int, first_happening: int = 0) -> List[BoolRef]:
+		'''
+		Returns all constraints of the given family for the happenings first_happening..happenings-1.
+		build_family is only called the first time a family is requested, afterwards its template is reused
+		'''
+		template = self.templates.get(family_name)
+		if template is None:
+			template = build_family(self.context, 1, event_bound, 0)
+			self.templates[family_name] = template
+
+		constraints = []
+		for happening in range(first_happening, happenings):
+			constraints.extend(self._instantiate(template, happening, event_bound))
+		return constraints
+
+	def _instantiate(self, template: List[BoolRef], happening: int, event_bound: int) -> List[BoolRef]:
+		if happening == 0 or len(template) == 0:
+			return list(template)
+
+		# All constraints of a template are substituted in one call. Z3 doesn't simplify during substitution, so the conjunction keeps one child per constraint
+		substitution = self._get_substitution(happening, event_bound)
+		instantiated_template = substitute(And(*template), *substitution)
+		return instantiated_template.children()
+
+	def _get_substitution(self, happening: int, event_bound: int) -> List[Tuple[ExprRef, ExprRef]]:
+		# Maps all variables of happening 0 onto the ones of the given happening. Required properties only exist once and are not substituted
+		if happening in self.substitutions:
+			return self.substitutions[happening]
+
+		property_dictionary = self.context.get_property_dictionary()
+		capability_dictionary = self.context.get_capability_dictionary()
+		substitution = []
+		for property in property_dictionary.provided_properties.values():
+			for event in range(event_bound):
+				substitution.append((property.occurrences[0][event].z3_variable, property.occurrences[happening][event].z3_variable))
+		all_capabilities = {**capability_dictionary.provided_capabilities, **capability_dictionary.required_capabilities}
+		for capability in all_capabilities.values():
+			substitution.append((capability.occurrences[0].z3_variable, capability.occurrences[happening].z3_variable))
+
+		self.substitutions[happening] = substitution
+		return substitution
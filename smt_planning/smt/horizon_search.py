@@ -0,0 +1,102 @@
+import time
+from enum import Enum
+from typing import List, Tuple, TYPE_CHECKING
+
+from z3 import Solver, CheckSatResult, sat, unsat, unknown
+
+from smt_planning.planning_result import PlanningResult, HorizonProbe, ProgressEventType
+
+if TYPE_CHECKING:
+	from smt_planning.smt.cask_to_smt import CaskadePlanner
+
+class HorizonStrategy(str, Enum):
+	"""
+	Strategies to find the minimal number of happenings.
+	LINEAR: Check 1, 2, 3, ... happenings until a plan is found
+	EXPONENTIAL: Double the number of happenings (1, 2, 4, 8, ...) until a plan is found, then binary search down to the minimal number
+	BINARY: Check max_happenings first, then binary search down to the minimal number
+	"""
+	LINEAR = "linear"
+	EXPONENTIAL = "exponential"
+	BINARY = "binary"
+
+
+def _probe_horizon(planner: "CaskadePlanner", happenings: int, max_happenings: int, event_bound: int, probes: List[HorizonProbe], problem_location = None) -> Tuple[CheckSatResult, Solver | None]:
+	# Encodes and checks the problem with exactly the given number of happenings and records the probe. Unknown if the time budget is exceeded
+	if planner._is_out_of_time():
+		return unknown, None
+	time_probe_start = time.time()
+	# Only an unsat result for max_happenings is reported with an unsat core
+	solver = planner._encode_horizon(happenings, event_bound, problem_location, happenings == max_happenings)
+	time_after_encoding = time.time()
+	number_of_assertions = len(solver.assertions())
+	planner._report_progress(ProgressEventType.HAPPENING_ENCODED, time_after_encoding - time_probe_start, happenings, number_of_assertions)
+	solver_result = planner._check_with_time_budget(solver)
+	time_after_solving = time.time()
+	planner._report_progress(ProgressEventType.HAPPENING_SOLVED, time_after_solving - time_after_encoding, happenings, number_of_assertions, str(solver_result))
+
+	probes.append(HorizonProbe(happenings, str(solver_result), time_after_encoding - time_probe_start, time_after_solving - time_after_encoding))
+	print(f"Probed {happenings} happening(s): {solver_result}. Encoding: {time_after_encoding - time_probe_start}, solving: {time_after_solving - time_after_encoding}")
+	return solver_result, solver
+
+
+def search_horizon(planner: "CaskadePlanner", max_happenings: int, strategy: HorizonStrategy, event_bound: int, problem_location = None, model_location = None, plan_location = None, find_all_solutions: bool = False) -> PlanningResult:
+	'''
+	Searches for the minimal number of happenings with the exponential or binary strategy. Setup of the planner must be done before.
+	Works because a plan with k happenings can always be extended to k+1 happenings by a happening in which no capability is used.
+	'''
+	probes: List[HorizonProbe] = []
+	largest_unsat = 0
+	smallest_sat = None
+	sat_solver = None
+
+	if strategy == HorizonStrategy.EXPONENTIAL:
+		# Doubling phase: Find an upper bound
+		happenings = 1
+		while True:
+			solver_result, solver = _probe_horizon(planner, happenings, max_happenings, event_bound, probes, problem_location)
+			if solver_result == unknown:
+				return planner._create_timeout_result(probes)
+			if solver_result == sat:
+				smallest_sat, sat_solver = happenings, solver
+				break
+			largest_unsat = happenings
+			if happenings >= max_happenings:
+				break
+			happenings = min(happenings * 2, max_happenings)
+	else:
+		# Binary strategy starts with the upper bound directly
+		solver_result, solver = _probe_horizon(planner, max_happenings, max_happenings, event_bound, probes, problem_location)
+		if solver_result == unknown:
+			return planner._create_timeout_result(probes)
+		if solver_result == sat:
+			smallest_sat, sat_solver = max_happenings, solver
+		else:
+			largest_unsat = max_happenings
+
+	if smallest_sat is None or sat_solver is None:
+		# Even the largest number of happenings is unsat, so the unsat core of this last probe is returned
+		print(f"No solution with up to {max_happenings} happening(s) found.")
+		assert solver is not None
+		result = planner._create_unsat_result(solver)
+		result.horizon_probes = probes
+		return result
+
+	# Binary search phase: Everything up to largest_unsat is unsat, smallest_sat is sat
+	while smallest_sat - largest_unsat > 1:
+		happenings = (largest_unsat + smallest_sat) // 2
+		solver_result, solver = _probe_horizon(planner, happenings, max_happenings, event_bound, probes, problem_location)
+		if solver_result == unknown:
+			# The smallest plan found so far is returned, but it is not proven to be minimal
+			print(f"Smallest number of happenings found so far: {smallest_sat}")
+			return planner._create_timeout_result(probes, [planner._extract_model_dict(sat_solver.model())], False)
+		if solver_result == sat:
+			smallest_sat, sat_solver = happenings, solver
+		else:
+			largest_unsat = happenings
+
+	print(f"Minimal number of happenings: {smallest_sat}")
+	result = planner._create_sat_result(sat_solver, find_all_solutions, problem_location, model_location, plan_location)
+	assert result is not None
+	result.horizon_probes = probes
+	return result
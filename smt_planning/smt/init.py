@@ -1,13 +1,13 @@
 from z3 import Not
 
-from smt_planning.smt.StateHandler import StateHandler
+from smt_planning.smt.planning_context import PlanningContext
 from smt_planning.smt.property_links import get_related_properties
 
-def init_smt():
+def init_smt(context: PlanningContext):
 	'''
 	Creates SMT expressions for inits and resource configurations (both are handled similarily)
 	'''
-	property_dictionary = StateHandler().get_property_dictionary()
+	property_dictionary = context.get_property_dictionary()
 	init_constraints = []
 	inits = property_dictionary.inits.items()
 	resource_configs = property_dictionary.resource_configurations.items()
@@ -0,0 +1,74 @@
+import time
+from enum import Enum
+from typing import List
+
+from z3 import Solver, Bool, Implies, unsat, sat
+
+
+class AssertionTracking(str, Enum):
+	"""
+	Defines how assertions are tracked to extract unsat cores.
+	INDIVIDUAL: One tracking literal per assertion
+	GROUP: One tracking literal per constraint family and encoded happenings. Cores are refined to individual assertions when they are minimized
+	NONE: No tracking at all. Fastest, but no unsat core can be extracted
+	"""
+	INDIVIDUAL = "individual"
+	GROUP = "group"
+	NONE = "none"
+
+
+def find_minimal_unsat_core(core: List, time_budget: float | None = None) -> List:
+	'''
+	Deletion-based search for a minimal unsat core (MUS) of the given constraints.
+	All constraints are added once to a single solver, each guarded by an assumption literal. Removing a constraint is done by leaving out its literal,
+	so Z3 keeps what it has learned between checks. Whenever a check is unsat, its core is used to drop all candidates that are not part of it at once.
+	If time_budget (in seconds) is exceeded, the smallest core found so far is returned. This core is still unsat, but may not be minimal.
+	'''
+	start_time = time.time()
+	solver = Solver()
+	literals = []
+	for index, constraint in enumerate(core):
+		literal = Bool(f"__muc_{index}")
+		solver.add(Implies(literal, constraint))
+		literals.append(literal)
+	literal_indices = {str(literal): index for index, literal in enumerate(literals)}
+
+	def remaining_ms() -> int | None:
+		if time_budget is None:
+			return None
+		return max(int((time_budget - (time.time() - start_time)) * 1000), 1)
+
+	def check(indices: List[int]):
+		timeout = remaining_ms()
+		if timeout is not None:
+			solver.set(timeout=timeout)
+		return solver.check(*[literals[index] for index in indices])
+
+	def indices_in_core() -> set:
+		return {literal_indices[str(literal)] for literal in solver.unsat_core()}
+
+	# Check if the initial core is unsat at all. Its core might already be a lot smaller
+	if check(list(range(len(core)))) != unsat:
+		return core
+	candidates = sorted(indices_in_core())
+
+	# Constraints that are known to be part of the MUS. Removing one of them makes the remaining set sat
+	required: List[int] = []
+	while candidates:
+		if time_budget is not None and time.time() - start_time > time_budget:
+			print(f"Time budget of {time_budget}s for finding MUC exceeded. Returning a core that may not be minimal")
+			break
+
+		candidate = candidates.pop(0)
+		check_result = check(required + candidates)
+		if check_result == unsat:
+			# Candidate is not needed. All other candidates that are not in the new core can be dropped as well
+			core_indices = indices_in_core()
+			candidates = [index for index in candidates if index in core_indices]
+		elif check_result == sat:
+			required.append(candidate)
+		else:
+			# Unknown (e.g., because of the time budget): keep the candidate so that the result is still unsat
+			required.append(candidate)
+
+	return [core[index] for index in sorted(required + candidates)]
@@ -0,0 +1,122 @@
+import multiprocessing
+import queue
+import time
+from typing import Dict, FrozenSet, Iterator, List, Set, Tuple, TYPE_CHECKING
+
+from z3 import Bool, sat
+
+from smt_planning.planning_result import PlanningResult, PlanningResultType
+from smt_planning.smt.planning_context import PlanningContext
+from smt_planning.smt.parallel_planning import serialize_model, deserialize_model, _get_worker_planner
+
+if TYPE_CHECKING:
+	from smt_planning.smt.cask_to_smt import CaskadePlanner
+
+# A cube fixes some capability occurrences to true or false: [(z3 variable name, value)]
+Cube = List[Tuple[str, bool]]
+
+
+def create_cubes(context: PlanningContext) -> List[Cube]:
+	'''
+	Splits the search space into disjoint cubes based on the capability that is used at happening 0.
+	Cube i contains all plans that use the i-th provided capability at happening 0, but none of the capabilities before it.
+	The last cube contains all plans that use no provided capability at happening 0. Together, the cubes cover all plans
+	'''
+	capability_dictionary = context.get_capability_dictionary()
+	first_occurrences = [str(capability.occurrences[0].z3_variable) for capability in capability_dictionary.provided_capabilities.values() if 0 in capability.occurrences]
+
+	cubes: List[Cube] = []
+	for index, variable_name in enumerate(first_occurrences):
+		cube = [(earlier_variable_name, False) for earlier_variable_name in first_occurrences[:index]]
+		cube.append((variable_name, True))
+		cubes.append(cube)
+	cubes.append([(variable_name, False) for variable_name in first_occurrences])
+	return cubes
+
+
+def enumerate_cube(required_capability_iri: str, query_handler_source: Tuple[str, str], planner_settings: Dict, happenings: int, cube: Cube, max_solutions: int | None, deadline: float | None) -> List[Dict[str, Tuple[str, str]]]:
+	'''
+	Worker function: Enumerates all plans with the given number of happenings that lie in the given cube. Returns serialized models
+	'''
+	# Local import, cask_to_smt imports this module
+	from smt_planning.smt.cask_to_smt import EVENT_BOUND
+	planner = _get_worker_planner(required_capability_iri, query_handler_source, planner_settings)
+	start_time = time.time()
+	time_limit = None if deadline is None else deadline - start_time
+	if time_limit is not None and time_limit <= 0:
+		return []
+
+	solver = planner._encode_horizon(happenings, EVENT_BOUND, None, False)
+	solver.add(*[Bool(variable_name) == value for variable_name, value in cube])
+	if time_limit is not None:
+		solver.set(timeout=max(int(time_limit * 1000), 1))
+	if solver.check() != sat:
+		return []
+
+	return [serialize_model(model) for model in planner._enumerate_models(solver, max_solutions, time_limit, start_time)]
+
+
+def _get_capability_key(model: Dict, capability_variable_names: Set[str]) -> FrozenSet[str]:
+	# Two plans are the same if they use the same capabilities at the same happenings (same criterion as the blocking clauses during enumeration)
+	return frozenset(name for name, value in model.items() if value is True and name in capability_variable_names)
+
+
+def iterate_solutions_in_parallel(planner: "CaskadePlanner", happenings: int, first_model: Dict | None, workers: int, max_solutions: int | None = None, time_limit: float | None = None, start_time: float | None = None) -> Iterator[PlanningResult]:
+	'''
+	Yields all plans with the given number of happenings. The search space is split into cubes (see create_cubes) that are enumerated by a pool of worker processes.
+	Plans are yielded whenever a cube is finished, duplicates are filtered out. first_model is an already found model that is yielded first.
+	Setup of the planner and its dictionaries for the given number of happenings must be done before.
+	'''
+	if start_time is None:
+		start_time = time.time()
+	deadline = None if time_limit is None else start_time + time_limit
+
+	context = planner._get_context()
+	capability_dictionary = context.get_capability_dictionary()
+	capability_variable_names = {str(occurrence.z3_variable) for occurrence in capability_dictionary.get_all_capability_occurrences()}
+	seen_keys: Set[FrozenSet[str]] = set()
+	solution_count = 0
+
+	if first_model is not None:
+		seen_keys.add(_get_capability_key(first_model, capability_variable_names))
+		solution_count += 1
+		yield PlanningResult(PlanningResultType.SAT, first_model, None, context=context)
+		if max_solutions is not None and solution_count >= max_solutions:
+			return
+
+	cubes = create_cubes(context)
+	print(f"Enumerating {len(cubes)} cubes with {workers} workers")
+	results: queue.Queue = queue.Queue()
+	# Spawn instead of fork so that workers don't inherit any planning state or Z3 internals of this process
+	pool = multiprocessing.get_context("spawn").Pool(processes=workers)
+	try:
+		for cube in cubes:
+			arguments = (planner.required_capability_iri, planner.query_handler_source, planner._get_settings(), happenings, cube, max_solutions, deadline)
+			pool.apply_async(enumerate_cube, arguments, callback=results.put, error_callback=results.put)
+
+		for _ in range(len(cubes)):
+			try:
+				cube_result = results.get(timeout=None if deadline is None else max(deadline - time.time(), 0))
+			except queue.Empty:
+				print(f"Reached time limit of {time_limit}s - stopping search")
+				return
+			if isinstance(cube_result, BaseException):
+				raise cube_result
+
+			for serialized_model in cube_result:
+				model = deserialize_model(serialized_model)
+				key = _get_capability_key(model, capability_variable_names)
+				if key in seen_keys:
+					continue
+				seen_keys.add(key)
+				solution_count += 1
+				yield PlanningResult(PlanningResultType.SAT, model, None, context=context)
+				if max_solutions is not None and solution_count >= max_solutions:
+					print(f"Reached limit of {max_solutions} solutions - stopping search")
+					return
+
+			if deadline is not None and time.time() > deadline:
+				print(f"Reached time limit of {time_limit}s - stopping search")
+				return
+	finally:
+		pool.terminate()
@@ -0,0 +1,232 @@
+import json
+import multiprocessing
+import queue
+import time
+from typing import Dict, List, Tuple, TYPE_CHECKING
+
+from z3 import unsat, sat, unknown, IntVal, RealVal, is_int_value, is_rational_value, is_algebraic_value
+
+from smt_planning.planning_result import PlanningResult, PlanningResultType, HorizonProbe, ProgressEventType
+from smt_planning.smt.unsat_core_cache import DEFAULT_CACHE_DIRECTORY
+from smt_planning.smt.variable_declaration import create_property_dictionary_with_occurrences, create_capability_dictionary_with_occurrences
+
+if TYPE_CHECKING:
+	from smt_planning.smt.cask_to_smt import CaskadePlanner
+
+# Seconds after which the portfolio checks whether planning was interrupted
+INTERRUPT_POLL_INTERVAL = 0.5
+
+# Result of one worker: (happenings, result, serialized model, unsat core, unsat core handle, smt2 problem, encoding time, solving time)
+HorizonResult = Tuple[int, str, Dict[str, Tuple[str, str]] | None, List[str] | None, str | None, str | None, float, float]
+
+# Every worker process keeps one planner, i.e., its own planning state. Setup is done once per worker and reused for all horizons it checks
+_worker_planner = None
+_worker_planner_key = None
+
+
+def serialize_model(model_dict: Dict) -> Dict[str, Tuple[str, str]]:
+	'''
+	Z3 values cannot be sent between processes. Converts a model dict (as created by CaskadePlanner._extract_model_dict) into plain strings with their sort
+	'''
+	serialized_model = {}
+	for name, value in model_dict.items():
+		if isinstance(value, bool):
+			serialized_model[name] = ("Bool", str(value))
+		elif is_int_value(value):
+			serialized_model[name] = ("Int", str(value))
+		elif is_rational_value(value):
+			serialized_model[name] = ("Real", str(value))
+		elif is_algebraic_value(value):
+			# Irrational values are approximated, only rationals can be rebuilt
+			serialized_model[name] = ("Real", str(value.approx(20)))
+	return serialized_model
+
+
+def deserialize_model(serialized_model: Dict[str, Tuple[str, str]]) -> Dict:
+	'''
+	Rebuilds a model dict with z3 values from the output of serialize_model
+	'''
+	model_dict = {}
+	for name, (sort, value) in serialized_model.items():
+		if sort == "Bool":
+			model_dict[name] = (value == "True")
+		elif sort == "Int":
+			model_dict[name] = IntVal(value)
+		else:
+			model_dict[name] = RealVal(value)
+	return model_dict
+
+
+def _get_worker_planner(required_capability_iri: str, query_handler_source: Tuple[str, str], planner_settings: Dict) -> "CaskadePlanner":
+	# Local import, cask_to_smt imports this module
+	from smt_planning.smt.cask_to_smt import CaskadePlanner
+	global _worker_planner, _worker_planner_key
+
+	# The planning problem depends on how it is extracted, so planners of different extractions aren't reused for each other
+	planner_key = (required_capability_iri, query_handler_source, planner_settings["extraction"])
+	if _worker_planner is None or _worker_planner_key != planner_key:
+		planner = CaskadePlanner(required_capability_iri)
+		planner.with_query_handler_source(query_handler_source)
+		# Settings are applied before setup, so that the planning problem is extracted like in the main process
+		planner._apply_settings(planner_settings)
+		planner._setup_planning_problem()
+		_worker_planner = planner
+		_worker_planner_key = planner_key
+
+	_worker_planner._apply_settings(planner_settings)
+	if _worker_planner.lazy_unsat_core and not _worker_planner.unsat_core_cache_directory:
+		# Cached encodings of a worker must be written to disk, otherwise they are lost with the worker process
+		_worker_planner.with_lazy_unsat_core(True, DEFAULT_CACHE_DIRECTORY)
+	return _worker_planner
+
+
+def solve_horizon(required_capability_iri: str, query_handler_source: Tuple[str, str], happenings: int, with_unsat_core: bool, with_problem: bool, planner_settings: Dict) -> HorizonResult:
+	'''
+	Worker function: Checks the planning problem with exactly the given number of happenings in a fresh solver
+	'''
+	# Local import, cask_to_smt imports this module
+	from smt_planning.smt.cask_to_smt import EVENT_BOUND
+	planner = _get_worker_planner(required_capability_iri, query_handler_source, planner_settings)
+	if planner._is_out_of_time():
+		return (happenings, str(unknown), None, None, None, None, 0, 0)
+	time_start = time.time()
+	solver = planner._encode_horizon(happenings, EVENT_BOUND, None, with_unsat_core)
+	time_after_encoding = time.time()
+	solver_result = planner._check_with_time_budget(solver)
+	solving_time = time.time() - time_after_encoding
+	encoding_time = time_after_encoding - time_start
+	problem = solver.to_smt2() if with_problem else None
+	if solver_result == sat:
+		model_dict = planner._extract_model_dict(solver.model())
+		return (happenings, str(solver_result), serialize_model(model_dict), None, None, problem, encoding_time, solving_time)
+
+	unsat_core = None
+	unsat_core_handle = None
+	if solver_result == unsat and with_unsat_core:
+		unsat_result = planner._create_unsat_result(solver)
+		unsat_core = unsat_result.unsat_core
+		unsat_core_handle = unsat_result.unsat_core_handle
+	return (happenings, str(solver_result), None, unsat_core, unsat_core_handle, problem, encoding_time, solving_time)
+
+
+def plan_with_horizon_portfolio(planner: "CaskadePlanner", max_happenings: int, workers: int, problem_location = None, model_location = None, plan_location = None, find_all_solutions: bool = False) -> PlanningResult:
+	'''
+	Checks all numbers of happenings from 1 to max_happenings in a pool of worker processes. Every worker has its own planning state.
+	The smallest satisfiable number of happenings is returned as soon as all smaller ones have been shown to be unsat. Remaining workers are then cancelled.
+	'''
+	print(f"Started planning with a portfolio of {workers} workers. This may take a while...")
+	start_time = time.time()
+
+	results: queue.Queue = queue.Queue()
+	# Spawn instead of fork so that workers don't inherit any planning state or Z3 internals of this process
+	pool = multiprocessing.get_context("spawn").Pool(processes=workers)
+	try:
+		# Tasks are started in order, so that smaller horizons are always checked first
+		for happenings in range(1, max_happenings + 1):
+			is_last = (happenings == max_happenings)
+			arguments = (planner.required_capability_iri, planner.query_handler_source, happenings, is_last, problem_location is not None, planner._get_settings())
+			pool.apply_async(solve_horizon, arguments, callback=results.put, error_callback=results.put)
+
+		# While workers are busy, this process does its own setup. It is needed to turn the workers' models into plans
+		planner._setup_planning_problem()
+		print(f"Time for setup: {time.time() - start_time}")
+		planner._report_progress(ProgressEventType.SETUP_DONE, time.time() - start_time)
+
+		horizon_results: Dict[int, HorizonResult] = {}
+		next_happenings = 1
+		while next_happenings <= max_happenings:
+			try:
+				# Results are polled, so that an interrupt of the planner is noticed as well
+				remaining_time = planner._get_remaining_time()
+				horizon_result = results.get(timeout=INTERRUPT_POLL_INTERVAL if remaining_time is None else min(remaining_time, INTERRUPT_POLL_INTERVAL))
+			except queue.Empty:
+				if not planner._is_out_of_time():
+					continue
+				# Time budget exceeded or interrupted, workers are terminated below
+				return _create_portfolio_timeout_result(planner, horizon_results)
+			if isinstance(horizon_result, BaseException):
+				raise horizon_result
+
+			print(f"Result for {horizon_result[0]} happening(s): {horizon_result[1]} after {time.time() - start_time}")
+			horizon_results[horizon_result[0]] = horizon_result
+			# Workers don't report their number of assertions
+			planner._report_progress(ProgressEventType.HAPPENING_ENCODED, horizon_result[6], horizon_result[0])
+			planner._report_progress(ProgressEventType.HAPPENING_SOLVED, horizon_result[7], horizon_result[0], None, horizon_result[1])
+
+			# Results can come in any order, only the lowest open horizon decides
+			while next_happenings in horizon_results:
+				happenings, solver_result, serialized_model, unsat_core, unsat_core_handle, problem, encoding_time, solving_time = horizon_results[next_happenings]
+				if solver_result == str(sat) and serialized_model is not None:
+					result = _create_portfolio_sat_result(planner, happenings, serialized_model, problem, problem_location, model_location, plan_location, find_all_solutions)
+					result.horizon_probes = _get_probes(horizon_results)
+					return result
+				if solver_result == str(unknown):
+					return _create_portfolio_timeout_result(planner, horizon_results)
+
+				print(f"No solution with {happenings} happening(s) found.")
+				if happenings == max_happenings:
+					result = PlanningResult(PlanningResultType.UNSAT, None, unsat_core or [])
+					result.unsat_core_handle = unsat_core_handle
+					result.horizon_probes = _get_probes(horizon_results)
+					return result
+				next_happenings += 1
+	finally:
+		pool.terminate()
+
+	return PlanningResult(PlanningResultType.UNSAT, None, [])
+
+
+def _get_probes(horizon_results: Dict[int, HorizonResult]) -> List[HorizonProbe]:
+	# All horizons that were finished so far, ordered by number of happenings
+	return [HorizonProbe(happenings, solver_result, encoding_time, solving_time) for happenings, solver_result, _, _, _, _, encoding_time, solving_time in sorted(horizon_results.values(), key=lambda r: r[0])]
+
+
+def _add_occurrences(planner: "CaskadePlanner", happenings: int) -> None:
+	# Local import, cask_to_smt imports this module
+	from smt_planning.smt.cask_to_smt import EVENT_BOUND
+	# Occurrences up to the found horizon are needed to retransform a model of a worker into a plan
+	context = planner._get_context()
+	create_property_dictionary_with_occurrences(context, happenings, EVENT_BOUND)
+	create_capability_dictionary_with_occurrences(context, happenings)
+
+
+def _create_portfolio_timeout_result(planner: "CaskadePlanner", horizon_results: Dict[int, HorizonResult]) -> PlanningResult:
+	# Larger horizons may have been sat before all smaller ones were checked. The smallest plan found so far is returned, but it is not proven to be minimal
+	sat_results = [horizon_result for horizon_result in horizon_results.values() if horizon_result[1] == str(sat) and horizon_result[2] is not None]
+	if not sat_results:
+		return planner._create_timeout_result(_get_probes(horizon_results))
+	happenings, _, serialized_model, _, _, _, _, _ = min(sat_results, key=lambda r: r[0])
+	print(f"Smallest number of happenings found so far: {happenings}")
+	_add_occurrences(planner, happenings)
+	return planner._create_timeout_result(_get_probes(horizon_results), [deserialize_model(serialized_model)], False) # type: ignore
+
+
+def _create_portfolio_sat_result(planner: "CaskadePlanner", happenings: int, serialized_model: Dict[str, Tuple[str, str]], problem: str | None, problem_location = None, model_location = None, plan_location = None, find_all_solutions: bool = False) -> PlanningResult:
+	# Local import, cask_to_smt imports this module
+	from smt_planning.smt.cask_to_smt import EVENT_BOUND
+	if find_all_solutions:
+		# Enumeration needs a solver, so the smallest satisfiable horizon is encoded and solved again in this process
+		solver = planner._encode_horizon(happenings, EVENT_BOUND)
+		if planner._check_with_time_budget(solver) != sat:
+			return planner._create_timeout_result([])
+		result = planner._create_sat_result(solver, True, problem_location, model_location, plan_location)
+		assert result is not None
+		return result
+
+	_add_occurrences(planner, happenings)
+	result = PlanningResult(PlanningResultType.SAT, deserialize_model(serialized_model), None, context=planner._get_context())
+
+	if problem_location and problem:
+		with open(problem_location, 'w') as file:
+			file.write(problem)
+
+	if model_location:
+		model_dict = {name: value for name, (sort, value) in serialized_model.items()}
+		with open(model_location, 'w') as file:
+			json.dump(model_dict, file, indent=4)
+
+	if plan_location:
+		with open(plan_location, 'w') as json_file:
+			json.dump(result, json_file, default=lambda o: o.to_json(), indent=4)
+
+	return result
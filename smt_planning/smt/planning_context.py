@@ -0,0 +1,69 @@
+from typing import Dict, List
+
+from rdflib.query import Result
+
+from smt_planning.dicts.CapabilityDictionary import CapabilityDictionary
+from smt_planning.dicts.PropertyDictionary import PropertyDictionary
+from smt_planning.dicts.ResourceDictionary import ResourceDictionary
+from smt_planning.ontology_handling.query_handlers import QueryHandler
+from smt_planning.ontology_handling.graph_traversal import Extraction, GraphTraversal
+
+class PlanningContext:
+	"""
+	All state of one planning problem: The query handler, the dictionaries and all caches that are derived from them.
+	A context is created for every planning problem and passed explicitly to all functions that need it, so that multiple plans can be created in one process
+	"""
+	def __init__(self, query_handler: QueryHandler | None, required_capability_iri: str, extraction: Extraction = Extraction.SPARQL) -> None:
+		# Local import because property links need the context to query the graph
+		from smt_planning.smt.property_links import PropertyPairCache
+		from smt_planning.smt.happening_templates import HappeningTemplates
+
+		# None for planning problems that are created from a planning model
+		self.query_handler = query_handler
+		self.required_capability_iri = required_capability_iri
+		# Whether query results are evaluated by the query handler or created by a graph traversal (see extract)
+		self.extraction = extraction
+		# Differences between query results and graph traversal results. Only collected with Extraction.DIFFERENTIAL
+		self.extraction_differences: List[str] = []
+		self.__property_dictionary: PropertyDictionary | None = None
+		self.__capability_dictionary: CapabilityDictionary | None = None
+		self.__resource_dictionary: ResourceDictionary | None = None
+		# Pairs of properties that are implicitly related across capabilities. Found once with the first request
+		self.property_pairs = PropertyPairCache(self)
+		# Result of the query for all OpenMath applications. The same result is used for all capability constraints
+		self.open_math_query_result: Result | None = None
+		# OpenMath constraints as trees by the IRI of their root application (see get_constraint_tree)
+		self.constraint_trees: Dict[str, Dict] = {}
+		# Maps names of tracked assertions to the assertion (or list of assertions for groups)
+		self.assertion_dictionary: Dict = {}
+		# Constraint families that are built once and instantiated for every happening
+		self.happening_templates = HappeningTemplates(self)
+
+	def get_query_handler(self) -> QueryHandler:
+		if self.query_handler is None:
+			raise Exception("This planning problem was created from a planning model and can't query the ontology")
+		return self.query_handler
+
+	def get_graph_traversal(self) -> GraphTraversal:
+		return self.get_query_handler().get_graph_traversal()
+
+	def set_property_dictionary(self, property_dictionary: PropertyDictionary):
+		self.__property_dictionary = property_dictionary
+
+	def get_property_dictionary(self) -> PropertyDictionary:
+		assert self.__property_dictionary is not None
+		return self.__property_dictionary
+
+	def set_capability_dictionary(self, capability_dictionary: CapabilityDictionary):
+		self.__capability_dictionary = capability_dictionary
+
+	def get_capability_dictionary(self) -> CapabilityDictionary:
+		assert self.__capability_dictionary is not None
+		return self.__capability_dictionary
+
+	def set_resource_dictionary(self, resource_dictionary: ResourceDictionary):
+		self.__resource_dictionary = resource_dictionary
+
+	def get_resource_dictionary(self) -> ResourceDictionary:
+		assert self.__resource_dictionary is not None
+		return self.__resource_dictionary
@@ -0,0 +1,183 @@
+import json
+import os
+import time
+from typing import Dict, List, Set
+
+from smt_planning.dicts.PropertyDictionary import PropertyDictionary
+from smt_planning.dicts.CapabilityDictionary import CapabilityDictionary, CapabilityPropertyInfluence, PropertyChange
+from smt_planning.dicts.ResourceDictionary import ResourceDictionary
+from smt_planning.types.Property import Property
+from smt_planning.types.InstanceDescription import InstanceDescription, Precondition, Effect, Init, ResourceConfiguration, Goal, FreeVariable
+from smt_planning.smt.planning_context import PlanningContext
+from smt_planning.openmath.parse_openmath import get_constraint_tree
+
+PLANNING_MODEL_FORMAT = "caskade-planning-model"
+PLANNING_MODEL_VERSION = 1
+
+# Planning models are written with their format first, so that they can be told apart from ontologies without parsing them
+_PLANNING_MODEL_PREFIX = json.dumps({"format": PLANNING_MODEL_FORMAT})[:-1].encode("utf-8")
+
+# Kinds of instance descriptions with their type and the entry of the property dictionary they are stored in
+_INSTANCE_DESCRIPTIONS = {
+	"Precondition": (Precondition, "preconditions"),
+	"Effect": (Effect, "effects"),
+	"Init": (Init, "inits"),
+	"ResourceConfiguration": (ResourceConfiguration, "resource_configurations"),
+	"Goal": (Goal, "goals"),
+	"FreeVariable": (FreeVariable, "free_variables"),
+}
+
+
+def _instance_to_json(instance: InstanceDescription) -> Dict:
+	return {"kind": type(instance).__name__, "capability": instance.cap_iri, "logicalInterpretation": instance.logical_interpretation, "value": instance.value}
+
+
+def _instance_from_json(iri: str, instance: Dict) -> InstanceDescription:
+	instance_type = _INSTANCE_DESCRIPTIONS[instance["kind"]][0]
+	if instance_type == FreeVariable:
+		return FreeVariable(iri, instance["capability"], instance["logicalInterpretation"])
+	return instance_type(iri, instance["capability"], instance["logicalInterpretation"], instance["value"])
+
+
+def _property_to_json(property: Property) -> Dict:
+	return {
+		"iri": property.iri,
+		"dataType": property.data_type,
+		"relationType": property.relation_type,
+		"capabilities": sorted(property.capability_iris),
+		"instances": [_instance_to_json(instance) for instance in property.instances]
+	}
+
+
+def _get_related_property_classes(property_pairs: Dict[str, Set[Property]]) -> List[List[str]]:
+	# Related properties are closed transitively (see expand_transitive_relations), so every property of a class is related to all other properties of its class
+	related_property_classes: List[List[str]] = []
+	assigned_iris = set()
+	for iri, related_properties in property_pairs.items():
+		if iri in assigned_iris or len(related_properties) == 0:
+			continue
+		related_property_class = [iri, *sorted(related_property.iri for related_property in related_properties)]
+		assigned_iris.update(related_property_class)
+		related_property_classes.append(related_property_class)
+	return related_property_classes
+
+
+def create_planning_model(context: PlanningContext) -> Dict:
+	'''
+	Creates a planning model from a planning problem that was set up from an ontology. Contains everything that is needed for planning:
+	All dictionaries, the capability constraints as trees and the classes of related properties. Everything is stored as JSON, so the model can be written to a file
+	'''
+	property_dictionary = context.get_property_dictionary()
+	capability_dictionary = context.get_capability_dictionary()
+	resource_dictionary = context.get_resource_dictionary()
+	capability_constraints = capability_dictionary.input_capability_constraints + capability_dictionary.output_capability_constraints
+
+	instance_descriptions = []
+	for _, entry in _INSTANCE_DESCRIPTIONS.values():
+		for iri, instances in getattr(property_dictionary, entry).items():
+			instance_descriptions.extend({"property": iri, **_instance_to_json(instance)} for instance in instances)
+
+	def capability_to_json(capability) -> Dict:
+		return {
+			"iri": capability.iri,
+			"inputs": [property.iri for property in capability.input_properties],
+			"outputs": [{"property": influence.property.iri, "change": influence.effect.name} for influence in capability.output_properties]
+		}
+
+	return {
+		"format": PLANNING_MODEL_FORMAT,
+		"version": PLANNING_MODEL_VERSION,
+		"requiredCapability": context.required_capability_iri,
+		"requiredProperties": [_property_to_json(property) for property in property_dictionary.required_properties.values()],
+		"providedProperties": [_property_to_json(property) for property in property_dictionary.provided_properties.values()],
+		"instanceDescriptions": instance_descriptions,
+		"requiredCapabilities": [capability_to_json(capability) for capability in capability_dictionary.required_capabilities.values()],
+		"providedCapabilities": [capability_to_json(capability) for capability in capability_dictionary.provided_capabilities.values()],
+		"inputConstraints": [{"capability": info.cap, "constraint": info.constraintIri} for info in capability_dictionary.input_capability_constraints],
+		"outputConstraints": [{"capability": info.cap, "constraint": info.constraintIri} for info in capability_dictionary.output_capability_constraints],
+		"resources": [{"iri": resource.iri, "capabilities": [capability.iri for capability in resource.capabilities]} for resource in resource_dictionary.resources.values()],
+		"constraintTrees": {info.constraintIri: get_constraint_tree(context, info.constraintIri) for info in capability_constraints},
+		"relatedProperties": _get_related_property_classes(context.property_pairs.get_property_pairs())
+	}
+
+
+def create_planning_context(planning_model: Dict, required_capability_iri: str) -> PlanningContext:
+	'''
+	Creates the planning problem of a planning model without an ontology. Every call creates new dictionaries, as they are changed while encoding
+	'''
+	if planning_model["requiredCapability"] != required_capability_iri:
+		raise Exception(f"The planning model was exported for the required capability {planning_model['requiredCapability']}, not for {required_capability_iri}. Export a planning model for {required_capability_iri}.")
+	context = PlanningContext(None, required_capability_iri)
+
+	property_dictionary = PropertyDictionary()
+	for required_property in planning_model["requiredProperties"]:
+		iri = required_property["iri"]
+		property_dictionary.add_required_property_occurence(iri, required_property["dataType"], required_property["relationType"], set(required_property["capabilities"]))
+		for instance in required_property["instances"]:
+			property_dictionary.required_properties[iri].add_instance(_instance_from_json(iri, instance))
+	for provided_property in planning_model["providedProperties"]:
+		iri = provided_property["iri"]
+		property_dictionary.add_provided_property(iri, provided_property["dataType"], provided_property["relationType"], set(provided_property["capabilities"]))
+		for instance in provided_property["instances"]:
+			property_dictionary.provided_properties[iri].add_instance(_instance_from_json(iri, instance))
+	for instance in planning_model["instanceDescriptions"]:
+		iri = instance["property"]
+		getattr(property_dictionary, _INSTANCE_DESCRIPTIONS[instance["kind"]][1]).setdefault(iri, set()).add(_instance_from_json(iri, instance))
+	context.set_property_dictionary(property_dictionary)
+
+	capability_dictionary = CapabilityDictionary()
+	def get_capability_properties(capability: Dict):
+		input_properties = [property_dictionary.get_property(iri) for iri in capability["inputs"]]
+		output_properties = [CapabilityPropertyInfluence(property_dictionary.get_property(output["property"]), PropertyChange[output["change"]]) for output in capability["outputs"]]
+		return input_properties, output_properties
+	for capability in planning_model["requiredCapabilities"]:
+		capability_dictionary.add_required_capability(capability["iri"], *get_capability_properties(capability))
+	for capability in planning_model["providedCapabilities"]:
+		capability_dictionary.add_provided_capability(capability["iri"], *get_capability_properties(capability))
+	for constraint in planning_model["inputConstraints"]:
+		capability_dictionary.add_capability_constraint(constraint["capability"], constraint["constraint"], True)
+	for constraint in planning_model["outputConstraints"]:
+		capability_dictionary.add_capability_constraint(constraint["capability"], constraint["constraint"])
+	context.set_capability_dictionary(capability_dictionary)
+
+	resource_dictionary = ResourceDictionary()
+	for resource in planning_model["resources"]:
+		resource_dictionary.add_resource(resource["iri"], [capability_dictionary.get_provided_capability(iri) for iri in resource["capabilities"]])
+	context.set_resource_dictionary(resource_dictionary)
+
+	# Trees are only read while encoding, so all contexts can share them
+	context.constraint_trees.update(planning_model["constraintTrees"])
+	property_pairs: Dict[str, Set[Property]] = {}
+	for related_property_class in planning_model["relatedProperties"]:
+		related_properties = [property_dictionary.get_property(iri) for iri in related_property_class]
+		for property in related_properties:
+			property_pairs[property.iri] = {related_property for related_property in related_properties if related_property.iri != property.iri}
+	context.property_pairs.set_property_pairs(property_pairs)
+	return context
+
+
+def is_planning_model(filename: str) -> bool:
+	if not os.path.isfile(filename):
+		return False
+	with open(filename, "rb") as file:
+		return file.read(len(_PLANNING_MODEL_PREFIX)) == _PLANNING_MODEL_PREFIX
+
+
+def write_planning_model(planning_model: Dict, model_file: str) -> None:
+	# Written to a temporary file first, so that loaders never see an incomplete planning model
+	temporary_file = f"{model_file}.{os.getpid()}.tmp"
+	with open(temporary_file, "w") as output:
+		json.dump(planning_model, output)
+	os.replace(temporary_file, model_file)
+
+
+def read_planning_model(model_file: str) -> Dict:
+	start_time = time.time()
+	if not is_planning_model(model_file):
+		raise Exception(f"{model_file} is not a planning model. Export it with export-model first.")
+	with open(model_file, "r") as file:
+		planning_model = json.load(file)
+	if planning_model["version"] != PLANNING_MODEL_VERSION:
+		raise Exception(f"Planning model {model_file} has version {planning_model['version']} instead of {PLANNING_MODEL_VERSION}. Export it again.")
+	print(f"Time for loading planning model {model_file}: {time.time() - start_time}")
+	return planning_model
@@ -1,12 +1,15 @@
-from typing import List, Mapping, Dict, Set
+from typing import List, Mapping, Dict, Set, TYPE_CHECKING
 
-from rdflib import Graph, Variable
+from rdflib import Graph, URIRef, Variable
 from rdflib.term import Identifier 
 from z3 import BoolRef
 
-from smt_planning.smt.StateHandler import StateHandler
 from smt_planning.dicts.PropertyDictionary import Property
 from smt_planning.types.InstanceDescription import ResourceConfiguration
+from smt_planning.ontology_handling.graph_traversal import extract
+
+if TYPE_CHECKING:
+	from smt_planning.smt.planning_context import PlanningContext
 
 
 # Define some variables to get values from SPARQL results
@@ -17,25 +20,35 @@ FPB_SUBTYPE = Variable("fpbSubType")
 FPB_TYPE = Variable("fpbType")
 
 
-# Private class that should not be imported. Instead only module functions are availalble outside this module
-class _PropertyPairCache:
-	property_pairs: Dict[str, Set[Property]] = dict()
-	required_capability_iri = None
+# Every planning context has its own cache. Outside of this module, only the module functions should be used
+class PropertyPairCache:
+	def __init__(self, context: "PlanningContext") -> None:
+		self.context = context
+		self.property_pairs: Dict[str, Set[Property]] = dict()
+		# Pairs are only searched once, even if there are no related properties at all
+		self.found_property_pairs = False
+		self.required_capability_iri: str | None = context.required_capability_iri
 
 	def get_property_pairs(self):
 		if self.required_capability_iri is None:
 			raise Exception("Required capability IRI is not set. Make sure to set it first as it is required for queries")
 		
-		if len(self.property_pairs.keys()) == 0:
-			self.find_property_pairs()			
+		if not self.found_property_pairs:
+			self.find_property_pairs()
+			self.found_property_pairs = True
 
 		return self.property_pairs
 
 	def set_required_capability(self, required_capability_iri: str):
 		self.required_capability_iri = required_capability_iri
 
+	def set_property_pairs(self, property_pairs: Dict[str, Set[Property]]):
+		# Pairs that were found before, e.g., loaded from a planning model
+		self.property_pairs = property_pairs
+		self.found_property_pairs = True
+
 	def get_related_properties(self, property_iri:str) -> List[Property]:
-		property_dictionary = StateHandler().get_property_dictionary()
+		property_dictionary = self.context.get_property_dictionary()
 		result_related_properties: List[Property] = []
 
 		# Find all related partners of the given property
@@ -89,7 +102,7 @@ class _PropertyPairCache:
 				^CSS:requiresCapability ?process.
 			values ?capType { CaSk:ProvidedCapability CaSk:RequiredCapability }.
 			# Filter to get only provided caps AND the one required that we are planning for
-			FILTER(?capType = CaSk:ProvidedCapability || ?cap = <{required_cap_iri}>)
+			FILTER(?capType = CaSk:ProvidedCapability || ?cap = ?requiredCap)
 			?process VDI3682:hasInput|VDI3682:hasOutput ?inOut.
 			?de a DINEN61360:Data_Element.
 			?de DINEN61360:has_Type_Description ?td;
@@ -107,13 +120,13 @@ class _PropertyPairCache:
 			?fpbSubType rdfs:subClassOf* ?fpbType.
 		}
 		"""
-		query_string = query_string.replace('{required_cap_iri}', self.required_capability_iri)
-		query_handler = StateHandler().get_query_handler()
-		result = query_handler.query(query_string)
+		required_capability_iri = self.required_capability_iri
+		result = extract(self.context, "Property pairs across capabilities", query_string, {"requiredCap": URIRef(required_capability_iri)},
+				lambda traversal: traversal.get_property_pairs_across_caps(required_capability_iri))
 		# Creates a list of pairs of related properties, i.e. a properties with a different data_element that is still implicitly connected and thus must be linked in SMT
 		# Requirement for a related property:
 		# Must belong to different capability, must have same type description and either both properties dont have a product subtype or both have the same subtype
-		property_dictionary = StateHandler().get_property_dictionary()
+		property_dictionary = self.context.get_property_dictionary()
 		
 		for binding in result.bindings:
 			related_bindings = list(filter(lambda x: self.is_related_property_binding(binding, x), result.bindings))
@@ -168,9 +181,8 @@ class _PropertyPairCache:
 			FILTER(!CONTAINS(STR(?de_b), "Slide"))
 		}
 		"""
-		query_handler = StateHandler().get_query_handler()
-		property_dictionary = StateHandler().get_property_dictionary()
-		result = query_handler.query(query_string)
+		property_dictionary = self.context.get_property_dictionary()
+		result = extract(self.context, "Property pairs in capabilities", query_string, None, lambda traversal: traversal.get_property_pairs_in_caps())
 		DE_A = Variable("de_a")
 		DE_B = Variable("de_b")
 		for binding in result.bindings:
@@ -289,16 +301,14 @@ class _PropertyPairCache:
 
 	def reset(self):
 		self.property_pairs = dict()
+		self.found_property_pairs = False
 
 
-# Create one module-wide instance
-property_pair_cache = _PropertyPairCache()
-
-def set_required_capability(required_capability_iri: str):
-	return property_pair_cache.set_required_capability(required_capability_iri)
+def set_required_capability(context: "PlanningContext", required_capability_iri: str):
+	return context.property_pairs.set_required_capability(required_capability_iri)
 
-def get_related_properties(property_iri: str) -> List[Property]:
-	return property_pair_cache.get_related_properties(property_iri)
+def get_related_properties(context: "PlanningContext", property_iri: str) -> List[Property]:
+	return context.property_pairs.get_related_properties(property_iri)
 
-def reset_property_pairs() -> None:
-	property_pair_cache.reset()
\ No newline at end of file
+def reset_property_pairs(context: "PlanningContext") -> None:
+	context.property_pairs.reset()
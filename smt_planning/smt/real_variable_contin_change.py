@@ -1,16 +1,17 @@
 from typing import List
 
 from smt_planning.dicts.PropertyDictionary import PropertyDictionary, FreeVariable
-from smt_planning.smt.StateHandler import StateHandler
+from smt_planning.smt.planning_context import PlanningContext
 
 
-def get_real_variable_continuous_changes(happenings: int, event_bound: int) -> List:
+def get_real_variable_continuous_changes(context: PlanningContext, happenings: int, event_bound: int, first_happening: int = 0) -> List:
 	continuous_changes = []
 
-	property_dictionary = StateHandler().get_property_dictionary()
+	property_dictionary = context.get_property_dictionary()
 	properties = property_dictionary.provided_properties.values()
 
-	for happening in range(happenings)[1:]:
+	# Happening 0 has no predecessor, so continuous changes start at happening 1 at the earliest
+	for happening in range(max(first_happening, 1), happenings):
 		for property in properties:
 			if property.data_type == "http://www.w3id.org/hsu-aut/DINEN61360#Real" or property.data_type == "http://www.w3id.org/hsu-aut/DINEN61360#Integer":
 				free_variables = [instance for instance in property.instances if isinstance(instance, FreeVariable)]
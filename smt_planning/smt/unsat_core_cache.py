@@ -0,0 +1,142 @@
+import json
+import os
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List
+
+from z3 import Solver, Bool, BoolRef, Implies, is_implies, is_and, unsat
+
+from smt_planning.smt.minimal_unsat_core import AssertionTracking, find_minimal_unsat_core
+
+# Directory that is used to share encodings between processes, e.g., between a planning call and a later CLI call that computes the unsat core
+DEFAULT_CACHE_DIRECTORY = os.path.join(tempfile.gettempdir(), "caskade-planner", "unsat-cores")
+# Number of encodings that are kept in memory and in a cache directory. Older ones are removed
+MAX_CACHED_ENCODINGS = 32
+
+
+class CachedEncoding:
+	"""
+	An unsatisfiable encoding that is kept to compute its unsat core later on.
+	Tracked assertions are stored without their tracking literal, so that they can be minimized individually
+	"""
+	def __init__(self, tracked_assertions: Dict[str, BoolRef], untracked_assertions: List[BoolRef], assertion_tracking: AssertionTracking):
+		self.tracked_assertions = tracked_assertions
+		self.untracked_assertions = untracked_assertions
+		self.assertion_tracking = assertion_tracking
+
+	@staticmethod
+	def from_solver(solver: Solver, tracking_names: List[str], assertion_tracking: AssertionTracking) -> "CachedEncoding":
+		# Tracked assertions have the form tracking_name => assertion
+		names = set(tracking_names)
+		tracked_assertions = {}
+		untracked_assertions = []
+		for assertion in solver.assertions():
+			if is_implies(assertion) and str(assertion.arg(0)) in names:
+				tracked_assertions[str(assertion.arg(0))] = assertion.arg(1)
+			else:
+				untracked_assertions.append(assertion)
+		return CachedEncoding(tracked_assertions, untracked_assertions, assertion_tracking)
+
+	@staticmethod
+	def from_json(encoding_json: Dict) -> "CachedEncoding":
+		# The problem contains all tracked assertions in the order of their names, followed by all untracked ones
+		solver = Solver()
+		solver.from_string(encoding_json["problem"])
+		assertions = list(solver.assertions())
+		tracking_names = encoding_json["trackingNames"]
+		tracked_assertions = dict(zip(tracking_names, assertions[:len(tracking_names)]))
+		return CachedEncoding(tracked_assertions, assertions[len(tracking_names):], AssertionTracking(encoding_json["assertionTracking"]))
+
+	def to_json(self) -> Dict:
+		# Tracking literals are left out on purpose, Z3 rewrites nested implications when printing SMT-LIB which would hide them
+		solver = Solver()
+		solver.add(*self.tracked_assertions.values())
+		solver.add(*self.untracked_assertions)
+		dict = {
+			"assertionTracking": self.assertion_tracking.value,
+			"trackingNames": list(self.tracked_assertions.keys()),
+			"problem": solver.to_smt2()
+		}
+		return dict
+
+
+_cached_encodings: OrderedDict[str, CachedEncoding] = OrderedDict()
+
+
+def cache_unsat_encoding(solver: Solver, tracking_names: List[str], assertion_tracking: AssertionTracking, cache_directory: str | None = None) -> str:
+	'''
+	Stores an unsatisfiable encoding and returns a handle to compute its unsat core later with compute_unsat_core.
+	The encoding is kept in memory. If cache_directory is given, it is also written to disk so that other processes can use it.
+	'''
+	handle = uuid.uuid4().hex
+	encoding = CachedEncoding.from_solver(solver, tracking_names, assertion_tracking)
+	_cached_encodings[handle] = encoding
+	while len(_cached_encodings) > MAX_CACHED_ENCODINGS:
+		_cached_encodings.popitem(last=False)
+
+	if cache_directory:
+		time_before_writing = time.time()
+		os.makedirs(cache_directory, exist_ok=True)
+		with open(os.path.join(cache_directory, f"{handle}.json"), 'w') as file:
+			json.dump(encoding.to_json(), file)
+		_remove_old_encodings(cache_directory)
+		print(f"Time for caching encoding: {time.time() - time_before_writing}")
+
+	return handle
+
+
+def _remove_old_encodings(cache_directory: str) -> None:
+	cached_files = [os.path.join(cache_directory, filename) for filename in os.listdir(cache_directory) if filename.endswith(".json")]
+	cached_files.sort(key=os.path.getmtime)
+	for cached_file in cached_files[:-MAX_CACHED_ENCODINGS]:
+		os.remove(cached_file)
+
+
+def _get_cached_encoding(handle: str, cache_directory: str | None) -> CachedEncoding:
+	if handle in _cached_encodings:
+		return _cached_encodings[handle]
+
+	# Handles are hex strings. Everything else could be used to read arbitrary files
+	if cache_directory and all(char in "0123456789abcdef" for char in handle):
+		file_path = os.path.join(cache_directory, f"{handle}.json")
+		if os.path.isfile(file_path):
+			with open(file_path, 'r') as file:
+				encoding_json = json.load(file)
+			return CachedEncoding.from_json(encoding_json)
+
+	raise ValueError(f"No cached encoding for unsat core handle {handle}")
+
+
+def compute_unsat_core(handle: str, time_budget: float | None = None, cache_directory: str | None = DEFAULT_CACHE_DIRECTORY) -> List[str]:
+	'''
+	Computes the minimal unsat core of a cached encoding. The handle is looked up in memory first and in cache_directory afterwards.
+	Encodings without tracked assertions are minimized over all their assertions.
+	'''
+	time_before_muc = time.time()
+	encoding = _get_cached_encoding(handle, cache_directory)
+	tracked_assertions = encoding.tracked_assertions
+
+	if len(tracked_assertions) == 0:
+		candidates = list(encoding.untracked_assertions)
+	else:
+		# Find the tracked assertions that are part of the core first, then refine them
+		solver = Solver()
+		solver.add(*encoding.untracked_assertions)
+		for name, tracked_assertion in tracked_assertions.items():
+			solver.add(Implies(Bool(name), tracked_assertion))
+		if solver.check(*[Bool(name) for name in tracked_assertions]) != unsat:
+			return []
+		candidates = []
+		for core in solver.unsat_core():
+			tracked_assertion = tracked_assertions[str(core)]
+			# Groups are refined to their individual assertions
+			if encoding.assertion_tracking == AssertionTracking.GROUP and is_and(tracked_assertion):
+				candidates.extend(tracked_assertion.children())
+			else:
+				candidates.append(tracked_assertion)
+
+	muc = find_minimal_unsat_core(candidates, time_budget)
+	print(f"Time for finding MUC: {time.time() - time_before_muc}")
+	return [str(core) for core in muc]
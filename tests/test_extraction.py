@@ -0,0 +1,78 @@
+import json
+import os
+
+import pytest
+
+from smt_planning.ontology_handling.graph_traversal import Extraction
+from smt_planning.ontology_handling.query_handlers import FileQueryHandler
+from smt_planning.smt.cask_to_smt import CaskadePlanner
+from smt_planning.smt.parallel_planning import _get_worker_planner
+
+ONTOLOGY_DIRECTORY = os.path.join(os.path.dirname(__file__), "ontologies")
+REQUIRED_CAPABILITY = "http://example.org/test#Req"
+
+# Ontologies with the required capability that is planned for
+PLANNING_PROBLEMS = [
+	("drilling.ttl", REQUIRED_CAPABILITY),
+	("drilling_alternatives.ttl", REQUIRED_CAPABILITY),
+	("drilling_unsat.ttl", REQUIRED_CAPABILITY),
+	("extraction_edge_cases.ttl", REQUIRED_CAPABILITY),
+	("extraction_edge_cases.ttl", "http://example.org/test#Req2"),
+]
+
+
+def create_planner(ontology: str, required_capability_iri: str, extraction: Extraction) -> CaskadePlanner:
+	# Without a query cache, every planner evaluates its queries on its own graph
+	planner = CaskadePlanner(required_capability_iri)
+	planner.with_file_query_handler(os.path.join(ONTOLOGY_DIRECTORY, ontology), query_cache=None)
+	planner.with_extraction(extraction)
+	return planner
+
+
+def normalize(value):
+	# Plans contain sets (e.g., inputs of a capability), so lists are compared regardless of their order
+	if isinstance(value, dict):
+		return {key: normalize(entry) for key, entry in value.items()}
+	if isinstance(value, list):
+		return sorted((normalize(entry) for entry in value), key=lambda entry: json.dumps(entry, sort_keys=True, default=str))
+	return value
+
+
+def get_plan_json(planner: CaskadePlanner) -> dict:
+	result_json = planner.cask_to_smt(5).to_json()
+	# Time stamps and timings differ between runs
+	result_json.pop("timeCreated")
+	result_json.pop("horizonProbes")
+	return normalize(result_json)
+
+
+@pytest.mark.parametrize("ontology, required_capability_iri", PLANNING_PROBLEMS)
+def test_graph_traversal_extracts_the_same_results_as_sparql(ontology, required_capability_iri):
+	planner = create_planner(ontology, required_capability_iri, Extraction.SPARQL)
+	assert planner.find_extraction_differences() == []
+
+
+@pytest.mark.parametrize("ontology, required_capability_iri", PLANNING_PROBLEMS)
+def test_graph_traversal_finds_the_same_plan_as_sparql(ontology, required_capability_iri):
+	sparql_plan = get_plan_json(create_planner(ontology, required_capability_iri, Extraction.SPARQL))
+	graph_traversal_plan = get_plan_json(create_planner(ontology, required_capability_iri, Extraction.GRAPH_TRAVERSAL))
+	assert graph_traversal_plan == sparql_plan
+
+
+def test_workers_extract_like_the_main_process(monkeypatch):
+	# Portfolio and enumeration workers set up their own planner from the settings of the main process
+	planner = create_planner("drilling.ttl", REQUIRED_CAPABILITY, Extraction.GRAPH_TRAVERSAL)
+	settings = planner._get_settings()
+
+	def fail_on_query(*arguments):
+		raise AssertionError("The graph traversal must not evaluate SPARQL queries")
+	with monkeypatch.context() as patch:
+		patch.setattr(FileQueryHandler, "query", fail_on_query)
+		patch.setattr(FileQueryHandler, "query_all", fail_on_query)
+		graph_traversal_planner = _get_worker_planner(REQUIRED_CAPABILITY, planner.query_handler_source, settings)
+	assert graph_traversal_planner.extraction == Extraction.GRAPH_TRAVERSAL
+
+	# A planner of one extraction is not reused for the other one
+	sparql_planner = _get_worker_planner(REQUIRED_CAPABILITY, planner.query_handler_source, {**settings, "extraction": Extraction.SPARQL.value})
+	assert sparql_planner is not graph_traversal_planner
+	assert sparql_planner.extraction == Extraction.SPARQL